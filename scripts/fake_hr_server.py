@@ -0,0 +1,376 @@
+# 本地的 HR 门户替身，不需要真实账号就能测试和压测联网获取的流程
+# 用法:
+#   python scripts/fake_hr_server.py --port 8800 --latency 50 --jitter 20 --error-rate 0.05
+#   python scripts/overtime_calculator.py --hr-url http://127.0.0.1:8800 --holiday-url http://127.0.0.1:8800 --cookie 'MCHRID=1' --yearMonth 2025-05 --no-store
+#   python scripts/fake_hr_server.py --punches 20 --applications 5000      # 更大的响应，用来压测解析和分页
+#   python scripts/fake_hr_server.py --token-ttl 900                       # 模拟会话过期：quectel_token 过期返回 401，门户首页续期
+#   python scripts/fake_hr_server.py --record recordings/ --upstream https://hr.quectel.com   # 转发到真实门户并录制响应
+#   python scripts/fake_hr_server.py --replay recordings/                                     # 离线回放录制的响应
+# 录制的响应包含真实的考勤和请假数据，不要提交到仓库
+# -*- coding: utf-8 -*-
+import sys, os, json, argparse, hashlib, random, threading, zlib
+import time as t
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+import overtime_calculator as calculator
+from overtime_benchmark import generate_clock_in_data
+
+
+# 监听地址
+FAKE_HOST   = '127.0.0.1'
+FAKE_PORT   = 8800
+
+
+# 生成的数据
+FAKE_SEED                   = 1
+FAKE_APPLICATIONS           = 40                            # 每个员工的流程申请数
+FAKE_EXTRA_PUNCHES          = 0                             # 每天在上下班之间额外插入的打卡数（乱序），用来放大响应
+FAKE_ERROR_STATUSES         = '503'                         # --error-rate 命中时随机返回的状态码
+CLOCK_IN_VARIABLE           = 'FAKE0302'                    # 门户页面中个人考勤查询链接的用户变量
+PROCESS_APPLICATION_VARIABLE = 'FAKE0104'                   # 门户页面中流程申请链接的用户变量
+DELAY_DEDUCTION_KEY_PREFIX  = 'FAKED'                       # 延时工时扣减的 AUTHKEY 前缀，后面带日期，表单据此生成
+FAKE_TOKEN_TTL              = 0                             # 签发的 quectel_token 有效期（秒），0 表示不检查 token
+
+
+# 录制和回放
+HOLIDAY_UPSTREAM    = 'https://timor.tech'
+FORWARD_HEADERS     = ('Cookie', 'Content-Type')            # 录制时转发给上游的请求头
+
+
+# 生成数据
+def employee_seed(seed: int, cookie: str, *parts) -> int:
+    """
+    由种子、员工（MCHRID，没有时为整个 Cookie）和其他参数得到固定的随机种子，同一个员工同一个月每次请求的数据都相同。
+    """
+    return zlib.crc32('|'.join([str(seed), cookie] + [str(part) for part in parts]).encode('utf-8'))
+
+def clock_in_records(seed: int, cookie: str, year: int, month: int, extra_punches: int) -> List[Dict[str, str]]:
+    """
+    生成一个月的个人打卡查询数据。extra_punches 大于 0 时每天在上下班之间追加这么多条打卡，排在当天记录之后。
+    """
+    rng = random.Random(employee_seed(seed, cookie, 'extra', year, month))
+    records = []
+    for record in generate_clock_in_data(employee_seed(seed, cookie, year, month), year, [month]):
+        if records and extra_punches and records[-1]['SHIFTTERM'] != record['SHIFTTERM']:
+            records.extend(extra_punch_records(rng, records[-1]['SHIFTTERM'], extra_punches))
+        records.append(record)
+    if records and extra_punches:
+        records.extend(extra_punch_records(rng, records[-1]['SHIFTTERM'], extra_punches))
+    return [dict(record, EMPID=str(zlib.crc32(cookie.encode('utf-8')) % 100000), ID=f"{index}") for index, record in enumerate(records)]
+
+def extra_punch_records(rng: random.Random, date: str, count: int) -> List[Dict[str, str]]:
+    """
+    生成一天中 10:00-17:00 之间的 count 条打卡，不会改变当天最早和最晚的打卡。
+    """
+    records = []
+    for _ in range(count):
+        seconds = rng.randint(10 * 3600, 17 * 3600)
+        records.append({'SHIFTTERM': date, 'CARDTIME': f"{date} {seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"})
+    return records
+
+def attendance_records(seed: int, cookie: str, year: int, month: int) -> List[Dict[str, str]]:
+    """
+    生成一个月的个人考勤查询数据（TERM/LTRM_1/LATE/LATEMIN），每天一条，LATE 和 LATEMIN 为当月累计。
+    """
+    rng = random.Random(employee_seed(seed, cookie, 'attendance', year, month))
+    records = []
+    day = datetime(year, month, 1)
+    late_count = late_minutes = 0
+    while day.month == month:
+        minutes = rng.randint(1, 30) if day.weekday() < 5 and rng.random() < 0.1 else 0
+        if minutes:
+            late_count += 1
+            late_minutes += minutes
+        records.append({'TERM': day.strftime('%Y-%m-%d'), 'LTRM_1': str(minutes), 'LATE': str(late_count), 'LATEMIN': str(late_minutes)})
+        day += timedelta(days=1)
+    return records
+
+def process_applications(seed: int, cookie: str, count: int, year: int) -> List[Dict[str, str]]:
+    """
+    从 year 年 1 月开始按时间顺序生成 count 条流程申请：年假、事假、延时工时扣减申请，
+    以及撤销最近某次请假的销假申请。延时工时扣减的 AUTHKEY 带有日期，见 delay_deduction_form。
+    """
+    rng = random.Random(employee_seed(seed, cookie, 'applications', year))
+    records = []
+    leaves = []
+    day = datetime(year, 1, 1)
+    for index in range(count):
+        kind = rng.random()
+        if leaves and kind < 0.1:
+            abstracts = f"{index}|销假申请|张三|{rng.choice(leaves)}"
+            records.append({'ID': str(index), 'AUTHKEY': f"FAKE{index:06d}", 'ABSTRACTS': abstracts})
+            continue
+        day += timedelta(days=rng.randint(1, 7))
+        if kind < 0.3:
+            date = day.strftime('%Y-%m-%d')
+            records.append({'ID': str(index), 'AUTHKEY': f"{DELAY_DEDUCTION_KEY_PREFIX}{index:06d}-{date}", 'ABSTRACTS': f"{index}|延时工时扣减申请|张三|{date}"})
+            continue
+        start = day.replace(hour=rng.choice((9, 9, 14)))
+        end = day.replace(hour=rng.choice((12, 18, 18)) if start.hour == 9 else 18)
+        leave_range = f"{start:%Y-%m-%d %H:%M} - {end:%Y-%m-%d %H:%M}"
+        leaves = leaves[-19:] + [leave_range]
+        records.append({'ID': str(index), 'AUTHKEY': f"FAKE{index:06d}", 'ABSTRACTS': f"{index}|{rng.choice(('年假', '事假'))}|张三|{leave_range}"})
+    return records
+
+def delay_deduction_form(auth_key: str) -> Dict[str, Any]:
+    """
+    延时工时扣减申请的表单：AUTHKEY 中日期当天 19:00-20:00。不是本服务生成的 AUTHKEY 返回空表单。
+    """
+    date = auth_key.rsplit('-', 3)
+    if not auth_key.startswith(DELAY_DEDUCTION_KEY_PREFIX) or len(date) != 4:
+        return {'formList': []}
+    date = '-'.join(date[1:])
+    return {'formList': [{'formData': {'CARDBEGINTIME': f"{date}T19:00", 'CARDENDTIME': f"{date}T20:00"}}]}
+
+def issue_token(ttl: float) -> str:
+    """
+    签发一个 JWT 格式的 quectel_token（签名是假的），exp 为 ttl 秒之后。
+    """
+    import base64
+
+    def encode(data: Dict[str, Any]) -> str:
+        return base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).decode('ascii').rstrip('=')
+    return f"{encode({'alg': 'none', 'typ': 'JWT'})}.{encode({'exp': int(t.time() + ttl)})}.fake"
+
+def portal_page() -> str:
+    """
+    门户首页，只包含 get_user_variable_online 需要的两个链接。
+    """
+    return ('<html><head><meta charset="utf-8"><title>HR</title></head><body>'
+            f'<a title="{calculator.CLOCK_IN_DATA_TITLE}" href="/ajax/function/alist!{CLOCK_IN_VARIABLE}">{calculator.CLOCK_IN_DATA_TITLE}</a>'
+            f'<a title="{calculator.PROCESS_APPLICATION_DATA_TITLE}" href="/ajax/function/alist!{PROCESS_APPLICATION_VARIABLE}">{calculator.PROCESS_APPLICATION_DATA_TITLE}</a>'
+            '</body></html>')
+
+def holiday_year(year: int) -> Dict[str, Any]:
+    """
+    节假日接口：返回项目附带的数据，没有附带该年份时返回没有节假日的一年。
+    """
+    return calculator.read_bundled_holiday_data(year) or {'code': 0, 'holiday': {}}
+
+
+# 录制和回放
+def request_key(method: str, path: str, body: bytes) -> str:
+    """
+    录制文件的键：方法、路径和请求体。JSON 请求体按键排序后再计算，字段顺序不影响匹配。
+    """
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, ensure_ascii=False).encode('utf-8') if body else b''
+    except ValueError:
+        pass
+    return hashlib.sha1(method.encode('utf-8') + b' ' + path.encode('utf-8') + b'\n' + body).hexdigest()
+
+def load_recordings(directory: str) -> Dict[str, Dict[str, Any]]:
+    """
+    读取 --record 保存的全部响应，键为 request_key。
+    """
+    recordings = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.json'):
+            with open(os.path.join(directory, name), 'r', encoding='utf-8') as file:
+                recording = json.load(file)
+            recordings[name[:-5]] = recording
+    return recordings
+
+def save_recording(directory: str, key: str, recording: Dict[str, Any]):
+    """
+    保存一次响应，并发请求不会留下写了一半的文件（见 atomic_write_json）。
+    """
+    calculator.atomic_write_json(os.path.join(directory, key + '.json'), recording)
+
+
+# 服务
+class FakeHrRequestHandler(BaseHTTPRequestHandler):
+    """
+    处理门户首页、alist!/formlist! 接口和节假日接口。配置保存在 self.server.options 中。
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def handle_request(self, method: str):
+        options = self.server.options
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        self.server.count(self.path.split('?', 1)[0].rsplit('.', 1)[-1] if 'alist!' in self.path else self.path.split('!', 1)[0])
+
+        if options.record:
+            self.send_body(*self.forward(method, body))
+            return
+
+        # 模拟网络延迟和上游故障，录制时不注入
+        if options.latency or options.jitter:
+            t.sleep(max(0.0, options.latency + random.uniform(-options.jitter, options.jitter)) / 1000)
+        if options.error_rate and random.random() < options.error_rate:
+            status = random.choice(options.error_statuses)
+            self.send_body(status, 'application/json', json.dumps({'error': 'injected'}).encode('utf-8'),
+                           {'Retry-After': '1'} if status == 429 else None)
+            return
+
+        if options.replay is not None:
+            recording = options.replay.get(request_key(method, self.path, body))
+            if recording is None:
+                self.send_body(404, 'application/json', json.dumps({'error': 'not recorded', 'path': self.path}).encode('utf-8'))
+            else:
+                self.send_body(recording['status'], recording['content_type'], recording['body'].encode('utf-8'))
+            return
+
+        self.send_body(*self.generate(method, body))
+
+    def generate(self, method: str, body: bytes) -> tuple:
+        """
+        按路径生成响应，返回 (状态码, Content-Type, 响应体) 或再加上额外的响应头。
+        """
+        options = self.server.options
+        path = self.path.split('?', 1)[0]
+        if path.startswith('/api/holiday/year/'):
+            return self.json_body(holiday_year(int(path.rsplit('/', 1)[-1])))
+
+        cookie = self.headers.get('Cookie', '')
+        if not cookie:
+            return self.json_body({'error': 'unauthorized'}, 401)
+        cookies = calculator.parse_cookie_string(cookie)
+        if options.token_ttl and path == '/portal/index' and cookies.get('quectel_refresh_token'):
+            # 带着 refresh token 访问门户首页时签发新的 quectel_token，与真实门户续期的方式一致
+            return 200, 'text/html; charset=utf-8', portal_page().encode('utf-8'), {'Set-Cookie': f"quectel_token={issue_token(options.token_ttl)}; Path=/"}
+        if options.token_ttl and 'quectel_token' in cookies and (calculator.token_expiry(cookies['quectel_token']) or 0) < t.time():
+            return self.json_body({'error': 'token expired'}, 401)
+        # 员工的数据只由 MCHRID 决定，续期换了 token 也不变
+        cookie = cookies.get('MCHRID', cookie)
+        if path == '/portal/index':
+            return 200, 'text/html; charset=utf-8', portal_page().encode('utf-8')
+
+        try:
+            payload = json.loads(body) if body else {}
+        except ValueError:
+            return self.json_body({'error': 'invalid json'}, 400)
+        if path.startswith('/ajax/flowform/formlist!'):
+            return self.json_body(delay_deduction_form(path.split('!', 1)[1]))
+        if not path.startswith('/ajax/function/alist!'):
+            return self.json_body({'error': 'not found'}, 404)
+
+        function = path.rsplit('.', 1)[-1]
+        if function in ('220302', '220398'):
+            term = payload.get('appParam', {}).get('TERM', '')
+            try:
+                year, month = int(term[:4]), int(term[5:7])
+            except ValueError:
+                return self.json_body({'error': 'invalid TERM'}, 400)
+            if function == '220302':
+                return self.json_body(clock_in_records(options.seed, cookie, year, month, options.punches))
+            return self.json_body(attendance_records(options.seed, cookie, year, month))
+        if function == '290104':
+            rows = process_applications(options.seed, cookie, options.applications, options.year)
+            limit, offset = int(payload.get('limit') or 0), int(payload.get('offset') or 0)
+            return self.json_body({'rows': rows[offset:offset + limit] if limit else rows[offset:], 'total': len(rows)})
+        return self.json_body({'error': 'unknown function'}, 404)
+
+    def forward(self, method: str, body: bytes) -> Tuple[int, str, bytes]:
+        """
+        把请求转发给真实的上游并录制响应。重定向不跟随，原样录制（登录失效时门户会重定向到登录页）。
+        """
+        import requests
+
+        options = self.server.options
+        upstream = options.holiday_upstream if self.path.startswith('/api/holiday/') else options.upstream
+        headers = {name: self.headers[name] for name in FORWARD_HEADERS if self.headers.get(name)}
+        headers.update({'User-Agent': calculator.USER_AGENT, 'Origin': upstream, 'Referer': upstream + '/portal/index'})
+        try:
+            response = requests.request(method, upstream + self.path, headers=headers, data=body or None, timeout=calculator.HTTP_DEFAULT_TIMEOUT, allow_redirects=False)
+        except requests.exceptions.RequestException as e:
+            return self.json_body({'error': f'upstream: {e}'}, 502)
+
+        content_type = response.headers.get('Content-Type', 'application/octet-stream')
+        save_recording(options.record, request_key(method, self.path, body), {
+            'method': method,
+            'path': self.path,
+            'status': response.status_code,
+            'content_type': content_type,
+            'body': response.text
+        })
+        return response.status_code, content_type, response.text.encode('utf-8')
+
+    def json_body(self, data, status: int = 200) -> Tuple[int, str, bytes]:
+        return status, 'application/json; charset=utf-8', json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+    def send_body(self, status: int, content_type: str, body: bytes, headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.options.quiet:
+            super().log_message(format, *args)
+
+class FakeHrServer(ThreadingHTTPServer):
+    """
+    多线程的替身服务，记录每个接口的请求次数，停止时打印。
+    """
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], options: argparse.Namespace):
+        super().__init__(address, FakeHrRequestHandler)
+        self.options = options
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def count(self, endpoint: str):
+        with self._lock:
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+
+
+# 主程序
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='本地的 HR 门户和节假日接口替身，支持延迟、错误注入和录制回放')
+    parser.add_argument('--host', type=str, default=FAKE_HOST, help='监听地址')
+    parser.add_argument('--port', type=int, default=FAKE_PORT, help='监听端口')
+    parser.add_argument('--latency', type=float, default=0, help='每个请求的平均延迟（毫秒）')
+    parser.add_argument('--jitter', type=float, default=0, help='延迟的随机浮动范围（毫秒）')
+    parser.add_argument('--error-rate', type=float, default=0, help='随机返回错误状态码的比例（0~1）')
+    parser.add_argument('--error-status', type=str, default=FAKE_ERROR_STATUSES, help='逗号分隔的错误状态码，例如 429,503')
+    parser.add_argument('--punches', type=int, default=FAKE_EXTRA_PUNCHES, help='每天额外插入的打卡数，用来放大打卡查询的响应')
+    parser.add_argument('--applications', type=int, default=FAKE_APPLICATIONS, help='每个员工的流程申请数')
+    parser.add_argument('--year', type=int, default=datetime.now().year, help='流程申请从这一年 1 月开始生成')
+    parser.add_argument('--seed', type=int, default=FAKE_SEED, help='随机种子，相同的种子和员工（Cookie 中的 MCHRID）得到相同的数据')
+    parser.add_argument('--token-ttl', type=float, default=FAKE_TOKEN_TTL, help='签发的 quectel_token 有效期（秒），过期的 token 返回 401，0 表示不检查')
+    parser.add_argument('--record', type=str, help='转发到 --upstream 并把响应录制到这个目录')
+    parser.add_argument('--upstream', type=str, default=calculator.HR_BASE_URL, help='录制时的 HR 系统地址')
+    parser.add_argument('--holiday-upstream', type=str, default=HOLIDAY_UPSTREAM, help='录制时的节假日接口地址')
+    parser.add_argument('--replay', type=str, help='回放这个目录中录制的响应，没有录制的请求返回 404')
+    parser.add_argument('--quiet', action='store_true', help='不打印每个请求的日志')
+    args = parser.parse_args()
+
+    if args.record and args.replay:
+        parser.error('--record 和 --replay 不能同时使用')
+    if not 0 <= args.error_rate <= 1:
+        parser.error('--error-rate 必须在 0 到 1 之间')
+    args.error_statuses = [int(status) for status in args.error_status.split(',') if status.strip()]
+    args.upstream = args.upstream.rstrip('/')
+    args.holiday_upstream = args.holiday_upstream.rstrip('/')
+    if args.record:
+        os.makedirs(args.record, exist_ok=True)
+    if args.replay:
+        args.replay = load_recordings(args.replay)
+        print(f"已载入 {len(args.replay)} 条录制的响应")
+
+    server = FakeHrServer((args.host, args.port), args)
+    print(f"HR 门户替身已启动: http://{args.host}:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for endpoint, count in sorted(server.counts.items()):
+            print(f"{endpoint}: {count} 次请求")
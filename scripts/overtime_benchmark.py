@@ -0,0 +1,640 @@
+# 加班计算器的性能基准
+# 用法:
+#   python scripts/overtime_benchmark.py startup                # 测量冷启动时间并检查预算
+#   python scripts/overtime_benchmark.py startup --runs 20 --output output/benchmark.json
+#   python scripts/overtime_benchmark.py columnar --employees 200 --year 2025   # 对比列式计算与逐行计算（需要 NumPy）
+#   python scripts/overtime_benchmark.py records --employees 50                 # 每天结果的内存占用和汇总速度
+#   python scripts/overtime_benchmark.py timeparse --rows 200000                # 打卡时间解析的微基准
+#   python scripts/overtime_benchmark.py suite --sizes 31,10000,1000000,3000000 # 各个计算函数随数据量增长的耗时和内存峰值
+# -*- coding: utf-8 -*-
+import sys, os, json, argparse, contextlib, platform, random, statistics, subprocess, tempfile, tracemalloc
+import time as t
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+
+# 定义路径
+SCRIPT_DIR          = os.path.dirname(os.path.abspath(__file__))
+CALCULATOR_SCRIPT   = os.path.join(SCRIPT_DIR, 'overtime_calculator.py')
+RESULTS_FILE        = 'output/benchmark.json'
+
+
+# 离线路径（--custom）的启动预算，按同一台机器上 python -c pass 的耗时的倍数计算，超出时返回非零退出码
+IMPORT_BUDGET_RATIO  = 2.5          # import overtime_calculator 的累计导入耗时
+STARTUP_BUDGET_RATIO = 15           # 用 --custom 处理一个小文件的墙钟耗时（含解释器启动）
+REGRESSION_RATIO     = 1.2          # 比上次记录的结果慢这么多倍时给出提示
+# --custom 路径不应加载的模块（网络、HTML 解析、浏览器、常驻服务、多进程）
+OFFLINE_FORBIDDEN_MODULES = ('requests', 'urllib3', 'bs4', 'selenium', 'webdriver_manager', 'http.server', 'multiprocessing')
+
+
+# 计算函数基准，默认从一个月的数据到十万行，更大的数据量用 --sizes 指定
+SUITE_SIZES         = '31,10000,100000'
+SUITE_START_YEAR    = 2000          # 生成的数据从这一年开始按天连续排列
+
+
+# 启动时间
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """
+    解析 python -X importtime 的输出。
+
+    参数:
+        stderr (str): 子进程的标准错误输出。
+
+    返回值:
+        List[Tuple[str, int, int]]: (模块名, 自身耗时微秒, 累计耗时微秒) 的列表。
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+def write_sample_custom_data(directory: str) -> str:
+    """
+    写一个小的 --custom 数据文件，返回文件路径。
+    """
+    path = os.path.join(directory, 'custom.json')
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({
+            'hourlyRate': 20,
+            'customData': [
+                {'date': '2025-05-06', 'startTime': '09:10:00', 'endTime': '21:30:00', 'dayType': '工作日'},
+                {'date': '2025-05-10', 'startTime': '10:00:00', 'endTime': '18:00:00', 'dayType': '周末'},
+                {'date': '2025-05-01', 'startTime': '09:30:00', 'endTime': '19:00:00', 'dayType': '节假日'}
+            ]
+        }, file, ensure_ascii=False)
+    return path
+
+def measure_import(runs: int) -> Dict[str, object]:
+    """
+    测量 import overtime_calculator 的累计导入耗时。
+
+    参数:
+        runs (int): 测量次数，取中位数。
+
+    返回值:
+        Dict[str, object]: 中位数、最小值（毫秒）和自身耗时最多的模块。
+    """
+    samples = []
+    modules = []
+    for _ in range(runs):
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import overtime_calculator'],
+                                   cwd=SCRIPT_DIR, capture_output=True, text=True, check=True)
+        modules = parse_importtime(completed.stderr)
+        samples.append(next(cumulative for name, _, cumulative in modules if name == 'overtime_calculator') / 1000)
+    heaviest = sorted(modules, key=lambda module: module[1], reverse=True)[:10]
+    return {
+        'median_ms': statistics.median(samples),
+        'min_ms': min(samples),
+        'heaviest_modules': [{'module': name, 'self_ms': self_us / 1000} for name, self_us, _ in heaviest]
+    }
+
+def measure_baseline(runs: int) -> Dict[str, object]:
+    """
+    测量空解释器（python -c pass）的墙钟耗时，作为启动预算的基准。
+
+    参数:
+        runs (int): 测量次数，取中位数。
+
+    返回值:
+        Dict[str, object]: 中位数和最小值（毫秒）。
+    """
+    samples = []
+    for _ in range(runs):
+        start = t.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        samples.append((t.perf_counter() - start) * 1000)
+    return {
+        'median_ms': statistics.median(samples),
+        'min_ms': min(samples)
+    }
+
+def measure_custom_startup(runs: int) -> Dict[str, object]:
+    """
+    测量用 --custom 处理一个小文件的墙钟耗时，并记录整个过程中加载过的模块。
+
+    参数:
+        runs (int): 测量次数，取中位数。
+
+    返回值:
+        Dict[str, object]: 中位数、最小值（毫秒）和违规加载的模块列表。
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        custom_path = write_sample_custom_data(directory)
+        command = [sys.executable, CALCULATOR_SCRIPT, '--custom', custom_path]
+
+        # 先用 -X importtime 跑一次，拿到加载过的全部模块（包括函数里延迟导入的）
+        completed = subprocess.run([sys.executable, '-X', 'importtime'] + command[1:],
+                                   cwd=directory, capture_output=True, text=True, check=True)
+        loaded = {name for name, _, _ in parse_importtime(completed.stderr)}
+        forbidden = sorted(name for name in loaded if name.split('.')[0] in OFFLINE_FORBIDDEN_MODULES or name in OFFLINE_FORBIDDEN_MODULES)
+
+        samples = []
+        for _ in range(runs):
+            start = t.perf_counter()
+            subprocess.run(command, cwd=directory, capture_output=True, check=True)
+            samples.append((t.perf_counter() - start) * 1000)
+    return {
+        'median_ms': statistics.median(samples),
+        'min_ms': min(samples),
+        'forbidden_modules': forbidden
+    }
+
+def run_startup(args) -> bool:
+    """
+    执行启动时间基准并检查预算。预算是 python -c pass 耗时的倍数，机器快慢不影响结论。
+
+    返回值:
+        bool: 全部在预算内返回 True。
+    """
+    # 先生成 __pycache__，测的是正常的冷启动而不是首次编译（py_compile 不受 PYTHONDONTWRITEBYTECODE 影响）
+    subprocess.run([sys.executable, '-m', 'py_compile', CALCULATOR_SCRIPT], check=True)
+
+    baseline = measure_baseline(args.runs)
+    import_result = measure_import(args.runs)
+    custom_result = measure_custom_startup(args.runs)
+    previous = load_results(args.output).get('startup', {})
+    import_budget = baseline['median_ms'] * args.import_budget
+    startup_budget = baseline['median_ms'] * args.startup_budget
+
+    print(f"python -c pass: 中位数 {baseline['median_ms']:.1f} ms（基准）")
+    print(f"import overtime_calculator: 中位数 {import_result['median_ms']:.1f} ms，"
+          f"基准的 {import_result['median_ms'] / baseline['median_ms']:.1f} 倍（预算 {args.import_budget:g} 倍，{import_budget:.0f} ms）")
+    for module in import_result['heaviest_modules'][:5]:
+        print(f"    {module['module']:<30} {module['self_ms']:.1f} ms")
+    print(f"--custom 小文件: 中位数 {custom_result['median_ms']:.1f} ms，"
+          f"基准的 {custom_result['median_ms'] / baseline['median_ms']:.1f} 倍（预算 {args.startup_budget:g} 倍，{startup_budget:.0f} ms）")
+
+    ok = True
+    if import_result['median_ms'] > import_budget:
+        print("导入耗时超出预算")
+        ok = False
+    if custom_result['median_ms'] > startup_budget:
+        print("--custom 启动耗时超出预算")
+        ok = False
+    if custom_result['forbidden_modules']:
+        print(f"--custom 路径加载了不应加载的模块: {', '.join(custom_result['forbidden_modules'])}")
+        ok = False
+    previous_median = previous.get('custom', {}).get('median_ms')
+    if previous_median and custom_result['median_ms'] > previous_median * REGRESSION_RATIO:
+        print(f"比上次记录的 {previous_median:.1f} ms 慢了 {custom_result['median_ms'] / previous_median:.2f} 倍")
+
+    save_results(args.output, 'startup', {
+        'baseline': baseline,
+        'import': import_result,
+        'custom': custom_result,
+        'budget': {'import_ratio': args.import_budget, 'startup_ratio': args.startup_budget,
+                   'import_ms': import_budget, 'startup_ms': startup_budget},
+        'passed': ok
+    })
+    return ok
+
+
+# 列式计算
+def generate_clock_in_data(seed: int, year: int, months: List[int]) -> List[Dict[str, str]]:
+    """
+    按固定种子生成一个员工若干个月的打卡记录，格式与 get_clock_in_data 返回的相同。
+
+    参数:
+        seed (int): 随机种子，相同的种子得到相同的数据。
+        year (int): 年份。
+        months (List[int]): 月份列表。
+
+    返回值:
+        List[Dict[str, str]]: 打卡记录，每天 2~4 条，偶尔有异地下班打卡。
+    """
+    rng = random.Random(seed)
+    records = []
+    for month in months:
+        day = datetime(year, month, 1)
+        while day.month == month:
+            if rng.random() < 0.85:
+                date = day.strftime('%Y-%m-%d')
+                start = 8 * 3600 + rng.randint(0, 2 * 3600)
+                end = 17 * 3600 + rng.randint(0, 6 * 3600)
+                punches = sorted([start, end] + [rng.randint(start, end) for _ in range(rng.randint(0, 2))])
+                for index, seconds in enumerate(punches):
+                    suffix = '(异地打卡)' if index == len(punches) - 1 and rng.random() < 0.05 else ''
+                    records.append({
+                        'SHIFTTERM': date,
+                        'CARDTIME': f"{date} {seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}{suffix}"
+                    })
+            day += timedelta(days=1)
+    return records
+
+def run_columnar(args) -> bool:
+    """
+    生成一个团队一整年的打卡记录，分别用逐行计算和列式计算处理，检查结果一致并比较耗时。
+
+    返回值:
+        bool: 两种计算结果完全一致返回 True。
+    """
+    sys.path.insert(0, SCRIPT_DIR)
+    import overtime_calculator as calculator
+    if calculator.load_numpy() is None:
+        print("没有安装 NumPy，无法测量列式计算")
+        return False
+
+    holidays = calculator.read_bundled_holiday_data(args.year) or {}
+    holiday_map, workday_set = calculator.filter_holiday_data(holidays, str(args.year)) if holidays else ({}, set())
+    batches = [generate_clock_in_data(args.seed + index, args.year, list(range(1, 13))) for index in range(args.employees)]
+    rows = sum(len(batch) for batch in batches)
+
+    # 逐行计算：临时调高阈值，强制走原来的路径
+    threshold = calculator.COLUMNAR_MIN_ROWS
+    calculator.COLUMNAR_MIN_ROWS = float('inf')
+    try:
+        start = t.perf_counter()
+        scalar = [calculator.compute_day_records(batch, holiday_map, workday_set, args.rate) for batch in batches]
+        scalar_seconds = t.perf_counter() - start
+    finally:
+        calculator.COLUMNAR_MIN_ROWS = threshold
+
+    start = t.perf_counter()
+    columns = calculator.compute_columns(calculator.load_punch_columns(batches, holiday_map, workday_set), args.rate)
+    columnar_seconds = t.perf_counter() - start
+    records = calculator.columns_to_day_records(columns)
+
+    expected = [record for result, _ in scalar for record in result]
+    ok = records == expected
+    if not ok:
+        mismatch = next(index for index, (left, right) in enumerate(zip(records, expected)) if left != right) if len(records) == len(expected) else None
+        print(f"结果不一致: 列式 {len(records)} 行, 逐行 {len(expected)} 行, 第一处不同: {mismatch}")
+
+    # 单个员工的汇总也要一致
+    first_result, _ = scalar[0]
+    single = calculator.compute_columns(calculator.load_punch_columns(batches[:1], holiday_map, workday_set), args.rate)
+    if calculator.summarize_columns(single, workday_set, holiday_map, 0, 0) != calculator.summarize_totals(first_result, workday_set, holiday_map, 0, 0):
+        print("汇总结果不一致")
+        ok = False
+
+    print(f"{args.employees} 人 x 12 个月, {rows} 条打卡记录, {len(expected)} 天")
+    print(f"逐行计算: {scalar_seconds * 1000:.1f} ms ({rows / scalar_seconds:,.0f} 条/秒)")
+    print(f"列式计算: {columnar_seconds * 1000:.1f} ms ({rows / columnar_seconds:,.0f} 条/秒), 加速 {scalar_seconds / columnar_seconds:.1f} 倍")
+    save_results(args.output, 'columnar', {
+        'employees': args.employees,
+        'rows': rows,
+        'days': len(expected),
+        'scalar_ms': scalar_seconds * 1000,
+        'columnar_ms': columnar_seconds * 1000,
+        'identical': ok
+    })
+    return ok
+
+
+# 每天结果的存储结构
+def legacy_day_tuple(record) -> tuple:
+    """
+    把 DayRecord 转换成原来的元组格式（数值字段保存为字符串），用于对比内存占用。
+    """
+    return (record.date, record.start_time, record.end_time, record.day_type_name, record.rate, record.overtime,
+            f"{record.overtime_pay:.2f}", record.allowance, record.total_income, str(record.late_minutes) if record.late_minutes > 0 else "0")
+
+def measure_allocated(build) -> int:
+    """
+    返回 build() 构造的对象在构造完成后仍然占用的字节数。
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    value = build()
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del value
+    return allocated
+
+def run_records(args) -> bool:
+    """
+    比较每天结果使用 DayRecord 和原来的元组格式时的内存占用，并测量 summarize_totals 的速度。
+
+    返回值:
+        bool: 总是返回 True。
+    """
+    sys.path.insert(0, SCRIPT_DIR)
+    import overtime_calculator as calculator
+
+    holidays = calculator.read_bundled_holiday_data(args.year) or {}
+    holiday_map, workday_set = calculator.filter_holiday_data(holidays, str(args.year)) if holidays else ({}, set())
+    records = []
+    for index in range(args.employees):
+        result, _ = calculator.compute_day_records(generate_clock_in_data(args.seed + index, args.year, list(range(1, 13))), holiday_map, workday_set)
+        records.extend(result)
+
+    # 日期和时间字符串两种结构共用，只统计各自额外分配的内存
+    fields = [(r.date, r.start_time, r.end_time, r.day_type, r.rate, r.overtime, r.overtime_pay, r.allowance, r.total_income, r.late_minutes) for r in records]
+    record_bytes = measure_allocated(lambda: [calculator.DayRecord(*values) for values in fields])
+    tuple_bytes = measure_allocated(lambda: [legacy_day_tuple(record) for record in records])
+
+    start = t.perf_counter()
+    for _ in range(args.runs):
+        calculator.summarize_totals(records, workday_set, holiday_map, 2, 45)
+    summarize_seconds = (t.perf_counter() - start) / args.runs
+
+    print(f"{len(records)} 天")
+    print(f"元组格式: {tuple_bytes / len(records):.0f} 字节/天")
+    print(f"DayRecord: {record_bytes / len(records):.0f} 字节/天（{record_bytes / tuple_bytes:.0%}）")
+    print(f"summarize_totals: {summarize_seconds * 1000:.2f} ms（{len(records) / summarize_seconds:,.0f} 天/秒）")
+    save_results(args.output, 'records', {
+        'days': len(records),
+        'tuple_bytes_per_day': tuple_bytes / len(records),
+        'day_record_bytes_per_day': record_bytes / len(records),
+        'summarize_ms': summarize_seconds * 1000
+    })
+    return True
+
+
+# 打卡时间解析
+def legacy_day_cal(first_check_time: str, last_check_time: str, day_type: str) -> Tuple[float, float]:
+    """
+    原来基于 datetime.strptime 的加班时长和迟到时间计算，只用于对比。
+    """
+    if last_check_time[-6:] == '(异地打卡)':
+        overtime = 0
+    elif day_type == '工作日':
+        ret = (datetime.strptime(last_check_time, '%H:%M:%S') - datetime.strptime('19:00:00', '%H:%M:%S')).total_seconds()
+        overtime = ret / 3600 if ret > 0 else 0
+    else:
+        ret = (datetime.strptime(last_check_time, '%H:%M:%S') - datetime.strptime(first_check_time, '%H:%M:%S')).total_seconds()
+        overtime = ret / 3600 if ret > 0 else 0
+    if first_check_time[-6:] == '(异地打卡)' or day_type != '工作日':
+        late = 0
+    else:
+        ret = (datetime.strptime(first_check_time, '%H:%M:%S') - datetime.strptime('09:00:00', '%H:%M:%S')).total_seconds() / 60
+        late = ret if ret > 0 else 0
+    return overtime, late
+
+def run_timeparse(args) -> bool:
+    """
+    比较 datetime.strptime 和 parse_clock_time 的解析速度，以及每天的加班时长和迟到时间计算速度。
+
+    返回值:
+        bool: 两种计算结果一致返回 True。
+    """
+    sys.path.insert(0, SCRIPT_DIR)
+    import overtime_calculator as calculator
+
+    rng = random.Random(args.seed)
+    day_types = ('工作日', '工作日', '工作日', '工作日', '周末', '节假日')
+    rows = []
+    for _ in range(args.rows):
+        start = 8 * 3600 + rng.randint(0, 2 * 3600)
+        end = 17 * 3600 + rng.randint(0, 6 * 3600)
+        suffix = '(异地打卡)' if rng.random() < 0.05 else ''
+        rows.append((f"{start // 3600:02d}:{start // 60 % 60:02d}:{start % 60:02d}",
+                     f"{end // 3600:02d}:{end // 60 % 60:02d}:{end % 60:02d}{suffix}", rng.choice(day_types)))
+    times = [first for first, _, _ in rows]
+
+    start = t.perf_counter()
+    for value in times:
+        datetime.strptime(value, '%H:%M:%S')
+    strptime_seconds = t.perf_counter() - start
+    start = t.perf_counter()
+    for value in times:
+        calculator.parse_clock_time(value)
+    parse_seconds = t.perf_counter() - start
+
+    start = t.perf_counter()
+    legacy = [legacy_day_cal(first, last, day_type) for first, last, day_type in rows]
+    legacy_seconds = t.perf_counter() - start
+    start = t.perf_counter()
+    current = []
+    for first, last, day_type in rows:
+        first_seconds, first_remote = calculator.parse_clock_time(first)
+        last_seconds, last_remote = calculator.parse_clock_time(last)
+        current.append((calculator.overtime_cal(first_seconds, last_seconds, day_type, last_remote),
+                        float(calculator.late_time_cal(first_seconds, day_type, first_remote))))
+    current_seconds = t.perf_counter() - start
+
+    ok = legacy == current
+    if not ok:
+        print("两种计算结果不一致")
+    print(f"解析 {args.rows} 个时间: strptime {strptime_seconds * 1000:.1f} ms, parse_clock_time {parse_seconds * 1000:.1f} ms, 加速 {strptime_seconds / parse_seconds:.1f} 倍")
+    print(f"每天的加班和迟到计算: 原来 {legacy_seconds * 1000:.1f} ms, 现在 {current_seconds * 1000:.1f} ms, 加速 {legacy_seconds / current_seconds:.1f} 倍")
+    save_results(args.output, 'timeparse', {
+        'rows': args.rows,
+        'strptime_ms': strptime_seconds * 1000,
+        'parse_clock_time_ms': parse_seconds * 1000,
+        'legacy_day_ms': legacy_seconds * 1000,
+        'day_ms': current_seconds * 1000,
+        'identical': ok
+    })
+    return ok
+
+
+# 计算函数基准
+def generate_clock_in_days(seed: int, days: int) -> List[Dict[str, str]]:
+    """
+    从 SUITE_START_YEAR 年 1 月开始逐月生成一个员工的打卡记录，直到有打卡的日期达到 days 天，只保留前 days 天。
+    """
+    records = []
+    dates = set()
+    year, month = SUITE_START_YEAR, 1
+    while len(dates) < days:
+        for record in generate_clock_in_data(seed + year * 12 + month, year, [month]):
+            if record['SHIFTTERM'] not in dates:
+                if len(dates) == days:
+                    break
+                dates.add(record['SHIFTTERM'])
+            records.append(record)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return records
+
+def clock_in_to_custom_items(calculator, records: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """
+    把打卡记录转换成 --custom 的 customData：每天取最早和最晚的打卡，日期类型按周末判断。
+    """
+    return [{'date': date, 'startTime': punches.first_time, 'endTime': punches.last_time, 'dayType': calculator.get_day_type(date, {}, set())}
+            for date, punches in calculator.reduce_punches(records).items()]
+
+def generate_attendance_data(seed: int, rows: int) -> List[Dict[str, str]]:
+    """
+    生成个人考勤查询的返回数据（TERM/LTRM_1/LATE/LATEMIN），每天一条，从 SUITE_START_YEAR 年 1 月 1 日开始。
+    大约一成的日期有迟到，LATE 和 LATEMIN 为当月累计。
+    """
+    rng = random.Random(seed)
+    records = []
+    day = datetime(SUITE_START_YEAR, 1, 1)
+    late_count = late_minutes = 0
+    for _ in range(rows):
+        if day.day == 1:
+            late_count = late_minutes = 0
+        minutes = rng.randint(1, 30) if rng.random() < 0.1 else 0
+        if minutes:
+            late_count += 1
+            late_minutes += minutes
+        records.append({'TERM': day.strftime('%Y-%m-%d'), 'LTRM_1': str(minutes), 'LATE': str(late_count), 'LATEMIN': str(late_minutes)})
+        day += timedelta(days=1)
+    return records
+
+def generate_leave_records(seed: int, rows: int) -> List[Dict[str, str]]:
+    """
+    按时间顺序生成流程申请记录（ABSTRACTS/AUTHKEY）：年假和事假各占一部分，约一成为撤销最近某次请假的销假申请。
+    不生成延时工时扣减申请，它需要联网获取表单。
+    """
+    rng = random.Random(seed)
+    records = []
+    leaves = []
+    day = datetime(SUITE_START_YEAR, 1, 1)
+    for index in range(rows):
+        if leaves and rng.random() < 0.1:
+            leave_range = rng.choice(leaves)
+            records.append({'AUTHKEY': f"K{index}", 'ABSTRACTS': f"{index}|销假申请|张三|{leave_range}"})
+            continue
+        day += timedelta(days=rng.randint(1, 2))
+        start = day.replace(hour=rng.choice((9, 9, 14)))
+        end = (day + timedelta(days=rng.randint(0, 1))).replace(hour=18)
+        separator = ' - ' if rng.random() < 0.5 else ' 至 '
+        leave_range = f"{start:%Y-%m-%d %H:%M}{separator}{end:%Y-%m-%d %H:%M}"
+        leaves = leaves[-19:] + [leave_range]
+        records.append({'AUTHKEY': f"K{index}", 'ABSTRACTS': f"{index}|{rng.choice(('年假', '事假'))}|张三|{leave_range}"})
+        day = end
+    return records
+
+def measure_function(call, rows: int, runs: int) -> Dict[str, object]:
+    """
+    测量 call() 的耗时（取 runs 次中最快的一次）和单独一次运行时的 tracemalloc 内存峰值。
+
+    返回值:
+        Dict[str, object]: rows、ms、rows_per_second 和 peak_bytes。
+    """
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        timings = []
+        for _ in range(runs):
+            start = t.perf_counter()
+            call()
+            timings.append(t.perf_counter() - start)
+        tracemalloc.start()
+        call()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    seconds = min(timings)
+    return {'rows': rows, 'ms': seconds * 1000, 'rows_per_second': rows / seconds if seconds else None, 'peak_bytes': peak}
+
+def run_suite(args) -> bool:
+    """
+    对每个数据量（打卡数据为天数，其余为记录数）生成打卡、考勤和流程申请数据，分别测量 process_custom_data、summarize、parse_attendance_data、
+    parse_process_application_data 和 get_day_type，与上次记录的结果比较。
+
+    返回值:
+        bool: 总是返回 True，变慢只给出提示。
+    """
+    sys.path.insert(0, SCRIPT_DIR)
+    import overtime_calculator as calculator
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    previous = {(entry['function'], entry['rows']): entry for entry in load_results(args.output).get('suite', {}).get('results', [])}
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in sizes:
+            clock_in = generate_clock_in_days(args.seed, rows)
+            custom_items = clock_in_to_custom_items(calculator, clock_in)
+            custom_path = os.path.join(directory, f"custom-{rows}.json")
+            with open(custom_path, 'w', encoding='utf-8') as file:
+                json.dump({'hourlyRate': args.rate, 'customData': custom_items}, file, ensure_ascii=False)
+            day_records, _ = calculator.compute_day_records(clock_in, {}, set(), args.rate)
+            attendance = generate_attendance_data(args.seed, rows)
+            leave_records = generate_leave_records(args.seed, rows)
+            dates = [record['TERM'] for record in attendance]
+
+            cases = [
+                ('process_custom_data', len(custom_items), lambda: calculator.process_custom_data(custom_path, args.rate)),
+                ('summarize', len(day_records), lambda: calculator.summarize(day_records, set(), {}, 2, 45)),
+                ('parse_attendance_data', rows, lambda: calculator.parse_attendance_data(attendance)),
+                ('parse_process_application_data', rows, lambda: calculator.parse_process_application_data(leave_records, '')),
+                ('get_day_type', rows, lambda: [calculator.get_day_type(date, {}, set()) for date in dates]),
+            ]
+            for function, count, call in cases:
+                result = dict(measure_function(call, count, args.runs), function=function, size=rows)
+                results.append(result)
+                line = f"{function:<32} {count:>9} 条 {result['ms']:>10.1f} ms {result['rows_per_second'] or 0:>14,.0f} 条/秒 峰值 {result['peak_bytes'] / 1024 / 1024:>8.1f} MB"
+                before = previous.get((function, count))
+                if before and before.get('ms') and result['ms'] > before['ms'] * REGRESSION_RATIO:
+                    line += f"（比上次慢 {result['ms'] / before['ms']:.2f} 倍）"
+                print(line)
+
+    save_results(args.output, 'suite', {'sizes': sizes, 'runs': args.runs, 'results': results})
+    return True
+
+
+# 结果文件
+def load_results(path: str) -> Dict[str, object]:
+    """
+    读取结果文件，不存在或损坏时返回空字典。
+    """
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, json.JSONDecodeError):
+            pass
+    return {}
+
+def save_results(path: str, section: str, data: Dict[str, object]):
+    """
+    把一组基准结果写入结果文件的对应部分，其他部分保持不变。
+
+    参数:
+        path (str): 结果文件路径。
+        section (str): 基准名称，例如 'startup'。
+        data (Dict[str, object]): 基准结果。
+    """
+    results = load_results(path)
+    results[section] = dict(data, timestamp=datetime.now().isoformat(timespec='seconds'),
+                            python=platform.python_version(), machine=platform.machine())
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, ensure_ascii=False, indent=4)
+    print(f"结果已写入 {path}")
+
+
+# 主程序
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='加班计算器性能基准')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    startup_parser = subparsers.add_parser('startup', help='测量 --custom 离线路径的冷启动时间')
+    startup_parser.add_argument('--runs', type=int, default=10, help='测量次数')
+    startup_parser.add_argument('--import-budget', type=float, default=IMPORT_BUDGET_RATIO, help='导入耗时预算（python -c pass 耗时的倍数）')
+    startup_parser.add_argument('--startup-budget', type=float, default=STARTUP_BUDGET_RATIO, help='--custom 启动耗时预算（python -c pass 耗时的倍数）')
+    startup_parser.add_argument('--output', type=str, default=RESULTS_FILE, help='结果文件路径')
+
+    columnar_parser = subparsers.add_parser('columnar', help='对比列式计算与逐行计算的结果和耗时')
+    columnar_parser.add_argument('--employees', type=int, default=100, help='生成的员工数量')
+    columnar_parser.add_argument('--year', type=int, default=2025, help='年份')
+    columnar_parser.add_argument('--rate', type=float, default=20, help='小时工资基数')
+    columnar_parser.add_argument('--seed', type=int, default=1, help='随机种子')
+    columnar_parser.add_argument('--output', type=str, default=RESULTS_FILE, help='结果文件路径')
+
+    records_parser = subparsers.add_parser('records', help='比较每天结果的内存占用并测量汇总速度')
+    records_parser.add_argument('--employees', type=int, default=50, help='生成的员工数量')
+    records_parser.add_argument('--year', type=int, default=2025, help='年份')
+    records_parser.add_argument('--runs', type=int, default=10, help='汇总的重复次数')
+    records_parser.add_argument('--seed', type=int, default=1, help='随机种子')
+    records_parser.add_argument('--output', type=str, default=RESULTS_FILE, help='结果文件路径')
+
+    timeparse_parser = subparsers.add_parser('timeparse', help='打卡时间解析和每天计算的微基准')
+    timeparse_parser.add_argument('--rows', type=int, default=100000, help='生成的行数')
+    timeparse_parser.add_argument('--seed', type=int, default=1, help='随机种子')
+    timeparse_parser.add_argument('--output', type=str, default=RESULTS_FILE, help='结果文件路径')
+
+    suite_parser = subparsers.add_parser('suite', help='各个计算函数在不同数据量下的耗时、吞吐量和内存峰值')
+    suite_parser.add_argument('--sizes', type=str, default=SUITE_SIZES, help='逗号分隔的数据量（打卡数据为天数，其余为记录数）')
+    suite_parser.add_argument('--runs', type=int, default=3, help='每项测量的次数，取最快的一次')
+    suite_parser.add_argument('--rate', type=float, default=20, help='小时工资基数')
+    suite_parser.add_argument('--seed', type=int, default=1, help='随机种子')
+    suite_parser.add_argument('--output', type=str, default=RESULTS_FILE, help='结果文件路径')
+
+    args = parser.parse_args()
+    if args.command == 'startup':
+        sys.exit(0 if run_startup(args) else 1)
+    elif args.command == 'columnar':
+        sys.exit(0 if run_columnar(args) else 1)
+    elif args.command == 'records':
+        sys.exit(0 if run_records(args) else 1)
+    elif args.command == 'timeparse':
+        sys.exit(0 if run_timeparse(args) else 1)
+    elif args.command == 'suite':
+        sys.exit(0 if run_suite(args) else 1)
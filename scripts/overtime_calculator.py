@@ -2,12 +2,12 @@
 # 适用于 深圳佛山桂林
 # 评价部分从之前的html中移植，如有冒犯 雨我无瓜
 # -*- coding: utf-8 -*-
-import sys, os, json, shutil, requests, argparse, platform
+# 只有部分模式用到的库（requests、tabulate、selenium、http.server、并发等）在用到的函数里再导入，
+# --custom 这类纯本地计算不必为网络和浏览器相关的库付出启动时间，见 overtime_benchmark.py startup
+import sys, os, json, threading, argparse, bisect, heapq, re
 import time as t
-from bs4 import BeautifulSoup
-from typing import Dict, Set, Tuple, List, Optional
+from typing import Any, Callable, Dict, Iterable, Set, Tuple, List, Optional
 from datetime import datetime, timedelta, time
-from tabulate import tabulate
 
 
 # 定义路径前缀
@@ -19,18 +19,151 @@ LOCAL_DATA_PATH = 'data/'
 # 这里设置Cookie和配置文件路径
 COOKIES_FILE    = CONFIG_PATH + 'cookies.json'
 CONFIG_FILE     = CONFIG_PATH + 'config.json'
+USER_VARIABLE_CACHE_FILE    = CONFIG_PATH + 'user_variables.json'
+USER_VARIABLE_CACHE_LIMIT   = 20                            # 最多保留多少个员工的用户变量
 
 
-# 请求头信息
+# 会话管理：Cookie 连同过期时间保存在 COOKIES_FILE，快过期时访问门户续期，续期失败才打开浏览器重新登录
+SESSION_REFRESH_PATH    = '/portal/index'                   # 续期时访问的地址，响应中的 Set-Cookie 合并进 Cookie，可用 config.json 的 session_refresh_path 修改
+SESSION_REFRESH_MARGIN  = 10 * 60                           # 距离过期不到这么久（秒）时续期
+SESSION_DEFAULT_TTL     = 2 * 3600                          # quectel_token 中读不出过期时间时，最近一次确认有效后按这么久（秒）过期
+SESSION_RETRY_INTERVAL  = 60                                # 后台续期失败后多久（秒）再试
+
+
+# 节假日缓存，按年保存完整的节假日数据
+HOLIDAY_CACHE_PATH      = LOCAL_DATA_PATH + 'holidays/'
+HOLIDAY_CACHE_VERSION   = 1                                 # 缓存格式变化时递增，旧版本缓存会被忽略
+HOLIDAY_CACHE_TTL       = 7 * 24 * 3600                     # 当年及以后年份的缓存有效期（秒），往年数据不会再变
+HOLIDAY_RETRY_INTERVAL  = 10 * 60                           # 联网失败后，多久内不再重试（秒）
+HOLIDAY_BUNDLED_PATH    = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dicts', 'holidays')
+
+
+# 延时工时扣减表单缓存，按 AUTHKEY 永久保存（已完成的流程不会再变）
+DELAY_DEDUCTION_CACHE_FILE      = LOCAL_DATA_PATH + 'delay_deductions.json'
+DELAY_DEDUCTION_CACHE_VERSION   = 1                         # 含义同 HOLIDAY_CACHE_VERSION
+
+
+# 已完成流程申请的本地缓存，每个员工一个文件，再次运行时只分页获取新增的流程
+PROCESS_APPLICATION_CACHE_PATH      = LOCAL_DATA_PATH + 'process_applications/'
+PROCESS_APPLICATION_CACHE_VERSION   = 1                     # 含义同 HOLIDAY_CACHE_VERSION
+PROCESS_APPLICATION_PAGE_SIZE       = 100                   # 每页获取的流程数
+PROCESS_APPLICATION_PAGE_OVERLAP    = 10                    # 从缓存末尾往前重叠获取的流程数，用来确认列表没有变化
+PROCESS_APPLICATION_FIELDS          = ('ID', 'AUTHKEY', 'ABSTRACTS')    # 缓存中保留的字段
+
+
+# 本地数据库，保存每天的计算结果，再次运行时只重新计算新增或变化的日期
+LOCAL_DB_FILE           = LOCAL_DATA_PATH + 'overtime.db'
+RULES_VERSION           = 2                                 # 计算规则变化时递增，旧规则下保存的结果不再使用
+PUNCH_MONTH_GRACE_DAYS  = 3                                 # 月份结束后这么多天内仍会同步（补卡），之后不再联网
+
+
+# 接口地址，可以用 --hr-url / --holiday-url 或环境变量改为本地的替身服务（scripts/fake_hr_server.py）
+HR_BASE_URL         = os.environ.get('OVERTIME_HR_URL', 'https://hr.quectel.com').rstrip('/')
+HOLIDAY_BASE_URL    = os.environ.get('OVERTIME_HOLIDAY_URL', 'https://timor.tech').rstrip('/')
+
+
+# 请求头信息，HOST/ORIGIN/REFERER 随 HR_BASE_URL 变化，见 set_base_urls
 USER_AGENT  = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36'
-HOST        = 'hr.quectel.com'
-ORIGIN      = 'https://hr.quectel.com'
-REFERER     = 'https://hr.quectel.com/portal/index'
+HOST        = HR_BASE_URL.split('://', 1)[-1]
+ORIGIN      = HR_BASE_URL
+REFERER     = HR_BASE_URL + '/portal/index'
 
 
 # 需要从页面获取的标题
 CLOCK_IN_DATA_TITLE             = '个人考勤查询'
 PROCESS_APPLICATION_DATA_TITLE  = '流程申请'
+PORTAL_LINK_TITLES              = (CLOCK_IN_DATA_TITLE, PROCESS_APPLICATION_DATA_TITLE)
+
+
+# 流式读取 JSON / NDJSON 输入
+JSON_STREAM_CHUNK_SIZE  = 1 << 16                           # 每次从文件读取的字符数
+JSON_STREAM_MAX_VALUE   = 16 << 20                          # 单个值（一条记录）的最大字符数
+
+
+# 输出格式（--format），table 为原来的表格，其余为结构化输出，不渲染表格
+OUTPUT_FORMATS  = ('table', 'json', 'csv', 'ndjson')
+
+
+# 性能剖析（--profile）
+PROFILE_FILE    = OUTPUT_PATH + 'profile.json'
+PROFILE_FORMATS = ('json', 'chrome')                        # chrome 为 Chrome trace-event 格式，可在 chrome://tracing 或 Perfetto 中打开
+
+
+# 常驻服务
+SERVE_HOST      = '127.0.0.1'
+SERVE_PORT      = 8765
+SERVE_MAX_BODY  = 16 * 1024 * 1024                          # 请求体上限（字节）
+
+
+# 日期类型编码，列式计算和 DayRecord 中用整数代替字符串
+DAY_WORKDAY         = 0
+DAY_WEEKEND         = 1
+DAY_HOLIDAY_WEEKEND = 2
+DAY_HOLIDAY         = 3
+DAY_OTHER           = 4                                     # 自定义数据中无法识别的日期类型
+DAY_TYPE_NAMES      = ('工作日', '周末', '节假日(周末)', '节假日', '其他')
+DAY_TYPE_CODES      = {name: code for code, name in enumerate(DAY_TYPE_NAMES)}
+DAY_PAY_RATES       = (20, 30, 30, 60, 0)                   # 与 pay_rate_cal 一致
+
+
+# 打卡时间，统一用当天的秒数表示
+REMOTE_CLOCK_IN_SUFFIX = '(异地打卡)'
+WORK_START_SECONDS  = 9 * 3600                              # 09:00:00，晚于这个时间算迟到
+WORK_END_SECONDS    = 19 * 3600                             # 19:00:00，工作日晚于这个时间算加班
+
+
+# 请假时间线，统一用 0001-01-01 起的分钟数表示；请假只计算每天 09:00-18:00 之内的部分
+LEAVE_WINDOW_START_MINUTES = 9 * 60
+LEAVE_WINDOW_END_MINUTES   = 18 * 60
+LEAVE_TYPES                = ('年假', '事假')
+
+
+# 按自定义节假日数据缓存的日历索引数量（不同的数据各占一个）；按全年数据构建的索引每年一个，不计入
+CALENDAR_INDEX_CACHE_LIMIT = 64
+
+
+# 列式计算，打卡记录超过这么多条且安装了 NumPy 时自动使用
+COLUMNAR_MIN_ROWS = 20000
+
+
+# 并发请求的最大线程数，同一时刻最多对外发起这么多个请求
+FETCH_MAX_WORKERS = 4
+
+
+# 团队批量处理
+BATCH_MAX_WORKERS   = 8                                     # 同时获取数据的员工数
+BATCH_MAX_IN_FLIGHT = 32                                    # 已读入但还没出结果的员工数上限，内存占用与团队规模无关
+
+
+# HTTP 客户端配置
+HTTP_POOL_SIZE          = 10                        # 每个主机保持的长连接数
+HTTP_MAX_RETRIES        = 3                         # 429、5xx 和连接错误的最大重试次数
+HTTP_BACKOFF_BASE       = 0.5                       # 退避基数（秒），第 n 次重试最多等待 base * 2^n
+HTTP_BACKOFF_MAX        = 8.0                       # 单次退避的最大等待时间（秒）
+HTTP_RETRY_AFTER_MAX    = 60.0                      # 429 的 Retry-After 最多遵守这么久（秒）
+HTTP_RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+HTTP_DEFAULT_TIMEOUT    = (5, 30)                   # (连接超时, 读取超时)，单位秒
+HTTP_ENDPOINT_TIMEOUTS  = {
+    'portal':               (5, 30),
+    'clock_in':             (5, 30),
+    'attendance':           (5, 30),
+    'process_application':  (5, 60),                # 完整的流程历史可能很大
+    'delay_deduction':      (5, 20),
+    'holiday':              (3, 5),                 # 有本地缓存兜底，不值得久等
+    'session_refresh':      (5, 15),
+}
+
+
+# 按主机限流（AdaptiveLimiter）：令牌桶限制请求速率，并发上限按 AIMD 随延迟和 429/5xx 调整
+HTTP_RATE_LIMIT             = 20.0                  # 每个主机每秒最多发出的请求数，0 表示不限，可用 --max-rate 修改
+HTTP_RATE_BURST             = 20                    # 令牌桶容量，空闲之后最多连续发出这么多请求（一次多月查询通常不用排队）
+HTTP_MIN_CONCURRENCY        = 1
+HTTP_MAX_CONCURRENCY        = HTTP_POOL_SIZE        # 超过连接池大小的并发只会在连接池里排队
+HTTP_INITIAL_CONCURRENCY    = HTTP_MAX_CONCURRENCY  # 一开始不限制并发，出现拥塞信号后再降下来
+HTTP_AIMD_DECREASE          = 0.5                   # 遇到拥塞信号时并发上限乘以这个系数
+HTTP_SLOW_LATENCY_FACTOR    = 3.0                   # 延迟超过该接口平均延迟的这么多倍算拥塞
+HTTP_SLOW_LATENCY_MIN       = 1.0                   # 低于这个延迟（秒）的响应不算慢，避免本地或很快的接口因抖动降速
+HTTP_LATENCY_EWMA           = 0.2                   # 平均延迟的指数平滑系数
 
 
 # 本地文件操作
@@ -105,19 +238,93 @@ def get_holiday_data_from_local(records: json, holiday_data: json) -> Tuple[Dict
         exit()
 
     if holiday_data:
-        holidays = {}
-        workdays = set()
-        for date, info in holiday_data['holiday'].items():
-            if info['date'][:-3] == records[0]['SHIFTTERM'][:-3]:
-                if info['holiday']:
-                    holidays[info['date']] = info['wage']
-                else:
-                    workdays.add(info['date'])
-        return holidays, workdays
+        return filter_holiday_data(holiday_data, records[0]['SHIFTTERM'][:-3])
     else:
         print("节假日数据文件为空或格式不正确。")
         exit()
 
+def filter_holiday_data(holiday_data: json, year_month: str) -> Tuple[Dict, Set]:
+    """
+    从一整年的节假日数据中筛选出指定月份（或整年）的节假日和调休工作日。
+
+    参数:
+        holiday_data (json): timor.tech 格式的全年节假日数据。
+        year_month (str): 目标年月，格式为 'YYYY-MM'；也可以是 'YYYY'，筛选整年。
+
+    返回值:
+        Tuple[Dict, Set]: 返回一个包含节假日和工作日的元组。
+            - Dict: 节假日数据，键为日期，值为工资倍数。
+            - Set: 工作日数据，包含日期的集合。
+    """
+    holidays = {}
+    workdays = set()
+    for date, info in holiday_data['holiday'].items():
+        if info['date'].startswith(year_month + '-'):
+            if info['holiday']:
+                holidays[info['date']] = info['wage']
+            else:
+                workdays.add(info['date'])
+    return holidays, workdays
+
+def read_holiday_cache(year: int) -> Tuple[Optional[dict], Optional[float]]:
+    """
+    读取本地缓存的全年节假日数据。
+
+    参数:
+        year (int): 年份。
+
+    返回值:
+        Tuple[Optional[dict], Optional[float]]: 节假日数据和缓存写入时间戳。
+            缓存不存在、版本不符或已损坏时返回 (None, None)。
+    """
+    cache_file = f"{HOLIDAY_CACHE_PATH}{year}.json"
+    if not os.path.exists(cache_file):
+        return None, None
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as file:
+            cache = json.load(file)
+    except (OSError, json.JSONDecodeError):
+        return None, None
+    if cache.get('version') != HOLIDAY_CACHE_VERSION or not is_valid_holiday_data(cache.get('data')):
+        return None, None
+    return cache['data'], cache.get('fetched_at', 0)
+
+def save_holiday_cache(year: int, holiday_data: dict):
+    """
+    保存全年节假日数据到本地缓存。
+
+    参数:
+        year (int): 年份。
+        holiday_data (dict): timor.tech 格式的全年节假日数据。
+    """
+    atomic_write_json(f"{HOLIDAY_CACHE_PATH}{year}.json", {'version': HOLIDAY_CACHE_VERSION, 'year': year, 'fetched_at': t.time(), 'data': holiday_data})
+
+def read_bundled_holiday_data(year: int) -> Optional[dict]:
+    """
+    读取随项目附带的 dicts/holidays/{year}.json，作为离线时的最后手段。
+
+    参数:
+        year (int): 年份。
+
+    返回值:
+        Optional[dict]: 节假日数据；没有附带该年份的数据时返回 None。
+    """
+    bundled_file = os.path.join(HOLIDAY_BUNDLED_PATH, f"{year}.json")
+    if not os.path.exists(bundled_file):
+        return None
+    try:
+        with open(bundled_file, 'r', encoding='utf-8') as file:
+            holiday_data = json.load(file)
+    except (OSError, json.JSONDecodeError):
+        return None
+    return holiday_data if is_valid_holiday_data(holiday_data) else None
+
+def is_valid_holiday_data(holiday_data) -> bool:
+    """
+    检查节假日数据是否为可用的 timor.tech 格式。
+    """
+    return isinstance(holiday_data, dict) and holiday_data.get('code', 0) == 0 and isinstance(holiday_data.get('holiday'), dict)
+
 def ensure_directory_exists(file_path):
     """
     确保文件路径的目录存在。如果不存在，则创建它。
@@ -129,16 +336,38 @@ def ensure_directory_exists(file_path):
     if not os.path.exists(directory):
         os.makedirs(directory)
 
-def save_cookie(cookie):
+def atomic_write_json(path: str, data, mode: int = 0o666):
+    """
+    把 data 写成 JSON 文件。先写同目录下的临时文件再替换，并发读取（其他线程、进程或后台续期）不会读到写了一半的文件。
+
+    参数:
+        path (str): 文件路径，目录不存在时自动创建。
+        data: 可以序列化为 JSON 的数据。
+        mode (int): 新建文件的权限（受 umask 影响），例如 Cookie 文件使用 0o600。
+    """
+    ensure_directory_exists(path)
+    temp_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode), 'w', encoding='utf-8') as file:
+        json.dump(data, file, ensure_ascii=False)
+    os.replace(temp_file, path)
+
+def save_cookie(cookie, expires_at: Optional[float] = None, refreshed_at: Optional[float] = None):
     """
-    保存 Cookie 到 COOKIE_FILE。
+    保存 Cookie 到 COOKIE_FILE，文件只有当前用户可读写。
 
     参数:
-        cookie (dict): 要保存的 Cookie。
+        cookie (str): 要保存的 Cookie。
+        expires_at (Optional[float]): 过期时间（Unix 时间戳），未知时为 None。
+        refreshed_at (Optional[float]): 最近一次确认 Cookie 有效的时间，默认为现在。
+    """
+    atomic_write_json(COOKIES_FILE, {'user_cookie': cookie, 'expires_at': expires_at, 'refreshed_at': t.time() if refreshed_at is None else refreshed_at}, 0o600)
+
+def get_session_refresh_url() -> str:
+    """
+    从 CONFIG_FILE 中读取会话续期地址（session_refresh_path，可以是路径或完整 URL），默认为 SESSION_REFRESH_PATH。
     """
-    ensure_directory_exists(COOKIES_FILE)
-    with open(COOKIES_FILE, 'w', encoding='utf-8') as file:
-        json.dump({'user_cookie': cookie}, file)
+    path = read_config().get('session_refresh_path') or SESSION_REFRESH_PATH
+    return path if '://' in path else HR_BASE_URL + '/' + path.lstrip('/')
 
 def save_config(config_data):
     """
@@ -174,520 +403,2937 @@ def save_process_application_api_endpoint_to_config(config_data):
     save_config(config)
 
 
-# 在线获取
-def get_holiday_data_online(records: json) -> Tuple[Dict, Set]:
+def cookie_fingerprint(user_cookie) -> str:
     """
-    在线获取指定年份的节假日数据。
+    计算 Cookie 的指纹，用作缓存的键，避免把 Cookie 明文写进缓存文件。
 
     参数:
-        records (json): 包含打卡记录的 JSON 数据。
+        user_cookie: 用户的 Cookie 信息。
 
     返回值:
-        Tuple[Dict, Set]: 返回一个包含节假日和工作日的元组。
-            - Dict: 节假日数据，键为日期，值为工资倍数。
-            - Set: 工作日数据，包含日期的集合。
-
-    异常:
-        SystemExit: 如果数据文件为空或格式不正确。
+        str: Cookie 的 SHA-256 摘要前 16 位。
     """
-    if records:
-        sample_date = records[0]['SHIFTTERM']
-        year = sample_date.split('-')[0]
-    else:
-        print("数据文件为空或格式不正确。")
-        exit()
-    headers = {
-        'User-Agent': USER_AGENT
-    }
-    try:
-        api_url = f'https://timor.tech/api/holiday/year/{year}'
-        response = requests.get(api_url, headers=headers)
-        response.raise_for_status()
-        holiday_data = response.json()
-    except requests.exceptions.RequestException as e:
-        print(f"请求失败: {e}")
-        holiday_data = None
-    except json.JSONDecodeError as e:
-        print(f"JSON解析失败: {e}")
-        holiday_data = None
-    if holiday_data:
-        holidays = {}
-        workdays = set()
-        for date, info in holiday_data['holiday'].items():
-            if info['date'][:-3] == records[0]['SHIFTTERM'][:-3]:
-                if info['holiday']:
-                    holidays[info['date']] = info['wage']
-                else:
-                    workdays.add(info['date'])
-    return holidays, workdays
+    import hashlib
 
-def get_user_variable_online(user_cookie, title=CLOCK_IN_DATA_TITLE):
+    return hashlib.sha256(str(user_cookie).encode('utf-8')).hexdigest()[:16]
+
+def employee_key(user_cookie) -> str:
     """
-    从用户的 Cookie 信息中获取指定标题的用户变量。
+    确定 Cookie 对应的员工，用作本地数据库中的键。
 
-    参数：
-        user_cookie：用户的 Cookie 信息，用于身份验证。
-        title：链接的标题，例如 '个人考勤查询' 或 '流程申请'。
+    参数:
+        user_cookie: 用户的 Cookie 信息。
 
-    返回值：
-        指定标题的用户变量。
+    返回值:
+        str: Cookie 中的 MCHRID（员工编号），没有时使用 Cookie 的指纹。
     """
-    # 如果 user_cookie 是字符串，则将其转换为字典
-    # if isinstance(user_cookie, str):
-    #     user_cookie = dict(item.strip().split("=", 1) for item in user_cookie.split(";"))
+    for item in str(user_cookie).split(';'):
+        name, _, value = item.strip().partition('=')
+        if name == 'MCHRID' and value:
+            return value
+    return cookie_fingerprint(user_cookie)
 
-    session = requests.Session()
-    session.headers.update({
-        'Host': HOST,
-        'Origin': ORIGIN,
-        'Referer': REFERER,
-        'User-Agent': USER_AGENT,
-        "Cookie": user_cookie
-    })
-    # 直接更新会话的 Cookie
-    # session.cookies.update(user_cookie)
+def read_user_variable_cache() -> Dict[str, Dict[str, str]]:
+    """
+    读取 USER_VARIABLE_CACHE_FILE。
 
-    url = "https://hr.quectel.com/portal/index"
-    response = session.get(url)
+    返回值:
+        Dict[str, Dict[str, str]]: 键为员工（见 employee_key），值为 {标题: 用户变量}；文件不存在或损坏时返回空字典。
+    """
+    if os.path.exists(USER_VARIABLE_CACHE_FILE):
+        try:
+            with open(USER_VARIABLE_CACHE_FILE, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, json.JSONDecodeError):
+            pass
+    return {}
 
-    if response.status_code != 200:
-        raise ValueError(f"请求失败: {response.status_code}")
+def save_user_variable_cache(cache: Dict[str, Dict[str, str]]):
+    """
+    保存用户变量缓存到 USER_VARIABLE_CACHE_FILE，只保留最近的 USER_VARIABLE_CACHE_LIMIT 个员工。
 
-    soup = BeautifulSoup(response.text, 'html.parser')
-    link = soup.find('a', {'title': title})
+    参数:
+        cache (Dict[str, Dict[str, str]]): 键为员工（见 employee_key），值为 {标题: 用户变量}。
+    """
+    # dict 保持插入顺序，最新写入的在最后
+    while len(cache) > USER_VARIABLE_CACHE_LIMIT:
+        cache.pop(next(iter(cache)))
+    atomic_write_json(USER_VARIABLE_CACHE_FILE, cache)
 
-    if link is None:
-        print(f"response = {response.text}")
-        print(f"link = {link}")
-        raise ValueError(f"未找到标题为 '{title}' 的链接")
-        print(response.text)
-        
-    
-    href = link['href']
-    user_variable = href[href.index('!')+1:]
-    return user_variable
+_user_variable_lock = threading.Lock()
 
-def get_clock_in_data(user_variable, user_cookie, target_month, target_year):
+def get_cached_user_variable(user_cookie, title) -> Optional[str]:
     """
-    从指定网页获取个人打卡查询数据。
+    从缓存中获取指定 Cookie 所属员工和标题对应的用户变量，没有时返回 None。
 
-    参数：
-        - user_variable：用户变量，用于构建 URL。
-        - user_cookie：用户的 Cookie 信息，用于身份验证。
-        - target_month：目标月份，格式为数字，例如 9 表示九月。
-        - target_year（可选）：目标年份。
+    按员工（MCHRID）而不是 Cookie 指纹查找，会话续期换了 token 之后缓存仍然有效。用户变量只是门户链接中
+    员工固定的路径参数，不是凭据：每个请求仍然带着完整的 Cookie，由 HR 系统鉴权。MCHRID 与会话不符或用户变量
+    已经失效时，HR 接口返回认证错误，post_hr_json 和门户请求会调用 invalidate_user_variables 清除这个员工的缓存。
+    """
+    with _user_variable_lock:
+        return read_user_variable_cache().get(employee_key(user_cookie), {}).get(title)
 
-    返回值：
-        服务器响应的 JSON 数据，包含个人打卡查询结果。
+def cache_user_variables(user_cookie, user_variables: Dict[str, str]):
     """
-    # 确保 target_month 是两位数格式
-    target_month = f"{int(target_month):02d}"
-    
-    # 220302: 个人打卡查询
-    url = f"https://hr.quectel.com/ajax/function/alist!{user_variable}.220302"
-    user_cookie = str(user_cookie)  # 强制转换为字符串
-    payload = json.dumps({
-        "appParam": {"TERM": f"{target_year}-{target_month}-01T00:00:00.000Z"},
-        "appFnKey": "SE0302",
-        "formData": {}
-    })
-    headers = {
-        'Host': HOST,
-        'Origin': ORIGIN,
-        'Referer': REFERER,
-        'User-Agent': USER_AGENT,
-        'Cookie': user_cookie,
-        'Content-Type': 'application/json'
-    }
-    response = requests.request("POST", url, headers=headers, data=payload)
-    
-    return response.json()
+    缓存一个 Cookie 所属员工的用户变量。
 
-def get_attendance_data(user_variable, user_cookie, target_month, target_year):
+    参数:
+        user_cookie: 用户的 Cookie 信息。
+        user_variables (Dict[str, str]): {标题: 用户变量}。
     """
-    从指定网页获取个人考勤查询数据。
+    with _user_variable_lock:
+        cache = read_user_variable_cache()
+        key = employee_key(user_cookie)
+        entry = cache.pop(key, {})
+        entry.update(user_variables)
+        cache[key] = entry
+        try:
+            save_user_variable_cache(cache)
+        except OSError as e:
+            print(f"保存用户变量缓存失败: {e}")
 
-    参数：
-        - user_variable：用户变量，用于构建 URL。
-        - user_cookie：用户的 Cookie 信息，用于身份验证。
-        - target_month：目标月份，格式为数字，例如 9 表示九月。
-        - target_year：目标年份。
+def invalidate_user_variables(user_cookie):
+    """
+    删除一个 Cookie 所属员工的全部用户变量缓存，在 HR 接口返回认证错误时调用。
 
-    返回值：
-        服务器响应的 JSON 数据，包含个人考勤查询结果。
+    参数:
+        user_cookie: 用户的 Cookie 信息。
     """
-    # 确保 target_month 是两位数格式
-    target_month = f"{int(target_month):02d}"
-    
-    # 220398: 个人考勤查询
-    url = f"https://hr.quectel.com/ajax/function/alist!{user_variable}.220398"
-    user_cookie = str(user_cookie)  # 强制转换为字符串
-    payload = json.dumps({
-        "appParam": {"TERM": f"{target_year}-{target_month}-01T00:00:00.000Z"},
-        "appFnKey": "SE0398",
-        "formData": {}
-    })
-    headers = {
-        'Host': HOST,
-        'Origin': ORIGIN,
-        'Referer': REFERER,
-        'User-Agent': USER_AGENT,
-        'Cookie': user_cookie,
-        'Content-Type': 'application/json'
-    }
-    response = requests.request("POST", url, headers=headers, data=payload)
-    
-    return response.json()
+    with _user_variable_lock:
+        cache = read_user_variable_cache()
+        if cache.pop(employee_key(user_cookie), None) is not None:
+            try:
+                save_user_variable_cache(cache)
+            except OSError as e:
+                print(f"保存用户变量缓存失败: {e}")
 
-def get_process_application_data(user_variable, user_cookie):
+def read_process_application_cache(employee: str) -> List[Dict[str, str]]:
     """
-    从指定网页获取审批流程中的请假数据，事假可以用加班抵扣，年假就不计算迟到。
+    读取一个员工已缓存的流程申请记录。
 
-    参数：
-    - user_variable：用户变量，用于构建 URL。
-    - user_cookie：用户的 Cookie 信息，用于身份验证。
+    参数:
+        employee (str): 员工，见 employee_key。
 
-    返回值：
-    - 服务器响应的 JSON 数据，包含个人流程审批查询结果。
+    返回值:
+        List[Dict[str, str]]: 按接口顺序排列的流程申请记录（只包含 PROCESS_APPLICATION_FIELDS）；
+            缓存不存在、版本不符或已损坏时返回空列表。
     """
-    # 290104: 已完成流程申请查询
-    url = f"https://hr.quectel.com/ajax/function/alist!{ user_variable }.290104"
-    user_cookie = str(user_cookie)  # 强制转换为字符串
-    payload = json.dumps({
-        "searchcols": "",
-        "order": "asc",
-        "limit": 0,
-        "offset": 0,
-        "total": 0,
-        "editType": 0,
-        "form": {
-            "appParam": {
-            "TREEID": 7
-            },
-            "appFnKey": "SW0104",
-            "formData": {
-                "SW0101": {
-                    "fnparam": {},
-                    "data": [
-                    {
-                        "E_EXTATTR": "SW0102,SW0104,SE0348",
-                        "FINISHNUM": "0",
-                        "VALID": "1",
-                        "NEWNUM": "0",
-                        "PID": "1000",
-                        "RETURNNUM": "0",
-                        "K_PKEYS": "CTdI8IsausezsJ_zJEHwGQ",
-                        "K_LOCKED": "",
-                        "K_EXTRAS": "ld5OMqeQ9gwmyA5ArfvbdA",
-                        "EMPID": "16326",
-                        "AUTHKEY": "ODJ26UDjT_siqMi42VPqog",
-                        "INAPPNUM": "0",
-                        "TITLE": "请假申请",
-                        "ID": "7"
-                    }
-                    ],
-                "old": [],
-                "bnparam": {}
-                }
-            }
-        }
-    })
-    headers = {
-        'Host': HOST,
-        'Origin': ORIGIN,
-        'Referer': REFERER,
-        'User-Agent': USER_AGENT,
-        'Cookie': user_cookie,
-        'Content-Type': 'application/json'
-    }
-    response = requests.request("POST", url, headers=headers, data=payload)
-    
-    return response.json()
+    cache_file = f"{PROCESS_APPLICATION_CACHE_PATH}{employee}.json"
+    if not os.path.exists(cache_file):
+        return []
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as file:
+            cache = json.load(file)
+    except (OSError, json.JSONDecodeError):
+        return []
+    if not isinstance(cache, dict) or cache.get('version') != PROCESS_APPLICATION_CACHE_VERSION or not isinstance(cache.get('records'), list):
+        return []
+    return cache['records']
+
+def save_process_application_cache(employee: str, records: List[Dict[str, str]]):
+    """
+    保存一个员工的流程申请记录。
 
-def get_delay_deduction_data(auth_key, user_cookie):
+    参数:
+        employee (str): 员工，见 employee_key。
+        records (List[Dict[str, str]]): 按接口顺序排列的流程申请记录。
     """
-    通过 AUTHKEY 获取延时工时扣减的数据
+    atomic_write_json(f"{PROCESS_APPLICATION_CACHE_PATH}{employee}.json", {'version': PROCESS_APPLICATION_CACHE_VERSION, 'fetched_at': t.time(), 'records': records})
 
-    参数：
-    - auth_key：流程申请中项目的 AUTHKEY，用于构建 URL。
-    - user_cookie：用户的 Cookie 信息，用于身份验证。
+_delay_deduction_lock = threading.Lock()
 
-    返回值：
-    - 服务器响应的 JSON 数据，包含延时工时扣减申请审批查询结果。
+def read_delay_deduction_cache() -> Dict[str, List[List[str]]]:
     """
-    # 290104: 已完成流程申请查询
-    url = f"https://hr.quectel.com/ajax/flowform/formlist!{ auth_key }"
-    user_cookie = str(user_cookie)  # 强制转换为字符串
-    payload = json.dumps({
-        "formData": {},
-        "bizData": {},
-        "bizFnKey": 'null',
-        "comments": 'null',
-        "fileIds": 'null',
-        "signData": 'null',
-        "receivers": 'null',
-        "freeNode": 'null'
-    })
-    headers = {
-        'Host': HOST,
-        'Origin': ORIGIN,
-        'Referer': REFERER,
-        'User-Agent': USER_AGENT,
-        'Cookie': user_cookie,
-        'Content-Type': 'application/json'
-    }
-    response = requests.request("POST", url, headers=headers, data=payload)
-    
-    return response.json()
+    读取 DELAY_DEDUCTION_CACHE_FILE。
 
-
-# 浏览器操作
-def validate_user_cookie(user_cookie):
+    返回值:
+        Dict[str, List[List[str]]]: 键为 AUTHKEY，值为表单中的 [CARDBEGINTIME, CARDENDTIME] 列表；
+            文件不存在、版本不符或已损坏时返回空字典。
     """
-    验证用户的 Cookie 是否包含所有必需的字段。
-
-    参数：
-        user_cookie：用户的 Cookie 字符串。
-
-    返回值：
-        如果包含所有必需字段，返回 True；否则返回 False。
+    if not os.path.exists(DELAY_DEDUCTION_CACHE_FILE):
+        return {}
+    try:
+        with open(DELAY_DEDUCTION_CACHE_FILE, 'r', encoding='utf-8') as file:
+            cache = json.load(file)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    if not isinstance(cache, dict) or cache.get('version') != DELAY_DEDUCTION_CACHE_VERSION or not isinstance(cache.get('forms'), dict):
+        return {}
+    return cache['forms']
+
+def save_delay_deduction_forms(forms: Dict[str, List[List[str]]]):
     """
-    required_fields = [
-        'quectel_lang',
-        'quectel_token',
-        'quectel_refresh_token',
-        'quectel_user_info',
-        'MCLGID',
-        'MCHRID',
-        'ENMAME',
-        'EMPTYPE'
-    ]
+    把新获取的延时工时扣减表单合并进 DELAY_DEDUCTION_CACHE_FILE。
 
-    # 将 Cookie 字符串转换为字典
-    cookie_dict = dict(item.strip().split("=") for item in user_cookie.split(";"))
+    参数:
+        forms (Dict[str, List[List[str]]]): 键为 AUTHKEY，值为 [CARDBEGINTIME, CARDENDTIME] 列表。
+    """
+    with _delay_deduction_lock:
+        cache = read_delay_deduction_cache()
+        cache.update(forms)
+        atomic_write_json(DELAY_DEDUCTION_CACHE_FILE, {'version': DELAY_DEDUCTION_CACHE_VERSION, 'forms': cache})
 
-    # 检查是否包含所有必需字段
-    for field in required_fields:
-        if field not in cookie_dict:
+class JsonStream:
+    """
+    从文本文件中按块读取并逐个解码 JSON 值，内存占用只与单个值的大小有关。
+    """
+    def __init__(self, file):
+        self.file = file
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        """
+        再读取一块内容，已经读到文件末尾时返回 False。
+        """
+        if self.eof:
             return False
-    return True
-
-def fetch_cookie_via_browser(browser='auto'):
+        chunk = self.file.read(JSON_STREAM_CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        if len(self.buffer) > JSON_STREAM_MAX_VALUE:
+            raise ValueError("输入中的单个 JSON 值过大")
+        return True
+
+    def peek(self) -> str:
+        """
+        跳过空白，返回下一个字符但不消耗它，到达文件末尾时返回空字符串。
+        """
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position].isspace():
+                self.position += 1
+            if self.position < len(self.buffer) or not self._fill():
+                return self.buffer[self.position:self.position + 1]
+
+    def expect(self, char: str):
+        """
+        消耗下一个非空白字符，它必须是 char。
+        """
+        if self.peek() != char:
+            raise ValueError(f"JSON 格式不正确：应为 {char!r}")
+        self.position += 1
+
+    def decode(self):
+        """
+        解码下一个 JSON 值。值可能跨越多个块，解码失败时先补充内容再重试。
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                # 数字没有结束符，停在块的末尾或者停在 '.'、'e' 等处（例如 "27." 之后的 "125" 还没读到）时可能还没读完
+                if self.eof or (end < len(self.buffer) and not (type(value) in (int, float) and self.buffer[end] in '.eE+-0123456789')):
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+def iter_json_records(file, container_key: Optional[str] = None):
     """
-    启动浏览器获取 Cookie 并返回。
+    逐条读取 JSON 数组、NDJSON 或者包含记录数组的 JSON 对象，不会一次载入整个文件。
+
+    第一个非空白字符为 '[' 时按 JSON 数组读取；否则按一个接一个的 JSON 值读取（NDJSON，
+    或者跨多行的单个 JSON 对象），只看输入格式，与读取的块大小无关。
 
     参数:
-        browser (str): 使用的浏览器类型 ('chrome', 'edge', 'auto')。默认为 'auto'。
+        file: 以文本方式打开的文件（也可以是标准输入）。
+        container_key (Optional[str]): 记录数组在 JSON 对象中的键，例如 'customData'。
 
     返回值:
-        str: 获取到的 Cookie 字符串，如果成功；否则返回 None。
+        生成器，依次产出 (类型, 值)：
+            - ('record', 记录)：顶层数组中的元素，或者顶层的 JSON 值（指定 container_key 时不含 'date' 的对象除外）；
+            - ('item', 记录)：顶层 JSON 对象里 container_key 数组中的元素，逐个解码；
+            - ('field', (键, 值))：上述对象中 container_key 以外的字段，以及不含 'date' 的对象中的字段。
+
+    异常:
+        ValueError: JSON 格式不正确或输入被截断。
     """
-    if browser == 'auto':
-        # 自动检测 Chrome 或 Edge 浏览器是否存在
-        print(f"您的系统为 {platform.system()}，正在检测 Chrome 或 Edge 浏览器是否安装...")
-        chrome_path = None
-        if platform.system() == 'Windows':
-            system_drive = os.getenv('SystemDrive', 'C:')
-            # 需要在Program Files前面添加斜杠，不然获取到的路径不正确
-            chrome_path = os.path.join(system_drive, "\\Program Files", "Google", "Chrome", "Application", "chrome.exe")
-            if os.path.exists(chrome_path):
-                browser = 'chrome'
-            else:
-                browser = 'edge'
-        elif platform.system() == 'Linux':
-            if shutil.which("google-chrome") or shutil.which("chromium-browser"):
-                browser = 'chrome'
-            elif shutil.which("microsoft-edge"):
-                browser = 'edge'
-            else:
-                print("未找到 Chrome 或 Edge 浏览器，请至少安装其中一种浏览器。")
-                exit()
-        elif platform.system() == 'Darwin':  # macOS
-            if os.path.exists("/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"):
-                browser = 'chrome'
-            elif os.path.exists("/Applications/Microsoft Edge.app/Contents/MacOS/Microsoft Edge"):
-                browser = 'edge'
-            else:
-                print("未找到 Chrome 或 Edge 浏览器，请至少安装其中一种浏览器。")
-                exit()
+    stream = JsonStream(file)
+    if stream.peek() == '[':
+        stream.expect('[')
+        if stream.peek() == ']':
+            stream.expect(']')
         else:
-            print("未知的操作系统。")
-            exit()
+            while True:
+                yield 'record', stream.decode()
+                if stream.peek() != ',':
+                    break
+                stream.expect(',')
+            stream.expect(']')
+        if stream.peek():
+            raise ValueError("JSON 格式不正确：数组之后还有内容")
+        return
+
+    while stream.peek():
+        if container_key is not None and stream.peek() == '{':
+            yield from _iter_json_object(stream, container_key)
+        else:
+            yield 'record', stream.decode()
 
-    if browser == 'edge':
-        options = EdgeOptions()
-        service = EdgeService(EdgeChromiumDriverManager().install())
+def _iter_json_object(stream: JsonStream, container_key: str):
+    """
+    逐个字段读取一个 JSON 对象，container_key 数组中的元素逐个解码，见 iter_json_records。
+
+    数组之前的字段先暂存，读到数组时再产出；没有数组的对象读完后，含 'date' 的整体作为一条记录，否则逐个产出字段。
+    """
+    stream.expect('{')
+    fields = {}
+    streamed = False
+    if stream.peek() != '}':
+        while True:
+            key = stream.decode()
+            if not isinstance(key, str):
+                raise ValueError("JSON 格式不正确：对象的键应为字符串")
+            stream.expect(':')
+            if key == container_key and stream.peek() == '[':
+                yield from (('field', field) for field in fields.items())
+                fields = {}
+                streamed = True
+                stream.expect('[')
+                if stream.peek() != ']':
+                    while True:
+                        yield 'item', stream.decode()
+                        if stream.peek() != ',':
+                            break
+                        stream.expect(',')
+                stream.expect(']')
+            elif streamed:
+                yield 'field', (key, stream.decode())
+            else:
+                fields[key] = stream.decode()
+            if stream.peek() != ',':
+                break
+            stream.expect(',')
+    stream.expect('}')
+    if streamed:
+        return
+    if 'date' in fields:
+        yield 'record', fields
     else:
-        options = ChromeOptions()
-        service = ChromeService(ChromeDriverManager().install())
+        yield from (('field', field) for field in fields.items())
 
-    # 添加必要的浏览器选项
-    options.add_experimental_option("excludeSwitches", ["enable-automation"])
-    options.add_experimental_option('useAutomationExtension', False)
+def find_json_field(path: str, container_key: str, key: str) -> Optional[Any]:
+    """
+    在 iter_json_records 能读取的文件中查找 container_key 数组以外的字段 key，返回第一次出现的值。
 
-    print(f"正在启动{browser}浏览器以获取Cookie...")
-    driver = webdriver.Chrome(service=service, options=options) if browser == 'chrome' else webdriver.Edge(service=service, options=options)
-    driver.get("https://hr.quectel.com")
+    数组中的记录逐个解码后丢弃，不做计算，内存占用只与单条记录的大小有关。
 
-    print("请在打开的浏览器中登录网站，获取到了Cookie会自动退出...")
+    参数:
+        path (str): 文件路径（不能是标准输入，需要重新打开读取）。
+        container_key (str): 记录数组在 JSON 对象中的键，例如 'customData'。
+        key (str): 要查找的字段，例如 'hourlyRate'。
 
-    while True:
+    返回值:
+        Optional[Any]: 字段的值，没有该字段时返回 None。
+    """
+    with open_input(path) as file:
+        for kind, value in iter_json_records(file, container_key):
+            if kind == 'field' and value[0] == key:
+                return value[1]
+    return None
+
+class ResultStore:
+    """
+    每天计算结果的本地存储（SQLite）。
+
+    每行以 (员工, 日期) 为主键，同时保存当天打卡记录的摘要和计算规则版本，
+    只有摘要和版本都相同时才复用保存的结果，否则重新计算并覆盖。
+    """
+    def __init__(self, path: str = LOCAL_DB_FILE):
+        import sqlite3
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS day_results (
+                employee        TEXT NOT NULL,
+                date            TEXT NOT NULL,
+                punch_hash      TEXT NOT NULL,
+                rules_version   INTEGER NOT NULL,
+                start_time      TEXT NOT NULL,
+                end_time        TEXT NOT NULL,
+                day_type        INTEGER NOT NULL,
+                rate            INTEGER NOT NULL,
+                overtime        REAL NOT NULL,
+                overtime_pay    REAL NOT NULL,
+                allowance       INTEGER NOT NULL,
+                total_income    REAL NOT NULL,
+                late_minutes    REAL NOT NULL,
+                PRIMARY KEY (employee, date)
+            )""")
+        self.connection.commit()
+
+    def load_day_results(self, employee: str, first_date: str, last_date: str) -> Dict[str, Tuple[str, 'DayRecord']]:
+        """
+        读取一个员工在日期范围内、当前规则版本下保存的结果。
+
+        参数:
+            employee (str): 员工，见 employee_key。
+            first_date (str): 起始日期（包含），格式为 'YYYY-MM-DD'。
+            last_date (str): 结束日期（包含）。
+
+        返回值:
+            Dict[str, Tuple[str, DayRecord]]: 日期 -> (打卡摘要, 计算结果)。
+        """
+        rows = self.connection.execute("""
+            SELECT date, punch_hash, start_time, end_time, day_type, rate, overtime, overtime_pay, allowance, total_income, late_minutes
+            FROM day_results WHERE employee = ? AND date BETWEEN ? AND ? AND rules_version = ?""",
+            (employee, first_date, last_date, RULES_VERSION))
+        return {row[0]: (row[1], DayRecord(row[0], *row[2:])) for row in rows}
+
+    def save_day_results(self, employee: str, results: List[Tuple[str, 'DayRecord']]):
+        """
+        保存（覆盖）一个员工若干天的结果。
+
+        参数:
+            employee (str): 员工，见 employee_key。
+            results (List[Tuple[str, DayRecord]]): (打卡摘要, 计算结果) 的列表。
+        """
+        with self.connection:
+            self.connection.executemany("""
+                INSERT OR REPLACE INTO day_results
+                (employee, date, punch_hash, rules_version, start_time, end_time, day_type, rate, overtime, overtime_pay, allowance, total_income, late_minutes)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                [(employee, record.date, punch_hash, RULES_VERSION, record.start_time, record.end_time, record.day_type, record.rate,
+                  record.overtime, record.overtime_pay, record.allowance, record.total_income, record.late_minutes)
+                 for punch_hash, record in results])
+
+    def close(self):
+        self.connection.close()
+
+class PunchWarehouse:
+    """
+    原始打卡记录的本地仓库（SQLite），与 ResultStore 使用同一个数据库文件。
+
+    已经结束（超过 PUNCH_MONTH_GRACE_DAYS 天）并同步过的月份标记为不可变，之后直接读取本地数据，不再联网；
+    其他月份每次联网获取后只写入新增的打卡记录（以及顺序变化、已被删除的记录）。
+    只保存计算用到的 SHIFTTERM 和 CARDTIME，按接口返回的顺序读出。
+    多个月份会在不同线程中同时获取，所有操作都在锁内进行。
+    """
+    def __init__(self, path: str = LOCAL_DB_FILE):
+        import sqlite3
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS punches (
+                    employee    TEXT NOT NULL,
+                    year_month  TEXT NOT NULL,
+                    shift_term  TEXT NOT NULL,
+                    card_time   TEXT NOT NULL,
+                    seq         INTEGER NOT NULL,
+                    PRIMARY KEY (employee, year_month, shift_term, card_time)
+                )""")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS punch_months (
+                    employee    TEXT NOT NULL,
+                    year_month  TEXT NOT NULL,
+                    synced_at   REAL NOT NULL,
+                    immutable   INTEGER NOT NULL,
+                    PRIMARY KEY (employee, year_month)
+                )""")
+
+    def read_month(self, employee: str, year_month: str) -> List[Dict[str, str]]:
+        """
+        读取一个员工一个月的打卡记录，格式与 get_clock_in_data 返回的记录相同（只包含 SHIFTTERM 和 CARDTIME）。
+        """
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT shift_term, card_time FROM punches WHERE employee = ? AND year_month = ? ORDER BY seq",
+                (employee, year_month)).fetchall()
+        return [{'SHIFTTERM': shift_term, 'CARDTIME': card_time} for shift_term, card_time in rows]
+
+    def is_immutable(self, employee: str, year_month: str) -> bool:
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT immutable FROM punch_months WHERE employee = ? AND year_month = ?", (employee, year_month)).fetchone()
+        return bool(row and row[0])
+
+    def has_month(self, employee: str, year_month: str) -> bool:
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT 1 FROM punch_months WHERE employee = ? AND year_month = ?", (employee, year_month)).fetchone()
+        return row is not None
+
+    def sync_month(self, employee: str, year_month: str, records: List[Dict[str, Any]], immutable: bool) -> int:
+        """
+        用刚获取到的一个月的打卡记录更新仓库。
+
+        参数:
+            employee (str): 员工，见 employee_key。
+            year_month (str): 月份，格式为 'YYYY-MM'。
+            records (List[Dict[str, Any]]): get_clock_in_data 的返回值。
+            immutable (bool): 是否把这个月标记为不可变。
+
+        返回值:
+            int: 新增的打卡记录数。
+        """
+        fetched = {}
+        for seq, record in enumerate(records):
+            fetched.setdefault((record['SHIFTTERM'], record['CARDTIME']), seq)
+        with self._lock, self.connection:
+            stored = {(shift_term, card_time): seq for shift_term, card_time, seq in self.connection.execute(
+                "SELECT shift_term, card_time, seq FROM punches WHERE employee = ? AND year_month = ?", (employee, year_month))}
+            upserts = [(employee, year_month, shift_term, card_time, seq)
+                       for (shift_term, card_time), seq in fetched.items() if stored.get((shift_term, card_time)) != seq]
+            removed = [(employee, year_month, shift_term, card_time) for shift_term, card_time in stored.keys() - fetched.keys()]
+            self.connection.executemany("""
+                INSERT INTO punches (employee, year_month, shift_term, card_time, seq) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (employee, year_month, shift_term, card_time) DO UPDATE SET seq = excluded.seq""", upserts)
+            self.connection.executemany(
+                "DELETE FROM punches WHERE employee = ? AND year_month = ? AND shift_term = ? AND card_time = ?", removed)
+            self.connection.execute(
+                "INSERT OR REPLACE INTO punch_months (employee, year_month, synced_at, immutable) VALUES (?, ?, ?, ?)",
+                (employee, year_month, t.time(), int(immutable)))
+        return sum(1 for key in fetched if key not in stored)
+
+    def clock_in_data(self, employee: str, target_year: int, target_month: int, fetch: Callable, fetch_args: tuple) -> List[Dict[str, str]]:
+        """
+        获取一个月的打卡记录：不可变的月份直接读取本地数据，其他月份联网获取并同步到仓库。
+
+        参数:
+            employee (str): 员工，见 employee_key。
+            target_year (int): 目标年份。
+            target_month (int): 目标月份。
+            fetch (Callable): 联网获取打卡记录的函数，通常为 get_clock_in_data。
+            fetch_args (tuple): fetch 的参数。
+
+        返回值:
+            List[Dict[str, str]]: 打卡记录。
+
+        异常:
+            HrAuthError: 认证失败，由调用方重新获取用户变量。
+            联网失败且本地没有这个月的数据时抛出 fetch 的异常。
+        """
+        import sqlite3
+
+        year_month = f"{target_year}-{target_month:02d}"
         try:
-            cookies = driver.get_cookies()
-            cookie_str = "; ".join(f"{cookie['name']}={cookie['value']}" for cookie in cookies)
-            if validate_user_cookie(cookie_str):
-                driver.quit()
-                return cookie_str
+            if self.is_immutable(employee, year_month):
+                return self.read_month(employee, year_month)
+        except sqlite3.Error as e:
+            print(f"读取本地打卡记录失败: {e}")
+            return fetch(*fetch_args)
+
+        try:
+            records = fetch(*fetch_args)
+        except HrAuthError:
+            raise
         except Exception as e:
-            print(f"获取Cookie时出错: {e}")
-            # 不关闭浏览器，继续等待用户登录
-        t.sleep(1)  # 等待一秒后重新检查
+            if not self.has_month(employee, year_month):
+                raise
+            print(f"获取 {year_month} 打卡数据失败，使用本地保存的记录: {str(e)}")
+            return self.read_month(employee, year_month)
 
+        month_end = datetime(target_year + target_month // 12, target_month % 12 + 1, 1)
+        immutable = datetime.now() >= month_end + timedelta(days=PUNCH_MONTH_GRACE_DAYS)
+        try:
+            self.sync_month(employee, year_month, records, immutable)
+        except sqlite3.Error as e:
+            print(f"保存本地打卡记录失败: {e}")
+        return records
 
-# 逻辑部分
-def get_day_type(date: str, holidays: Dict[str, int], workdays: Set[str]) -> str:
+    def close(self):
+        self.connection.close()
+
+def open_result_store() -> Optional[ResultStore]:
     """
-    判断指定日期的性质。
+    打开本地结果存储，失败时打印原因并返回 None（按每天重新计算处理）。
+    """
+    import sqlite3
 
-    参数:
-        date (str): 要判断的日期，格式为 'YYYY-MM-DD'。
-        holidays (Dict[str, int]): 节假日数据，键为日期，值为工资倍数。
-        workdays (Set[str]): 工作日数据，包含日期的集合。
+    try:
+        return ResultStore()
+    except (OSError, sqlite3.Error) as e:
+        print(f"打开本地数据库失败: {e}")
+        return None
 
-    返回值:
-        str: 返回日期的性质，可能的值为 "节假日", "节假日(周末)", "周末", "工作日"。
+def open_punch_warehouse() -> Optional[PunchWarehouse]:
     """
-    if date in holidays:
-        if holidays[date] == 3:
-            return "节假日"
-        return "节假日(周末)"
-    if date not in workdays and datetime.strptime(date, '%Y-%m-%d').weekday() >= 5:
-        return "周末"
-    return "工作日"
+    打开本地打卡记录仓库，失败时打印原因并返回 None（每次都联网获取）。
+    """
+    import sqlite3
 
-def parse_process_application_data(leave_data: List[Dict], user_cookie: str) -> Tuple[Dict[str, List[Tuple[str, str]]], Dict[str, List[Tuple[str, str]]], Dict[str, List[Tuple[str, str]]]]:
+    try:
+        return PunchWarehouse()
+    except (OSError, sqlite3.Error) as e:
+        print(f"打开本地数据库失败: {e}")
+        return None
+
+def open_input(path: str):
     """
-    解析流程申请数据。
+    以 UTF-8 文本方式打开输入文件，'-' 表示标准输入。
+    """
+    if path == '-':
+        return open(sys.stdin.fileno(), 'r', encoding='utf-8', closefd=False)
+    return open(path, 'r', encoding='utf-8')
+
+# 性能剖析
+class ProfilePhase:
+    """
+    Profiler.phase 返回的上下文管理器，退出时记录一段耗时。
+    """
+    __slots__ = ('profiler', 'name', 'category', 'args', 'start')
+
+    def __init__(self, profiler: 'Profiler', name: str, category: str, args: Dict[str, Any]):
+        self.profiler = profiler
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = t.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.profiler.record(self.name, self.start, t.perf_counter() - self.start, self.category, self.args)
+        return False
+
+class _NullPhase:
+    """
+    没有开启性能剖析时 profile_phase 返回的空上下文管理器，什么也不做。
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+_NULL_PHASE = _NullPhase()
+
+class Profiler:
+    """
+    记录各个阶段（门户页面、HR 接口、节假日、解析、计算、渲染等）和每次 HTTP 请求的耗时。
+
+    事件在各个线程中记录，结束时输出为 JSON 汇总或 Chrome trace-event 格式。
+    """
+    def __init__(self):
+        self.origin = t.perf_counter()
+        self.started_at = t.time()
+        self.events = []
+        self._lock = threading.Lock()
+
+    def phase(self, name: str, category: str = 'phase', **args) -> ProfilePhase:
+        return ProfilePhase(self, name, category, args)
+
+    def record(self, name: str, start: float, duration: float, category: str = 'phase', args: Optional[Dict[str, Any]] = None):
+        """
+        记录一个事件。
+
+        参数:
+            name (str): 阶段名称，HTTP 请求为接口名称。
+            start (float): 开始时间（t.perf_counter()）。
+            duration (float): 耗时（秒）。
+            category (str): 'phase' 或 'http'。
+            args (Optional[Dict[str, Any]]): 附加信息，例如 HTTP 状态码和数据大小。
+        """
+        with self._lock:
+            self.events.append((name, category, start - self.origin, duration, threading.get_ident(), args or {}))
+
+    def report(self) -> Dict[str, Any]:
+        """
+        JSON 格式的剖析结果：全部事件、按阶段汇总的耗时，以及 HTTP 请求的次数、耗时和数据量合计。
+        """
+        with self._lock:
+            events = sorted(self.events, key=lambda event: event[2])
+        threads = {}
+        summary = {}
+        http = {'calls': 0, 'total_ms': 0.0, 'request_bytes': 0, 'response_bytes': 0}
+        for name, category, _, duration, thread, args in events:
+            threads.setdefault(thread, len(threads))
+            entry = summary.setdefault(f"{category}:{name}", {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            entry['count'] += 1
+            entry['total_ms'] += duration * 1000
+            entry['max_ms'] = max(entry['max_ms'], duration * 1000)
+            if category == 'http':
+                http['calls'] += 1
+                http['total_ms'] += duration * 1000
+                http['request_bytes'] += args.get('request_bytes', 0)
+                http['response_bytes'] += args.get('response_bytes', 0)
+        return {
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='milliseconds'),
+            'wall_ms': (t.perf_counter() - self.origin) * 1000,
+            'summary': summary,
+            'http': http,
+            'events': [{'name': name, 'category': category, 'start_ms': start * 1000, 'duration_ms': duration * 1000,
+                        'thread': threads[thread], **({'args': args} if args else {})}
+                       for name, category, start, duration, thread, args in events]
+        }
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """
+        Chrome trace-event 格式的剖析结果（完整事件 'X'，时间单位为微秒），每个线程一行。
+        """
+        with self._lock:
+            events = list(self.events)
+        pid = os.getpid()
+        threads = {}
+        trace_events = []
+        for name, category, start, duration, thread, args in events:
+            if thread not in threads:
+                threads[thread] = len(threads)
+                trace_events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': threads[thread],
+                                     'args': {'name': 'main' if thread == threading.main_thread().ident else f"worker-{threads[thread]}"}})
+            trace_events.append({'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': threads[thread],
+                                 'ts': round(start * 1e6, 3), 'dur': round(duration * 1e6, 3), 'args': args})
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+    def write(self, path: str, output_format: str = 'json'):
+        """
+        把剖析结果写入文件，output_format 为 PROFILE_FORMATS 之一。
+        """
+        ensure_directory_exists(path)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.chrome_trace() if output_format == 'chrome' else self.report(), file, ensure_ascii=False, indent=1)
+
+_profiler = None
+
+def enable_profiling() -> Profiler:
+    """
+    开启性能剖析，之后 profile_phase 和 HrClient 的请求都会被记录。
+    """
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler()
+    return _profiler
+
+def profile_phase(name: str, category: str = 'phase', **args):
+    """
+    记录一个阶段的耗时：with profile_phase('compute'): ...
+
+    没有开启性能剖析时返回一个共享的空上下文管理器，开销只有一次函数调用。
+    """
+    profiler = _profiler
+    if profiler is None:
+        return _NULL_PHASE
+    return profiler.phase(name, category, **args)
+
+def write_profile(path: str, output_format: str = 'json'):
+    """
+    程序退出时写入剖析结果（由 atexit 调用，各个 exit() 分支都会经过这里）。
+    """
+    if _profiler is None:
+        return
+    try:
+        _profiler.write(path, output_format)
+        print(f"性能剖析结果已写入 {path}", file=sys.stderr)
+    except OSError as e:
+        print(f"写入性能剖析结果失败: {e}", file=sys.stderr)
+
+
+# HTTP 客户端
+class HrAuthError(Exception):
+    """
+    HR 接口返回认证错误（Cookie 失效或用户变量失效）。
+    """
+
+
+class AdaptiveLimiter:
+    """
+    一个主机的请求限流器，同一主机的所有线程共用。
+
+    令牌桶把请求速率限制在 rate 以内（允许 burst 个突发）；同时在途的请求数不超过并发上限，
+    上限按 AIMD 调整：响应正常且上限已被用满时每个响应加 1/上限（约每轮加一），
+    遇到 429、5xx、超时、连接错误或延迟明显变大时减半。减半之前发出的请求带回的信号不再重复减半。
+    429 带 Retry-After 时整个主机暂停到那之后。
+    """
+
+    def __init__(self, rate: float = HTTP_RATE_LIMIT, burst: int = HTTP_RATE_BURST, min_concurrency: int = HTTP_MIN_CONCURRENCY,
+                 max_concurrency: int = HTTP_MAX_CONCURRENCY, initial_concurrency: int = HTTP_INITIAL_CONCURRENCY,
+                 clock: Callable[[], float] = t.perf_counter):
+        """
+        参数:
+            rate (float): 每秒最多发出的请求数，0 表示不限。
+            burst (int): 令牌桶容量。
+            min_concurrency (int): 并发上限的下限。
+            max_concurrency (int): 并发上限的上限。
+            initial_concurrency (int): 初始并发上限。
+            clock (Callable[[], float]): 单调时钟，测试时可以换成假的时钟。
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.limit = float(min(max(initial_concurrency, self.min_concurrency), self.max_concurrency))
+        self.clock = clock
+        self.tokens = float(self.burst)
+        self.refilled = clock()
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.in_flight = 0
+        self.latency = {}                   # 每个接口的平均延迟（秒）
+        self.decreases = 0
+        self.throttled = 0
+        self.wait_time = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> float:
+        """
+        等待一个并发名额和一个令牌。
+
+        返回值:
+            float: 等待的秒数。
+        """
+        start = self.clock()
+        with self._condition:
+            while True:
+                now = self.clock()
+                if self.in_flight >= int(self.limit):
+                    self._condition.wait()
+                    continue
+                delay = self.paused_until - now
+                if delay <= 0 and self.rate > 0:
+                    self.tokens = min(self.burst, self.tokens + (now - self.refilled) * self.rate)
+                    self.refilled = now
+                    delay = (1 - self.tokens) / self.rate
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                if self.rate > 0:
+                    self.tokens -= 1
+                self.in_flight += 1
+                self.wait_time += now - start
+                return now - start
+
+    def release(self, endpoint: str, started: float, latency: float, failed: bool = False, retry_after: Optional[float] = None):
+        """
+        归还名额并根据这次请求的结果调整并发上限。
+
+        参数:
+            endpoint (str): 接口名称，每个接口分别计算平均延迟。
+            started (float): 请求发出时的 clock()。
+            latency (float): 请求耗时（秒）。
+            failed (bool): 是否为 429、5xx、超时或连接错误。
+            retry_after (Optional[float]): 429 响应的 Retry-After（秒）。
+        """
+        with self._condition:
+            self.in_flight -= 1
+            average = self.latency.get(endpoint)
+            slow = not failed and average is not None and latency > max(HTTP_SLOW_LATENCY_MIN, average * HTTP_SLOW_LATENCY_FACTOR)
+            if retry_after:
+                self.throttled += 1
+                self.paused_until = max(self.paused_until, self.clock() + retry_after)
+            if failed or slow:
+                if started >= self.last_decrease:
+                    self.limit = max(self.min_concurrency, self.limit * HTTP_AIMD_DECREASE)
+                    self.last_decrease = self.clock()
+                    self.decreases += 1
+            elif self.in_flight + 1 >= int(self.limit):
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            if not failed:
+                self.latency[endpoint] = latency if average is None else average + HTTP_LATENCY_EWMA * (latency - average)
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        返回当前的并发上限、在途请求数、减半次数、429 次数和累计排队时间（秒）。
+        """
+        with self._condition:
+            return {'limit': self.limit, 'in_flight': self.in_flight, 'decreases': self.decreases,
+                    'throttled': self.throttled, 'wait_time': self.wait_time}
+
+def retry_after_seconds(response: 'requests.Response') -> Optional[float]:
+    """
+    读取 429 响应的 Retry-After（只支持秒数），最多 HTTP_RETRY_AFTER_MAX 秒，没有或无法识别时返回 None。
+    """
+    value = response.headers.get('Retry-After', '').strip()
+    try:
+        return min(HTTP_RETRY_AFTER_MAX, max(0.0, float(value))) if value else None
+    except ValueError:
+        return None
+
+class HrClient:
+    """
+    所有对外请求共用的 HTTP 客户端。
+
+    复用同一个 requests.Session 的连接池（keep-alive），按接口设置超时，
+    对 429、5xx 和连接错误做带随机抖动的指数退避重试，并接受 gzip/br 压缩的响应。
+    每个主机的请求都经过同一个 AdaptiveLimiter，批量获取时不会超过上游能承受的速率和并发。
+    每个接口的调用次数、重试次数和耗时都会被记录下来，可通过 stats() 查看。
+    """
+
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE, max_retries: int = HTTP_MAX_RETRIES, timeouts: Optional[Dict[str, Tuple[float, float]]] = None,
+                 rate: Optional[float] = None, clock: Callable[[], float] = t.perf_counter, sleep: Callable[[float], None] = t.sleep):
+        """
+        参数:
+            pool_size (int): 每个主机保持的长连接数。
+            max_retries (int): 最大重试次数。
+            timeouts (Optional[Dict[str, Tuple[float, float]]]): 按接口覆盖的超时配置。
+            rate (Optional[float]): 每个主机每秒最多发出的请求数，默认为 HTTP_RATE_LIMIT，0 表示不限。
+            clock (Callable[[], float]): 单调时钟，计时和限流器共用，测试时可以换成假的时钟。
+            sleep (Callable[[float], None]): 重试前退避等待的函数，测试时可以换成推进假时钟的函数。
+        """
+        import importlib.util
+        import requests
+        import requests.adapters
+
+        self.max_retries = max_retries
+        self.clock = clock
+        self.sleep = sleep
+        self.retry_exceptions = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+        self.timeouts = dict(HTTP_ENDPOINT_TIMEOUTS)
+        if timeouts:
+            self.timeouts.update(timeouts)
+
+        # 重试由 request() 自己处理，这里不让 urllib3 再重试一遍
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        # 只有装了 brotli 时 urllib3 才能解码 br，否则不声明，免得拿到解不开的响应
+        accept_encoding = 'gzip, deflate'
+        if importlib.util.find_spec('brotli') or importlib.util.find_spec('brotlicffi'):
+            accept_encoding += ', br'
+        self.session.headers.update({
+            'User-Agent': USER_AGENT,
+            'Accept-Encoding': accept_encoding
+        })
+
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.rate = HTTP_RATE_LIMIT if rate is None else rate
+        self.max_concurrency = min(HTTP_MAX_CONCURRENCY, pool_size)
+        self._limiters = {}
+
+    def limiter(self, url: str) -> AdaptiveLimiter:
+        """
+        返回 url 所在主机的限流器，第一次访问该主机时创建。
+        """
+        host = url.split('/', 3)[2] if '://' in url else ''
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = self._limiters[host] = AdaptiveLimiter(self.rate, max_concurrency=self.max_concurrency, clock=self.clock)
+            return limiter
+
+    def request(self, endpoint: str, method: str, url: str, **kwargs) -> 'requests.Response':
+        """
+        发送请求，遇到 429、5xx 或连接错误时按退避策略重试。每次尝试前都要经过主机的限流器，退避等待时不占用并发名额。
+
+        参数:
+            endpoint (str): 接口名称，用于选择超时和记录统计，例如 'clock_in'。
+            method (str): HTTP 方法。
+            url (str): 请求地址。
+            **kwargs: 透传给 requests.Session.request 的其他参数。
+
+        返回值:
+            requests.Response: 最后一次请求的响应。重试用尽仍是 429/5xx 时也原样返回。
+
+        异常:
+            requests.exceptions.RequestException: 重试用尽仍无法连接或超时。
+        """
+        import random
+
+        kwargs.setdefault('timeout', self.timeouts.get(endpoint, HTTP_DEFAULT_TIMEOUT))
+        limiter = self.limiter(url)
+        attempt = 0
+        while True:
+            waited = limiter.acquire()
+            start = self.clock()
+            failed, retry_after = False, None
+            try:
+                response = self.session.request(method, url, **kwargs)
+                failed = response.status_code in HTTP_RETRY_STATUS_CODES
+                retry_after = retry_after_seconds(response) if response.status_code == 429 else None
+            except self.retry_exceptions as e:
+                failed = True
+                self._record(endpoint, self.clock() - start, error=True)
+                if _profiler is not None:
+                    _profiler.record(endpoint, start, self.clock() - start, 'http', {'method': method, 'attempt': attempt, 'wait_ms': waited * 1000, 'error': type(e).__name__})
+                if attempt >= self.max_retries:
+                    raise
+                print(f"请求 {endpoint} 失败，准备重试: {e}")
+            else:
+                self._record(endpoint, self.clock() - start, error=response.status_code >= 500)
+                if _profiler is not None:
+                    self._profile_response(endpoint, method, start, attempt, response, kwargs.get('data'), waited)
+                if not failed or attempt >= self.max_retries:
+                    return response
+                print(f"请求 {endpoint} 返回 {response.status_code}，准备重试")
+            finally:
+                limiter.release(endpoint, start, self.clock() - start, failed, retry_after)
+            attempt += 1
+            self._record_retry(endpoint)
+            # 全抖动退避，避免多个线程同时重试又一起撞上去；429 至少等到 Retry-After 之后
+            self.sleep(max(retry_after or 0.0, random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt)))))
+
+    def post_hr_json(self, endpoint: str, url: str, user_cookie, payload: dict):
+        """
+        以 HR 系统要求的请求头 POST JSON，并返回解析后的 JSON 数据。
+
+        参数:
+            endpoint (str): 接口名称。
+            url (str): 请求地址。
+            user_cookie: 用户的 Cookie 信息，用于身份验证。
+            payload (dict): 请求体。
+
+        返回值:
+            服务器响应的 JSON 数据。
+
+        异常:
+            HrAuthError: 认证失败，此时该 Cookie 的用户变量缓存已被清除。
+        """
+        response = self.request(endpoint, 'POST', url, headers=hr_headers(user_cookie, 'application/json'), data=json.dumps(payload))
+        if is_auth_error(response):
+            invalidate_user_variables(user_cookie)
+            raise HrAuthError(f"{endpoint} 认证失败: {response.status_code}")
+        response.raise_for_status()
+        return response.json()
+
+    def _profile_response(self, endpoint: str, method: str, start: float, attempt: int, response: 'requests.Response', data, waited: float):
+        """
+        记录一次 HTTP 请求的耗时、限流排队时间、状态码和数据大小，只在开启性能剖析时调用。
+        """
+        args = {
+            'method': method,
+            'status': response.status_code,
+            'attempt': attempt,
+            'wait_ms': waited * 1000,
+            'request_bytes': len(data.encode('utf-8') if isinstance(data, str) else data or b''),
+            'response_bytes': len(response.content)
+        }
+        if response.headers.get('Content-Length', '').isdigit():
+            args['wire_bytes'] = int(response.headers['Content-Length'])
+        _profiler.record(endpoint, start, self.clock() - start, 'http', args)
+
+    def _record(self, endpoint: str, elapsed: float, error: bool = False):
+        with self._lock:
+            stat = self._stats.setdefault(endpoint, {'calls': 0, 'retries': 0, 'errors': 0, 'total_latency': 0.0, 'max_latency': 0.0})
+            stat['calls'] += 1
+            stat['errors'] += 1 if error else 0
+            stat['total_latency'] += elapsed
+            stat['max_latency'] = max(stat['max_latency'], elapsed)
+
+    def _record_retry(self, endpoint: str):
+        with self._lock:
+            self._stats[endpoint]['retries'] += 1
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        返回每个接口的请求统计。
+
+        返回值:
+            Dict[str, Dict[str, float]]: 键为接口名称，值包含 calls、retries、errors、
+                avg_latency 和 max_latency（秒）。
+        """
+        with self._lock:
+            return {
+                endpoint: {
+                    'calls': stat['calls'],
+                    'retries': stat['retries'],
+                    'errors': stat['errors'],
+                    'avg_latency': stat['total_latency'] / stat['calls'] if stat['calls'] else 0.0,
+                    'max_latency': stat['max_latency']
+                }
+                for endpoint, stat in self._stats.items()
+            }
+
+    def stats_report(self) -> str:
+        """
+        以文本形式返回请求统计，便于直接打印。
+        """
+        lines = []
+        for endpoint, stat in sorted(self.stats().items()):
+            lines.append(f"{endpoint:<20} 请求 {stat['calls']:>3} 次  重试 {stat['retries']:>2} 次  失败 {stat['errors']:>2} 次  "
+                         f"平均 {stat['avg_latency'] * 1000:>7.1f} ms  最大 {stat['max_latency'] * 1000:>7.1f} ms")
+        for host, stat in sorted(self.limiter_stats().items()):
+            lines.append(f"{host:<20} 并发上限 {stat['limit']:>4.1f}  降速 {stat['decreases']:>2} 次  429 {stat['throttled']:>2} 次  "
+                         f"排队 {stat['wait_time'] * 1000:>7.1f} ms")
+        return "\n".join(lines)
+
+    def limiter_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        返回每个主机限流器的状态，见 AdaptiveLimiter.stats。
+        """
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {host: limiter.stats() for host, limiter in limiters.items()}
+
+
+def is_auth_error(response: 'requests.Response') -> bool:
+    """
+    判断 HR 接口的响应是否为认证错误：401/403，或者被重定向到了登录页。
 
     参数:
-        leave_data (List[Dict]): 包含年假、事假和延时工时扣减记录的列表，每个记录是一个字典。
-        user_cookie (str): 用户的 Cookie 信息，用于身份验证。
+        response (requests.Response): 接口响应。
 
     返回值:
-        Tuple[Dict[str, List[Tuple[str, str]]], Dict[str, List[Tuple[str, str]]], Dict[str, List[Tuple[str, str]]]]: 返回三个字典，分别存储年假、事假和延时工时扣减的信息。
-        - annual_leave (Dict[str, List[Tuple[str, str]]]): 年假数据，键为日期，值为时间段的列表（开始时间，结束时间）。
-        - personal_leave (Dict[str, List[Tuple[str, str]]]): 事假数据，键为日期，值为时间段的列表（开始时间，结束时间）。
-        - delay_deduction (Dict[str, List[Tuple[str, str]]]): 延时工时扣减数据，键为日期，值为时间段的列表（开始时间，结束时间）。
+        bool: 是认证错误返回 True。
     """
-    annual_leave = {}  # 存储年假的字典
-    personal_leave = {}  # 存储事假的字典
-    delay_deduction = {}  # 存储延时工时扣减的字典
+    if response.status_code in (401, 403):
+        return True
+    return any('login' in r.headers.get('Location', '').lower() for r in response.history) or '/login' in response.url.lower()
 
-    for record in leave_data:
-        abstracts = record['ABSTRACTS']  # 获取摘要信息
-        parts = abstracts.split('|')
-        leave_type = parts[1] if len(parts) > 1 else None
 
-        if leave_type in ['年假', '事假'] and len(parts) > 3:
-            try:
-                if ' - ' in parts[3]:
-                    start_time, end_time = parts[3].split(' - ')
-                elif ' 至 ' in parts[3]:
-                    start_time, end_time = parts[3].split(' 至 ')
-                else:
-                    raise ValueError("Invalid time range format")
-
-                start_datetime = datetime.strptime(start_time, '%Y-%m-%d %H:%M')
-                end_datetime = datetime.strptime(end_time, '%Y-%m-%d %H:%M')
-
-                # 计算每一天的请假时间段
-                current_datetime = start_datetime
-                while current_datetime.date() <= end_datetime.date():
-                    date_str = current_datetime.strftime('%Y-%m-%d')
-                    if current_datetime.date() == start_datetime.date():
-                        # 第一天的请假时间段
-                        day_start_time = start_datetime
-                        day_end_time = min(end_datetime, datetime.combine(current_datetime.date(), time(18, 0)))
-                    elif current_datetime.date() == end_datetime.date():
-                        # 最后一天的请假时间段
-                        day_start_time = datetime.combine(current_datetime.date(), time(9, 0))
-                        day_end_time = end_datetime
-                    else:
-                        # 中间天的请假时间段
-                        day_start_time = datetime.combine(current_datetime.date(), time(9, 0))
-                        day_end_time = datetime.combine(current_datetime.date(), time(18, 0))
-
-                    # 根据请假类型将数据存储到相应的字典中
-                    if leave_type == '年假':
-                        if date_str not in annual_leave:
-                            annual_leave[date_str] = []
-                        annual_leave[date_str].append((day_start_time.strftime('%H:%M'), day_end_time.strftime('%H:%M')))
-                    elif leave_type == '事假':
-                        if date_str not in personal_leave:
-                            personal_leave[date_str] = []
-                        personal_leave[date_str].append((day_start_time.strftime('%H:%M'), day_end_time.strftime('%H:%M')))
-
-                    current_datetime += timedelta(days=1)
-            except ValueError as e:
-                print(f"Error parsing time range in record: {record}")
-                print(f"Exception: {e}")
+_hr_client = None
+_hr_client_lock = threading.Lock()
 
-        elif leave_type == '销假申请':
-            try:
-                if ' - ' in parts[3]:
-                    start_time, end_time = parts[3].split(' - ')
-                elif ' 至 ' in parts[3]:
-                    start_time, end_time = parts[3].split(' 至 ')
-                else:
-                    raise ValueError("Invalid time range format")
+def get_hr_client(rate: Optional[float] = None) -> HrClient:
+    """
+    获取进程内共享的 HrClient，第一次调用时创建。
 
-                start_datetime = datetime.strptime(start_time, '%Y-%m-%d %H:%M')
-                end_datetime = datetime.strptime(end_time, '%Y-%m-%d %H:%M')
+    参数:
+        rate (Optional[float]): 创建时使用的每主机限速，见 HrClient；客户端已经创建时忽略。
+            需要指定限速时（--max-rate）应在发出任何请求之前调用。
+    """
+    global _hr_client
+    if _hr_client is None:
+        with _hr_client_lock:
+            if _hr_client is None:
+                _hr_client = HrClient(rate=rate)
+    return _hr_client
+
+def set_base_urls(hr_url: Optional[str] = None, holiday_url: Optional[str] = None):
+    """
+    修改 HR 系统和节假日接口的地址，例如指向本地的 fake_hr_server.py。请求头中的 Host/Origin/Referer 一起更新。
 
-                # 计算每一天的销假时间段
-                current_datetime = start_datetime
-                while current_datetime.date() <= end_datetime.date():
-                    date_str = current_datetime.strftime('%Y-%m-%d')
-                    if leave_type == '年假' and date_str in annual_leave:
-                        annual_leave[date_str] = [(s, e) for s, e in annual_leave[date_str] if not (s == start_datetime.strftime('%H:%M') and e == end_datetime.strftime('%H:%M'))]
-                    elif leave_type == '事假' and date_str in personal_leave:
-                        personal_leave[date_str] = [(s, e) for s, e in personal_leave[date_str] if not (s == start_datetime.strftime('%H:%M') and e == end_datetime.strftime('%H:%M'))]
+    参数:
+        hr_url (Optional[str]): HR 系统地址，例如 'http://127.0.0.1:8800'，为 None 时不修改。
+        holiday_url (Optional[str]): 节假日接口地址，为 None 时不修改。
+    """
+    global HR_BASE_URL, HOLIDAY_BASE_URL, HOST, ORIGIN, REFERER
+    if hr_url:
+        HR_BASE_URL = hr_url.rstrip('/')
+        HOST = HR_BASE_URL.split('://', 1)[-1]
+        ORIGIN = HR_BASE_URL
+        REFERER = HR_BASE_URL + '/portal/index'
+    if holiday_url:
+        HOLIDAY_BASE_URL = holiday_url.rstrip('/')
+
+def hr_headers(user_cookie, content_type: Optional[str] = None) -> Dict[str, str]:
+    """
+    构建访问 HR 系统需要的请求头。User-Agent 和 Accept-Encoding 由 HrClient 统一设置。
 
-                    current_datetime += timedelta(days=1)
-            except ValueError as e:
-                print(f"Error parsing time range in record: {record}")
-                print(f"Exception: {e}")
+    参数:
+        user_cookie: 用户的 Cookie 信息。
+        content_type (Optional[str]): 请求体类型，为 None 时不设置。
 
-        elif leave_type == '延时工时扣减申请':
-            auth_key = record['AUTHKEY']
-            print(f"正在获取延时工时扣减数据: {auth_key}")
-            deduction_data = get_delay_deduction_data(auth_key, user_cookie)
-            for form in deduction_data['formList']:
-                begin_time = form['formData']['CARDBEGINTIME']
-                end_time = form['formData']['CARDENDTIME']
-                start_date = begin_time.split('T')[0]  # 提取开始日期
-                if start_date not in delay_deduction:
-                    delay_deduction[start_date] = []
-                delay_deduction[start_date].append((begin_time.split('T')[1], end_time.split('T')[1]))
+    返回值:
+        Dict[str, str]: 请求头字典。
+    """
+    headers = {
+        'Host': HOST,
+        'Origin': ORIGIN,
+        'Referer': REFERER,
+        'Cookie': str(user_cookie)  # 强制转换为字符串
+    }
+    if content_type:
+        headers['Content-Type'] = content_type
+    return headers
 
-    return annual_leave, personal_leave, delay_deduction  # 返回年假、事假和延时工时扣减的字典
 
-def parse_attendance_data(attendance_json: str) -> Tuple[Dict[str, List[int]], int, int]:
+# 在线获取
+def get_holiday_data_online(records: json) -> Tuple[Dict, Set]:
     """
-    解析个人考勤信息的JSON数据，提取每日的迟到分钟数、当月累计的迟到次数和当月累计的迟到分钟数。
+    在线获取指定年份的节假日数据。
 
-    参数：
-        - attendance_json：个人考勤信息的JSON数据。
+    参数:
+        records (json): 包含打卡记录的 JSON 数据。
 
-    返回值：
-        - daily_late_minutes：每日的迟到分钟数字典，键为日期，值为迟到分钟数列表。
-        - total_late_count：当月累计的迟到次数。
-        - total_late_minutes：当月累计的迟到分钟数。
+    返回值:
+        Tuple[Dict, Set]: 返回一个包含节假日和工作日的元组。
+            - Dict: 节假日数据，键为日期，值为工资倍数。
+            - Set: 工作日数据，包含日期的集合。
+
+    异常:
+        SystemExit: 如果数据文件为空或格式不正确。
     """
-    # 解析JSON数据
-    # 如果传入的是列表，直接使用；如果是字符串，解析为列表
-    if isinstance(attendance_json, str):
-        attendance_data = json.loads(attendance_json)
+    if records:
+        sample_date = records[0]['SHIFTTERM']
+        year, month = sample_date.split('-')[:2]
+    else:
+        print("数据文件为空或格式不正确。")
+        exit()
+    return get_holiday_data_for_month(int(year), int(month))
+
+def get_holiday_data_for_month(target_year, target_month) -> Tuple[Dict, Set]:
+    """
+    获取指定年月的节假日数据。不依赖打卡记录，可以和打卡数据同时请求。
+
+    参数:
+        target_year: 目标年份。
+        target_month: 目标月份，格式为数字，例如 9 表示九月。
+
+    返回值:
+        Tuple[Dict, Set]: 返回一个包含节假日和工作日的元组。
+            - Dict: 节假日数据，键为日期，值为工资倍数。
+            - Set: 工作日数据，包含日期的集合。
+    """
+    year_month = f"{int(target_year)}-{int(target_month):02d}"
+    with profile_phase('holiday', year=int(target_year)):
+        holiday_data = get_holiday_year_data(int(target_year))
+    if holiday_data is None:
+        # 什么数据都拿不到时只按周六日判断，不让整个计算失败
+        print(f"未能获取 {target_year} 年的节假日数据，将只按周末计算。")
+        return {}, set()
+    return filter_holiday_data(holiday_data, year_month)
+
+_holiday_year_memo = {}
+_holiday_year_lock = threading.Lock()      # 保护 _holiday_year_memo 和 _holiday_year_fetch_locks，只在读写内存时持有
+_holiday_year_fetch_locks = {}             # 每年一把锁，同一年只联网一次，不同年份互不等待
+
+def get_holiday_year_data(year: int) -> Optional[dict]:
+    """
+    获取一整年的节假日数据，依次尝试：内存、未过期的本地缓存、timor.tech、过期的本地缓存、项目附带的数据。
+
+    往年的数据视为不会再变，只要有缓存就不再联网；当年及以后的缓存超过 HOLIDAY_CACHE_TTL 才重新获取。
+    同一进程内多个线程同时请求同一年时只会联网一次；联网时只持有这一年的锁，其他年份和已经缓存的年份不用等待。
+
+    参数:
+        year (int): 年份。
+
+    返回值:
+        Optional[dict]: timor.tech 格式的全年节假日数据，全部来源都失败时返回 None。
+    """
+    memo = _get_holiday_year_memo(year)
+    if memo is not None:
+        return memo[0]
+
+    with _holiday_year_lock:
+        fetch_lock = _holiday_year_fetch_locks.setdefault(year, threading.Lock())
+    with fetch_lock:
+        # 等锁期间其他线程可能已经拿到了数据
+        memo = _get_holiday_year_memo(year)
+        if memo is not None:
+            return memo[0]
+        holiday_data, expires_at = fetch_holiday_year_data(year)
+        with _holiday_year_lock:
+            _holiday_year_memo[year] = (holiday_data, expires_at)
+        return holiday_data
+
+def _get_holiday_year_memo(year: int) -> Optional[Tuple[Optional[dict], float]]:
+    """
+    读取内存中 (数据, 过期时间) 形式的全年节假日数据，没有或已过期时返回 None。全部来源都失败时数据为 None。
+    """
+    with _holiday_year_lock:
+        memo = _holiday_year_memo.get(year)
+    if memo and (t.time() < memo[1] or (year < datetime.now().year and memo[0] is not None)):
+        return memo
+    return None
+
+def fetch_holiday_year_data(year: int) -> Tuple[Optional[dict], float]:
+    """
+    不经过内存，从本地缓存、timor.tech 或离线数据中获取一整年的节假日数据（见 get_holiday_year_data）。
+
+    联网失败（包括任何异常）时不会抛出，而是依次使用过期的本地缓存和项目附带的数据。
+
+    参数:
+        year (int): 年份。
+
+    返回值:
+        Tuple[Optional[dict], float]: 节假日数据（全部来源都失败时为 None）和这份数据在内存中的过期时间。
+    """
+    now = t.time()
+    immutable = year < datetime.now().year
+
+    cached_data, fetched_at = read_holiday_cache(year)
+    if cached_data is not None and (immutable or now - fetched_at < HOLIDAY_CACHE_TTL):
+        return cached_data, fetched_at + HOLIDAY_CACHE_TTL
+
+    holiday_data = None
+    try:
+        api_url = f'{HOLIDAY_BASE_URL}/api/holiday/year/{year}'
+        response = get_hr_client().request('holiday', 'GET', api_url)
+        response.raise_for_status()
+        holiday_data = response.json()
+    except json.JSONDecodeError as e:
+        print(f"JSON解析失败: {e}")
+    except Exception as e:
+        # 节假日数据有离线的替代来源，联网出任何错都不应该让计算失败
+        print(f"请求失败: {e}")
+
+    if is_valid_holiday_data(holiday_data):
+        try:
+            save_holiday_cache(year, holiday_data)
+        except OSError as e:
+            print(f"保存节假日缓存失败: {e}")
+        return holiday_data, now + HOLIDAY_CACHE_TTL
+
+    if cached_data is not None:
+        print(f"使用过期的 {year} 年节假日缓存。")
+        holiday_data = cached_data
+    else:
+        holiday_data = read_bundled_holiday_data(year)
+        if holiday_data is not None:
+            print(f"使用项目附带的 {year} 年节假日数据。")
+    # 离线数据（或者什么都没拿到）也记下来，HOLIDAY_RETRY_INTERVAL 内不再反复请求一个挂掉的接口
+    return holiday_data, now + HOLIDAY_RETRY_INTERVAL
+
+def get_holiday_year_for_month(target_year) -> Tuple[int, Optional[dict]]:
+    """
+    获取计算一个月需要的节假日数据，即这个月所在年份的全年数据（见 get_holiday_year_data）。
+
+    结果随 fetch_month_data 的结果字典传给计算进程，计算进程通过 use_holiday_year_data 使用同一份数据，不再联网。
+
+    参数:
+        target_year: 目标年份。
+
+    返回值:
+        Tuple[int, Optional[dict]]: 年份和全年节假日数据，获取失败时数据为 None（只按周末计算）。
+    """
+    with profile_phase('holiday', year=int(target_year)):
+        holiday_data = get_holiday_year_data(int(target_year))
+    if holiday_data is None:
+        print(f"未能获取 {target_year} 年的节假日数据，将只按周末计算。")
+    return int(target_year), holiday_data
+
+def use_holiday_year_data(year: int, holiday_data: Optional[dict]):
+    """
+    使用主进程获取的全年节假日数据，之后本进程的 get_holiday_year_data 直接返回它。
+
+    在主进程中数据就是内存里的那一份，不做任何事；在计算进程中只有数据变了才替换，日历索引随之重建。
+
+    参数:
+        year (int): 年份。
+        holiday_data (Optional[dict]): get_holiday_year_for_month 返回的全年数据。
+    """
+    with _holiday_year_lock:
+        memo = _holiday_year_memo.get(year)
+        if memo is None or (memo[0] is not holiday_data and memo[0] != holiday_data):
+            _holiday_year_memo[year] = (holiday_data, t.time() + HOLIDAY_CACHE_TTL)
+
+def get_user_variable_online(user_cookie, title=CLOCK_IN_DATA_TITLE):
+    """
+    从用户的 Cookie 信息中获取指定标题的用户变量。
+
+    结果按员工缓存在 USER_VARIABLE_CACHE_FILE 中，命中时不再访问门户页面（为什么按员工缓存见 get_cached_user_variable）；
+    HR 接口或门户页面返回认证错误时缓存会被自动清除。未命中时一次请求解析出 PORTAL_LINK_TITLES 中的全部链接。
+
+    参数：
+        user_cookie：用户的 Cookie 信息，用于身份验证。
+        title：链接的标题，例如 '个人考勤查询' 或 '流程申请'。
+
+    返回值：
+        指定标题的用户变量。
+    """
+    user_variable = get_cached_user_variable(user_cookie, title)
+    if user_variable:
+        return user_variable
+
+    url = f"{HR_BASE_URL}/portal/index"
+    response = get_hr_client().request('portal', 'GET', url, headers=hr_headers(user_cookie))
+
+    if is_auth_error(response):
+        invalidate_user_variables(user_cookie)
+        raise HrAuthError(f"门户页面认证失败: {response.status_code}")
+    if response.status_code != 200:
+        raise ValueError(f"请求失败: {response.status_code}")
+
+    with profile_phase('portal_parse'):
+        page = response.text
+        user_variables = {}
+        for link_title in dict.fromkeys(PORTAL_LINK_TITLES + (title,)):
+            href = find_link_href(page, link_title)
+            if href and '!' in href:
+                user_variables[link_title] = href[href.index('!')+1:]
+
+    if title not in user_variables:
+        raise ValueError(f"未找到标题为 '{title}' 的链接")
+
+    cache_user_variables(user_cookie, user_variables)
+    return user_variables[title]
+
+# 标签属性：名称 = "值" | '值' | 值（argparse 已经载入了 re，编译这一个模式几乎不增加启动时间）
+_ATTRIBUTE_PATTERN = re.compile(r'''([^\s=/>]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))''')
+
+def find_link_href(page: str, title: str) -> Optional[str]:
+    """
+    在 HTML 中查找 title 属性为指定值的 <a> 标签并返回其 href。
+
+    只做字符串查找定位到目标标签，再解析这一个标签的属性，不构建整个 DOM。
+
+    参数:
+        page (str): 页面 HTML。
+        title (str): 链接标题。
+
+    返回值:
+        Optional[str]: 链接的 href（已反转义 HTML 实体），找不到时返回 None。
+    """
+    import html
+
+    for quote in ('"', "'"):
+        needle = f'title={quote}{title}{quote}'
+        position = page.find(needle)
+        while position != -1:
+            tag_start = page.rfind('<', 0, position)
+            tag_end = page.find('>', position)
+            if tag_start != -1 and tag_end != -1 and page[tag_start + 1:tag_start + 2] in ('a', 'A') and page[tag_start + 2:tag_start + 3].isspace():
+                for match in _ATTRIBUTE_PATTERN.finditer(page, tag_start + 2, tag_end):
+                    if match.group(1).lower() == 'href':
+                        value = match.group(2) if match.group(2) is not None else match.group(3) if match.group(3) is not None else match.group(4)
+                        return html.unescape(value)
+            position = page.find(needle, position + len(needle))
+    return None
+
+def get_clock_in_data(user_variable, user_cookie, target_month, target_year):
+    """
+    从指定网页获取个人打卡查询数据。
+
+    参数：
+        - user_variable：用户变量，用于构建 URL。
+        - user_cookie：用户的 Cookie 信息，用于身份验证。
+        - target_month：目标月份，格式为数字，例如 9 表示九月。
+        - target_year（可选）：目标年份。
+
+    返回值：
+        服务器响应的 JSON 数据，包含个人打卡查询结果。
+    """
+    # 确保 target_month 是两位数格式
+    target_month = f"{int(target_month):02d}"
+    
+    # 220302: 个人打卡查询
+    url = f"{HR_BASE_URL}/ajax/function/alist!{user_variable}.220302"
+    payload = {
+        "appParam": {"TERM": f"{target_year}-{target_month}-01T00:00:00.000Z"},
+        "appFnKey": "SE0302",
+        "formData": {}
+    }
+    return get_hr_client().post_hr_json('clock_in', url, user_cookie, payload)
+
+def get_attendance_data(user_variable, user_cookie, target_month, target_year):
+    """
+    从指定网页获取个人考勤查询数据。
+
+    参数：
+        - user_variable：用户变量，用于构建 URL。
+        - user_cookie：用户的 Cookie 信息，用于身份验证。
+        - target_month：目标月份，格式为数字，例如 9 表示九月。
+        - target_year：目标年份。
+
+    返回值：
+        服务器响应的 JSON 数据，包含个人考勤查询结果。
+    """
+    # 确保 target_month 是两位数格式
+    target_month = f"{int(target_month):02d}"
+    
+    # 220398: 个人考勤查询
+    url = f"{HR_BASE_URL}/ajax/function/alist!{user_variable}.220398"
+    payload = {
+        "appParam": {"TERM": f"{target_year}-{target_month}-01T00:00:00.000Z"},
+        "appFnKey": "SE0398",
+        "formData": {}
+    }
+    return get_hr_client().post_hr_json('attendance', url, user_cookie, payload)
+
+def get_process_application_data(user_variable, user_cookie, limit=0, offset=0):
+    """
+    从指定网页获取审批流程中的请假数据，事假可以用加班抵扣，年假就不计算迟到。
+
+    参数：
+    - user_variable：用户变量，用于构建 URL。
+    - user_cookie：用户的 Cookie 信息，用于身份验证。
+    - limit：每页的流程数，0 表示获取全部。
+    - offset：从第几条流程开始获取。
+
+    返回值：
+    - 服务器响应的 JSON 数据，包含个人流程审批查询结果。
+    """
+    # 290104: 已完成流程申请查询
+    url = f"{HR_BASE_URL}/ajax/function/alist!{ user_variable }.290104"
+    payload = {
+        "searchcols": "",
+        "order": "asc",
+        "limit": limit,
+        "offset": offset,
+        "total": 0,
+        "editType": 0,
+        "form": {
+            "appParam": {
+            "TREEID": 7
+            },
+            "appFnKey": "SW0104",
+            "formData": {
+                "SW0101": {
+                    "fnparam": {},
+                    "data": [
+                    {
+                        "E_EXTATTR": "SW0102,SW0104,SE0348",
+                        "FINISHNUM": "0",
+                        "VALID": "1",
+                        "NEWNUM": "0",
+                        "PID": "1000",
+                        "RETURNNUM": "0",
+                        "K_PKEYS": "CTdI8IsausezsJ_zJEHwGQ",
+                        "K_LOCKED": "",
+                        "K_EXTRAS": "ld5OMqeQ9gwmyA5ArfvbdA",
+                        "EMPID": "16326",
+                        "AUTHKEY": "ODJ26UDjT_siqMi42VPqog",
+                        "INAPPNUM": "0",
+                        "TITLE": "请假申请",
+                        "ID": "7"
+                    }
+                    ],
+                "old": [],
+                "bnparam": {}
+                }
+            }
+        }
+    }
+    return get_hr_client().post_hr_json('process_application', url, user_cookie, payload)
+
+def get_delay_deduction_data(auth_key, user_cookie):
+    """
+    通过 AUTHKEY 获取延时工时扣减的数据
+
+    参数：
+    - auth_key：流程申请中项目的 AUTHKEY，用于构建 URL。
+    - user_cookie：用户的 Cookie 信息，用于身份验证。
+
+    返回值：
+    - 服务器响应的 JSON 数据，包含延时工时扣减申请审批查询结果。
+    """
+    # 290104: 已完成流程申请查询
+    url = f"{HR_BASE_URL}/ajax/flowform/formlist!{ auth_key }"
+    payload = {
+        "formData": {},
+        "bizData": {},
+        "bizFnKey": 'null',
+        "comments": 'null',
+        "fileIds": 'null',
+        "signData": 'null',
+        "receivers": 'null',
+        "freeNode": 'null'
+    }
+    return get_hr_client().post_hr_json('delay_deduction', url, user_cookie, payload)
+
+
+# 并发获取
+def run_concurrently(tasks: Dict[str, Tuple[Callable, tuple]], max_workers: int = FETCH_MAX_WORKERS) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+    """
+    在有界线程池中同时执行多个互不依赖的请求，总耗时约等于最慢的那一个。
+
+    参数:
+        tasks (Dict[str, Tuple[Callable, tuple]]): 任务字典，键为任务名，值为（函数，参数元组）。
+        max_workers (int): 线程池大小，默认为 FETCH_MAX_WORKERS。
+
+    返回值:
+        Tuple[Dict[str, Any], Dict[str, Exception]]: 返回结果字典和异常字典，键均为任务名。
+            某个任务失败不会影响其他任务，由调用方决定如何处理。
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    results = {}
+    errors = {}
+    if not tasks:
+        return results, errors
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks))) as executor:
+        futures = {name: executor.submit(func, *args) for name, (func, args) in tasks.items()}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                errors[name] = e
+    return results, errors
+
+def process_application_rows(response) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """
+    从流程申请接口的响应中取出记录列表和总数。接口可能直接返回列表，也可能返回 {'rows': [...], 'total': n}。
+    """
+    if isinstance(response, list):
+        return response, None
+    if isinstance(response, dict):
+        rows = response.get('rows', response.get('data'))
+        if isinstance(rows, list):
+            total = response.get('total')
+            return rows, int(total) if isinstance(total, (int, str)) and str(total).isdigit() else None
+    raise ValueError(f"无法识别的流程申请数据: {str(response)[:200]}")
+
+def fetch_process_application_pages(user_variable, user_cookie, offset: int, page_size: int) -> Tuple[List[Dict[str, str]], bool]:
+    """
+    从 offset 开始逐页获取流程申请，直到最后一页。记录只保留 PROCESS_APPLICATION_FIELDS。
+
+    接口忽略分页参数时每一页都相同，遇到 ID 与上一页完全相同的一页就停止，不会一直请求下去。
+
+    返回值:
+        Tuple[List[Dict[str, str]], bool]: 记录列表，以及是否因为重复的一页而停止（接口忽略了 offset）。
+    """
+    fetched = []
+    previous_ids = None
+    while True:
+        rows, total = process_application_rows(get_process_application_data(user_variable, user_cookie, page_size, offset + len(fetched)))
+        rows = [{field: row.get(field) for field in PROCESS_APPLICATION_FIELDS} for row in rows]
+        ids = [row['ID'] for row in rows]
+        if rows and ids == previous_ids:
+            return fetched, True
+        previous_ids = ids
+        fetched.extend(rows)
+        if len(rows) < page_size or (total is not None and offset + len(fetched) >= total):
+            return fetched, False
+
+def fetch_process_applications(user_variable, user_cookie, employee: Optional[str] = None, page_size: int = PROCESS_APPLICATION_PAGE_SIZE) -> List[Dict[str, str]]:
+    """
+    获取一个员工的全部已完成流程申请。之前获取过的流程来自本地缓存，只分页获取缓存之后新增的部分。
+
+    接口按完成顺序升序返回，新流程总是追加在末尾，所以缓存的条数就是下一次获取的游标。
+    为防止列表发生变化（例如撤回后重新审批、游标之前插入了流程），每次从游标往前重叠 PROCESS_APPLICATION_PAGE_OVERLAP 条，
+    重叠部分与缓存不一致时丢弃缓存重新完整获取。
+    接口忽略 offset 时返回的总是第一页：从游标获取到的第一条就是缓存的第一条时直接把它当作完整获取的结果，不再重复获取；
+    第一页之后的流程无法获取，打印提示。
+
+    参数:
+        user_variable：流程申请的用户变量。
+        user_cookie：用户的 Cookie 信息，用于身份验证。
+        employee (Optional[str]): 员工，见 employee_key，默认根据 Cookie 计算。
+        page_size (int): 每页获取的流程数。
+
+    返回值:
+        List[Dict[str, str]]: 按接口顺序排列的流程申请记录，只包含 PROCESS_APPLICATION_FIELDS，可直接交给 parse_process_application_data。
+    """
+    if employee is None:
+        employee = employee_key(user_cookie)
+    cached = previous = read_process_application_cache(employee)
+    start = max(0, len(cached) - PROCESS_APPLICATION_PAGE_OVERLAP)
+    fetched, offset_ignored = fetch_process_application_pages(user_variable, user_cookie, start, page_size)
+    if start and fetched and fetched[0]['ID'] == cached[0].get('ID'):
+        offset_ignored = True
+    if offset_ignored:
+        cached, start = [], 0
+
+    overlap = len(cached) - start
+    if [row['AUTHKEY'] for row in fetched[:overlap]] != [row.get('AUTHKEY') for row in cached[start:]]:
+        print("流程申请列表与本地缓存不一致，重新完整获取")
+        cached, start, overlap = [], 0, 0
+        fetched, offset_ignored = fetch_process_application_pages(user_variable, user_cookie, start, page_size)
+    if offset_ignored and len(fetched) >= page_size:
+        print(f"流程申请接口忽略了分页参数，只获取到前 {len(fetched)} 条")
+
+    records = cached[:start] + fetched
+    if records != previous:
+        try:
+            save_process_application_cache(employee, records)
+        except OSError as e:
+            print(f"保存流程申请缓存失败: {e}")
+    return records
+
+def parse_delay_deduction_forms(data) -> List[List[str]]:
+    """
+    从 get_delay_deduction_data 的返回值中取出每个表单的 [CARDBEGINTIME, CARDENDTIME]。
+
+    异常:
+        ValueError: 响应中没有 formList 或表单缺少时间字段（例如接口返回了错误信息），这样的响应不能缓存。
+    """
+    try:
+        return [[form['formData']['CARDBEGINTIME'], form['formData']['CARDENDTIME']] for form in data['formList']]
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"无法识别的延时工时扣减表单: {str(data)[:200]}") from e
+
+def fetch_delay_deduction_forms(auth_keys: List[str], user_cookie, max_workers: int = FETCH_MAX_WORKERS) -> Dict[str, List[List[str]]]:
+    """
+    获取多个延时工时扣减申请的表单时间段。本地缓存中已有的 AUTHKEY 不再联网，其余的在有界线程池中同时获取，
+    获取成功的写入缓存。
+
+    参数:
+        auth_keys (List[str]): 流程申请中延时工时扣减申请的 AUTHKEY 列表。
+        user_cookie: 用户的 Cookie 信息，用于身份验证。
+        max_workers (int): 同时获取的表单数。
+
+    返回值:
+        Dict[str, List[List[str]]]: 键为 AUTHKEY，值为 [CARDBEGINTIME, CARDENDTIME] 列表。
+
+    异常:
+        任何一个表单获取失败或无法识别时，先缓存其余获取成功的表单，再抛出第一个异常。失败的表单不会写入缓存。
+    """
+    if not auth_keys:
+        return {}
+    with _delay_deduction_lock:
+        cache = read_delay_deduction_cache()
+    forms = {auth_key: cache[auth_key] for auth_key in auth_keys if auth_key in cache}
+    missing = {auth_key: (get_delay_deduction_data, (auth_key, user_cookie)) for auth_key in auth_keys if auth_key not in forms}
+    if not missing:
+        return forms
+
+    print(f"正在获取延时工时扣减数据: {len(missing)} 条（本地缓存 {len(forms)} 条）")
+    results, errors = run_concurrently(missing, max_workers)
+    fetched = {}
+    for auth_key, data in results.items():
+        try:
+            fetched[auth_key] = parse_delay_deduction_forms(data)
+        except ValueError as e:
+            errors[auth_key] = e
+    if fetched:
+        try:
+            save_delay_deduction_forms(fetched)
+        except OSError as e:
+            print(f"保存延时工时扣减缓存失败: {e}")
+    if errors:
+        raise next(iter(errors.values()))
+    forms.update(fetched)
+    return forms
+
+def fetch_month_data(user_variable, user_cookie, target_month, target_year, process_variable=None,
+                     warehouse: Optional[PunchWarehouse] = None, employee: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+    """
+    拿到 user_variable 之后，同时获取指定月份的打卡数据、考勤数据和节假日数据。
+
+    参数：
+        - user_variable：个人考勤查询的用户变量。
+        - user_cookie：用户的 Cookie 信息，用于身份验证。
+        - target_month：目标月份，格式为数字，例如 9 表示九月。
+        - target_year：目标年份。
+        - process_variable（可选）：流程申请的用户变量，提供时一并获取流程申请数据（见 fetch_process_applications）。
+        - warehouse（可选）：本地打卡记录仓库，提供时打卡数据经由仓库获取，见 PunchWarehouse。
+        - employee（可选）：员工，提供 warehouse 时必须提供，见 employee_key。
+
+    返回值：
+        - 结果字典，键为 'clock_in'、'attendance'、'holiday'（以及 'process_application'），
+          值与对应的 get_* 函数（和 fetch_process_applications）返回值一致。
+        - 异常字典，键同上，只包含失败的请求。
+    """
+    tasks = {
+        'clock_in': (get_clock_in_data, (user_variable, user_cookie, target_month, target_year)),
+        'attendance': (get_attendance_data, (user_variable, user_cookie, target_month, target_year)),
+        'holiday': (get_holiday_year_for_month, (target_year,)),
+    }
+    if warehouse is not None:
+        tasks['clock_in'] = (warehouse.clock_in_data, (employee, target_year, target_month) + tasks['clock_in'])
+    if process_variable:
+        tasks['process_application'] = (fetch_process_applications, (process_variable, user_cookie, employee))
+    with profile_phase('fetch', month=f"{target_year}-{int(target_month):02d}"):
+        return run_concurrently(tasks)
+
+def fetch_month_data_with_retry(user_variable, user_cookie, target_month, target_year,
+                                warehouse: Optional[PunchWarehouse] = None, employee: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+    """
+    与 fetch_month_data 相同，但打卡数据返回认证错误时重新获取用户变量再试一次。
+
+    缓存的用户变量可能已经失效，认证错误发生时缓存已被清除，重新获取会访问门户页面。
+
+    异常：
+        - 重新获取用户变量失败时抛出对应异常。
+    """
+    month_data, fetch_errors = fetch_month_data(user_variable, user_cookie, target_month, target_year, None, warehouse, employee)
+    if isinstance(fetch_errors.get('clock_in'), HrAuthError):
+        user_variable = get_user_variable_online(user_cookie)
+        month_data, fetch_errors = fetch_month_data(user_variable, user_cookie, target_month, target_year, None, warehouse, employee)
+    return month_data, fetch_errors
+
+def fetch_months_pipelined(user_variable, user_cookie, months: List[Tuple[int, int]], max_workers: int = FETCH_MAX_WORKERS,
+                           warehouse: Optional[PunchWarehouse] = None, employee: Optional[str] = None):
+    """
+    同时获取多个月份的数据，哪个月先拿齐就先交给调用方计算。
+
+    参数:
+        user_variable：个人考勤查询的用户变量，所有月份共用。
+        user_cookie：用户的 Cookie 信息，用于身份验证。
+        months (List[Tuple[int, int]]): 要获取的 (年, 月) 列表。
+        max_workers (int): 同时获取的月份数。
+        warehouse (Optional[PunchWarehouse]): 本地打卡记录仓库，见 fetch_month_data。
+        employee (Optional[str]): 员工，见 employee_key。
+
+    返回值:
+        生成器，按完成顺序产出 (年, 月, 结果字典, 异常字典)，字典格式与 fetch_month_data 一致。
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(fetch_month_data_with_retry, user_variable, user_cookie, month, year, warehouse, employee): (year, month)
+            for year, month in months
+        }
+        for future in as_completed(futures):
+            year, month = futures[future]
+            try:
+                month_data, fetch_errors = future.result()
+            except Exception as e:
+                month_data, fetch_errors = {}, {'clock_in': e}
+            yield year, month, month_data, fetch_errors
+
+
+# 团队批量处理
+def create_process_pool() -> 'ProcessPoolExecutor':
+    """
+    创建执行计算的进程池。
+
+    调用时通常已经有连接池、节假日预取和会话续期等线程在运行，fork 出来的子进程会继承这些线程持有的锁，
+    可能永远等不到释放，所以固定使用 spawn 启动子进程。子进程不共享主进程的缓存，计算需要的数据都通过参数传入。
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_context
+
+    return ProcessPoolExecutor(mp_context=get_context('spawn'))
+
+def iter_batch_entries(batch_path: str):
+    """
+    逐个读取团队批量处理的员工列表。
+
+    文件可以是 JSON 数组，也可以是 NDJSON（每行一个 JSON 对象），都是逐个读取，不会一次载入整个文件；
+    只有一个员工时也可以是单个 JSON 对象。每个员工至少包含 'cookie'，可选 'name' 和 'rate'（小时工资基数）。
+
+    参数:
+        batch_path (str): 员工列表文件路径，'-' 表示标准输入。
+
+    返回值:
+        生成器，逐个产出员工字典。
+
+    异常:
+        ValueError: 某一项不是 JSON 对象，或文件是包含员工数组的 JSON 对象（例如 {"employees": [...]}）。
+    """
+    unsupported = "员工列表应为 JSON 数组或 NDJSON（每行一个员工对象），不支持把员工数组放在 JSON 对象中"
+    with open_input(batch_path) as file:
+        for _, entry in iter_json_records(file):
+            if not isinstance(entry, dict):
+                raise ValueError(f"员工列表中的每一项应为 JSON 对象，实际为 {type(entry).__name__}")
+            if 'cookie' not in entry and any(isinstance(value, list) for value in entry.values()):
+                raise ValueError(unsupported)
+            yield entry
+
+def fetch_employee_month(user_cookie, target_year, target_month) -> Dict[str, Any]:
+    """
+    获取一个员工一个月的数据，供团队批量处理使用。
+
+    参数:
+        user_cookie：员工的 Cookie 信息。
+        target_year：目标年份。
+        target_month：目标月份。
+
+    返回值:
+        Dict[str, Any]: fetch_month_data 的结果字典，考勤数据获取失败时不包含 'attendance'。
+
+    异常:
+        获取用户变量、打卡数据或节假日数据失败时抛出对应异常。
+    """
+    if not user_cookie:
+        raise ValueError("未提供Cookie信息")
+    user_variable = get_user_variable_online(user_cookie)
+    month_data, fetch_errors = fetch_month_data_with_retry(user_variable, user_cookie, target_month, target_year)
+    for name in ('clock_in', 'holiday'):
+        if name in fetch_errors:
+            raise fetch_errors[name]
+    return month_data
+
+def compute_employee_month(month_data: Dict[str, Any], hourly_rate=20) -> Tuple[Optional[Dict[str, float]], float]:
+    """
+    计算一个员工一个月的汇总数值。在进程池中运行，只把汇总结果传回主进程。
+
+    参数:
+        month_data (Dict[str, Any]): fetch_employee_month 的返回值。
+        hourly_rate: 小时工资基数。
+
+    返回值:
+        Tuple[Optional[Dict[str, float]], float]: summarize_totals 的结果（没有打卡记录时为 None）和加班费合计。
+    """
+    result, overtime_income, holidays, workdays, late_count, late_minutes = process_month_data(month_data, hourly_rate)
+    if not result:
+        return None, overtime_income
+    return summarize_totals(result, workdays, holidays, late_count, late_minutes), overtime_income
+
+def process_team_batch(entries, target_year, target_month, default_rate=20, max_workers: int = BATCH_MAX_WORKERS, max_in_flight: int = BATCH_MAX_IN_FLIGHT):
+    """
+    并发处理整个团队一个月的数据。
+
+    网络请求在线程池中交错进行，计算交给进程池（见 create_process_pool）；同一时刻最多有 max_in_flight 个员工在处理中，
+    员工列表按需读取，结果逐个产出，所以内存占用与团队规模无关。节假日数据只在主进程获取一次，
+    全年数据随 month_data 传给计算进程（见 use_holiday_year_data），每个计算进程每年只建立一个日历索引。
+
+    参数:
+        entries: 员工字典的可迭代对象，见 iter_batch_entries。
+        target_year：目标年份。
+        target_month：目标月份。
+        default_rate：员工没有指定 'rate' 时使用的小时工资基数。
+        max_workers (int): 网络线程池大小。
+        max_in_flight (int): 同时处理的员工数上限。
+
+    返回值:
+        生成器，按完成顺序产出 (员工名称, 汇总数值或 None, 加班费合计, 异常或 None)。
+    """
+    # 先在主线程把节假日数据载入内存，后面获取数据的线程直接复用
+    get_holiday_year_data(int(target_year))
+
+    entries = iter(entries)
+    pending = {}    # future -> (阶段, 员工名称, 小时工资基数)
+    exhausted = False
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+    with ThreadPoolExecutor(max_workers=max_workers) as io_pool, create_process_pool() as cpu_pool:
+        while True:
+            while not exhausted and len(pending) < max_in_flight:
+                entry = next(entries, None)
+                if entry is None:
+                    exhausted = True
+                    break
+                user_cookie = entry.get('cookie')
+                name = entry.get('name') or cookie_fingerprint(user_cookie)
+                future = io_pool.submit(fetch_employee_month, user_cookie, target_year, target_month)
+                pending[future] = ('fetch', name, entry.get('rate', default_rate))
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, name, hourly_rate = pending.pop(future)
+                try:
+                    value = future.result()
+                except Exception as e:
+                    yield name, None, 0.0, e
+                    continue
+                if stage == 'fetch':
+                    pending[cpu_pool.submit(compute_employee_month, value, hourly_rate)] = ('compute', name, hourly_rate)
+                else:
+                    totals, overtime_income = value
+                    yield name, totals, overtime_income, None
+
+
+# 常驻服务
+DAY_RECORD_FIELDS = ('date', 'start_time', 'end_time', 'day_type', 'rate', 'overtime_hours', 'overtime_pay', 'meal_allowance', 'total_income', 'late_minutes')
+
+def day_record_to_dict(record: 'DayRecord') -> Dict[str, Any]:
+    """
+    把每天的计算结果转换成字典。
+
+    参数:
+        record (DayRecord): compute_day_records 或 compute_custom_data 产生的结果。
+
+    返回值:
+        Dict[str, Any]: 键见 DAY_RECORD_FIELDS。
+    """
+    return {
+        'date': record.date,
+        'start_time': record.start_time,
+        'end_time': record.end_time,
+        'day_type': record.day_type_name,
+        'rate': record.rate,
+        'overtime_hours': record.overtime,
+        'overtime_pay': record.overtime_pay,
+        'meal_allowance': float(record.allowance),
+        'total_income': record.total_income,
+        'late_minutes': record.late_minutes
+    }
+
+def build_report(result: list, totals: Optional[Dict[str, float]], overtime_income: float) -> Dict[str, Any]:
+    """
+    组装结构化的计算结果。
+
+    参数:
+        result (list): 每天的计算结果。
+        totals (Optional[Dict[str, float]]): summarize_totals 的结果，没有记录时为 None。
+        overtime_income (float): 加班费合计。
+
+    返回值:
+        Dict[str, Any]: 包含 'days'、'summary' 和 'rank'。
+    """
+    return {
+        'days': [day_record_to_dict(record) for record in result],
+        'summary': totals,
+        'rank': rank_cal(overtime_income)
+    }
+
+class ReportWriter:
+    """
+    结构化输出（--format json/csv/ndjson）：每天的计算结果和汇总数值原样输出，不构建文本表格。
+
+    每天的记录边算边写，汇总放在最后；数值不做格式化，浮点数按 repr 输出，读回来与计算结果完全相同。
+        - ndjson：每行一个对象，'type' 为 'day' 或 'summary'；
+        - json：{"days": [...], "summaries": [...]}，days 边算边写，不在内存中保留；
+        - csv：先是每天的记录（表头为 DAY_RECORD_FIELDS），空一行后是汇总（表头为 SUMMARY_FIELDS 和 rank）。
+    context_fields 为每条记录前附加的字段，例如多月模式的 'month'、团队批量处理的 'name'（团队汇总为空）。
+    """
+    def __init__(self, output_format: str, stream, context_fields: Tuple[str, ...] = ()):
+        self.format = output_format
+        self.stream = stream
+        self.context_fields = context_fields
+        self.summaries = []
+        self.day_count = 0
+        # json.dumps 带非默认参数时每次都会新建编码器，这里只建一次
+        self.encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        if output_format == 'csv':
+            import csv
+            self.csv = csv.writer(stream, lineterminator='\n')
+            self.csv.writerow(context_fields + DAY_RECORD_FIELDS)
+        elif output_format == 'json':
+            stream.write('{"days":[')
+
+    def day(self, record: 'DayRecord', **context):
+        """
+        输出一天的计算结果。
+        """
+        if self.format == 'csv':
+            self.csv.writerow([context.get(field, '') for field in self.context_fields] + [
+                record.date, record.start_time, record.end_time, record.day_type_name, record.rate, record.overtime,
+                record.overtime_pay, float(record.allowance), record.total_income, record.late_minutes])
+        elif self.format == 'json':
+            self.stream.write((',\n' if self.day_count else '\n') + self.encode({**context, **day_record_to_dict(record)}))
+        else:
+            self.stream.write(self.encode({'type': 'day', **context, **day_record_to_dict(record)}) + '\n')
+        self.day_count += 1
+
+    def summary(self, totals: Dict[str, float], rank: Optional[str] = None, **context):
+        """
+        输出一组汇总数值（summarize_totals 的结果），ndjson 立即输出，json 和 csv 在 close 时输出。
+        """
+        item = dict(context, **totals, rank=rank)
+        if self.format == 'ndjson':
+            self.stream.write(self.encode({'type': 'summary', **item}) + '\n')
+        else:
+            self.summaries.append(item)
+
+    def close(self):
+        if self.format == 'csv':
+            self.stream.write('\n')
+            self.csv.writerow(self.context_fields + SUMMARY_FIELDS + ('rank',))
+            for item in self.summaries:
+                self.csv.writerow([item.get(field, '') for field in self.context_fields + SUMMARY_FIELDS] + [item['rank'] or ''])
+        elif self.format == 'json':
+            self.stream.write(('\n' if self.day_count else '') + '],"summaries":' + self.encode(self.summaries) + '}\n')
+        self.stream.flush()
+
+def compute_custom_report(data: Dict[str, Any], hourly_rate=20) -> Dict[str, Any]:
+    """
+    计算自定义加班数据并返回结构化结果，在进程池中运行。
+
+    参数:
+        data (Dict[str, Any]): 与 --custom 文件内容相同的自定义数据。
+        hourly_rate: 数据中没有 'hourlyRate' 时使用的小时工资基数。
+
+    返回值:
+        Dict[str, Any]: build_report 的结果。
+
+    异常:
+        ValueError: 'customData' 无效。
+    """
+    result, overtime_income, holidays, workdays = compute_custom_data(data, hourly_rate)
+    if not result:
+        raise ValueError("未提供有效的自定义加班数据")
+    totals = summarize_totals(result, workdays, holidays, data.get('personalLeaveHours', 0), data.get('sickLeaveHours', 0))
+    return build_report(result, totals, overtime_income)
+
+def compute_month_report(month_data: Dict[str, Any], hourly_rate=20) -> Dict[str, Any]:
+    """
+    计算一个月的在线数据并返回结构化结果，在进程池中运行。
+
+    参数:
+        month_data (Dict[str, Any]): fetch_employee_month 的返回值。
+        hourly_rate: 小时工资基数。
+
+    返回值:
+        Dict[str, Any]: build_report 的结果。
+    """
+    result, overtime_income, holidays, workdays, late_count, late_minutes = process_month_data(month_data, hourly_rate)
+    totals = summarize_totals(result, workdays, holidays, late_count, late_minutes) if result else None
+    return build_report(result, totals, overtime_income)
+
+def handle_calculate_request(payload: Dict[str, Any], cpu_pool: 'ProcessPoolExecutor') -> Dict[str, Any]:
+    """
+    处理一次计算请求，参数与命令行一致。
+
+    参数:
+        payload (Dict[str, Any]): 请求体，可包含：
+            - 'custom'：自定义数据对象（与 --custom 文件的内容相同）；不接受文件路径，避免读取服务端的任意文件；
+            - 'cookie'：Cookie 信息（对应 --cookie）；
+            - 'yearMonth'：年月 YYYY-MM（对应 --yearMonth），默认为当前月份；
+            - 'rate'：小时工资基数（对应 --rate），默认为 20。
+        cpu_pool (ProcessPoolExecutor): 执行计算的进程池。
+
+    返回值:
+        Dict[str, Any]: build_report 的结果，在线数据会额外包含 'yearMonth'。
+
+    异常:
+        ValueError: 请求参数不正确。
+    """
+    hourly_rate = payload.get('rate', 20)
+    custom = payload.get('custom')
+    if custom is not None:
+        if not isinstance(custom, dict):
+            raise ValueError("custom 应为自定义数据对象")
+        return cpu_pool.submit(compute_custom_report, custom, hourly_rate).result()
+
+    user_cookie = payload.get('cookie')
+    if not user_cookie:
+        raise ValueError("未提供Cookie信息")
+    year_month = payload.get('yearMonth')
+    target_year, target_month = parse_year_month(year_month) if year_month else (datetime.now().year, datetime.now().month)
+    # 网络请求在当前线程进行，复用进程内的连接池和缓存；计算交给进程池
+    month_data = fetch_employee_month(user_cookie, target_year, target_month)
+    report = cpu_pool.submit(compute_month_report, month_data, hourly_rate).result()
+    report['yearMonth'] = f"{target_year}-{target_month:02d}"
+    return report
+
+
+class CalculatorRequestHandlerMixin:
+    """
+    常驻服务的请求处理器，serve() 中与 http.server.BaseHTTPRequestHandler 组合使用。
+
+    GET  /health     返回服务状态、HTTP 请求统计和每个主机的限流状态。
+    POST /calculate  请求体见 handle_calculate_request，返回 {"success": true, "data": ...}。
+    """
+
+    server_version = 'OvertimeCalculator/1.0'
+
+    def do_GET(self):
+        if self.path != '/health':
+            self._send_json(404, {'success': False, 'error': '未知的路径'})
+            return
+        self._send_json(200, {'success': True, 'data': {'http': get_hr_client().stats(), 'limits': get_hr_client().limiter_stats()}})
+
+    def do_POST(self):
+        if self.path != '/calculate':
+            self._send_json(404, {'success': False, 'error': '未知的路径'})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length <= 0 or length > SERVE_MAX_BODY:
+            self._send_json(400, {'success': False, 'error': '请求体为空或过大'})
+            return
+        try:
+            payload = json.loads(self.rfile.read(length))
+            if not isinstance(payload, dict):
+                raise ValueError("请求体应为 JSON 对象")
+        except ValueError as e:
+            self._send_json(400, {'success': False, 'error': f"请求体格式不正确: {e}"})
+            return
+        try:
+            report = handle_calculate_request(payload, self.server.cpu_pool)
+        except ValueError as e:
+            self._send_json(400, {'success': False, 'error': str(e)})
+            return
+        except HrAuthError as e:
+            self._send_json(401, {'success': False, 'error': str(e)})
+            return
+        except Exception as e:
+            self._send_json(500, {'success': False, 'error': f"计算失败: {e}"})
+            return
+        self._send_json(200, {'success': True, 'data': report})
+
+    def _send_json(self, status: int, body: Dict[str, Any]):
+        content = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def address_string(self):
+        # Unix socket 的 client_address 是空字符串
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+
+class UnixServerMixin:
+    """
+    让 ThreadingHTTPServer 监听 Unix socket，serve() 中与其组合使用，并设置 address_family。
+    """
+
+    def server_bind(self):
+        import socket
+
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        socket.socket.bind(self.socket, self.server_address)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+def serve(host: str = SERVE_HOST, port: int = SERVE_PORT, socket_path: Optional[str] = None):
+    """
+    以常驻服务模式运行，直到收到 Ctrl+C。
+
+    模块、HTTP 连接池、节假日和用户变量缓存在各请求间保持热状态；每个请求在独立线程中处理，
+    计算交给与 CPU 核数相同大小的进程池（见 create_process_pool），所以并发请求的吞吐量随核数增长。
+    server/ 中的 Node 服务用的是 TypeScript 移植版（server/services/overtimeService.ts），并不启动本脚本，
+    所以目前还没有接入这个服务；调用方是需要反复计算的脚本和命令行工具，每个请求省去一次进程启动和导入。
+
+    参数:
+        host (str): 监听地址，默认只监听本机。
+        port (int): 监听端口。
+        socket_path (Optional[str]): 指定时改为监听该 Unix socket，忽略 host 和 port。
+    """
+    import socket
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    handler_class = type('CalculatorRequestHandler', (CalculatorRequestHandlerMixin, BaseHTTPRequestHandler), {})
+    if socket_path:
+        server_class = type('UnixThreadingHTTPServer', (UnixServerMixin, ThreadingHTTPServer), {'address_family': socket.AF_UNIX})
+        server = server_class(socket_path, handler_class)
+        address = socket_path
+    else:
+        server = ThreadingHTTPServer((host, port), handler_class)
+        address = f"http://{host}:{port}"
+    server.daemon_threads = True
+
+    # 提前创建连接池并在后台载入今年的节假日数据，第一个请求不用等
+    get_hr_client()
+    threading.Thread(target=get_holiday_year_data, args=(datetime.now().year,), daemon=True).start()
+
+    with create_process_pool() as cpu_pool:
+        server.cpu_pool = cpu_pool
+        print(f"加班计算服务已启动: {address}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if socket_path and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+# 会话管理
+def parse_cookie_string(user_cookie: str) -> Dict[str, str]:
+    """
+    把 'a=1; b=2' 形式的 Cookie 解析为有序字典，值中可以包含 '='。
+    """
+    cookies = {}
+    for item in str(user_cookie).split(';'):
+        name, _, value = item.strip().partition('=')
+        if name:
+            cookies[name] = value
+    return cookies
+
+def token_expiry(token: Optional[str]) -> Optional[float]:
+    """
+    读取 JWT 格式的 quectel_token 中的 exp（不校验签名）。
+
+    返回值:
+        Optional[float]: 过期时间（Unix 时间戳），不是 JWT 或没有 exp 时返回 None。
+    """
+    import base64
+
+    parts = (token or '').split('.')
+    if len(parts) != 3:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(parts[1] + '=' * (-len(parts[1]) % 4)))
+    except ValueError:
+        return None
+    exp = payload.get('exp') if isinstance(payload, dict) else None
+    return float(exp) if isinstance(exp, (int, float)) and not isinstance(exp, bool) else None
+
+class SessionManager:
+    """
+    保存在 COOKIES_FILE 中的登录会话：Cookie（含 quectel_token / quectel_refresh_token）和过期时间。
+
+    快过期时访问 get_session_refresh_url() 续期，把响应（含重定向）中的 Set-Cookie 合并进 Cookie；
+    只有创建时指定 allow_login 才会在续期失败且 Cookie 已经失效时打开浏览器重新登录。
+    start_background_refresh 之后由后台线程在过期前续期。
+
+    只有续期或浏览器登录拿到的 Cookie 才会写入 COOKIES_FILE，命令行提供的 Cookie 只在本次运行中使用。
+    各个获取函数需要的是字符串：每个阶段开始时用 current() 取当前的 Cookie。
+    """
+
+    def __init__(self, user_cookie: Optional[str] = None, allow_login: bool = False):
+        """
+        参数:
+            user_cookie (Optional[str]): 命令行提供的 Cookie，本次运行中代替保存的会话，但不写入文件。
+            allow_login (bool): 没有可用的 Cookie 时是否允许打开浏览器登录。
+        """
+        stored = {}
+        if not user_cookie:
+            try:
+                stored = get_cookie() or {}
+            except (OSError, ValueError) as e:
+                print(f"读取 Cookie 文件失败: {e}")
+        self.allow_login = allow_login
+        self.cookie = stored.get('user_cookie') or ''
+        self.expires_at = stored.get('expires_at')
+        self.refreshed_at = stored.get('refreshed_at') or 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stopped = threading.Event()
+        if user_cookie:
+            self._update(user_cookie, persist=False)
+
+    def current(self) -> str:
+        """
+        返回当前的 Cookie。
+        """
+        with self._lock:
+            return self.cookie
+
+    def expiry(self) -> float:
+        """
+        返回会话的过期时间（Unix 时间戳）。token 中没有过期时间时按最近一次确认有效后 SESSION_DEFAULT_TTL 计算。
+        """
+        with self._lock:
+            return self.expires_at if self.expires_at is not None else self.refreshed_at + SESSION_DEFAULT_TTL
+
+    def needs_refresh(self) -> bool:
+        return self.expiry() - t.time() < SESSION_REFRESH_MARGIN
+
+    def refresh(self) -> bool:
+        """
+        访问续期地址，把响应中的 Set-Cookie 合并进 Cookie 并保存。
+
+        返回值:
+            bool: 门户接受了当前的 Cookie（没有认证错误）且没有清除 quectel_token 时返回 True。
+        """
+        import requests
+
+        with self._refresh_lock:
+            user_cookie = self.current()
+            try:
+                response = get_hr_client().request('session_refresh', 'GET', get_session_refresh_url(), headers=hr_headers(user_cookie))
+            except requests.exceptions.RequestException as e:
+                print(f"会话续期失败: {e}")
+                return False
+            if is_auth_error(response) or response.status_code != 200:
+                print(f"会话续期失败: {response.status_code}")
+                return False
+            cookies = parse_cookie_string(user_cookie)
+            for hop in response.history + [response]:
+                cookies.update(hop.cookies.get_dict())
+            if cookies.get('quectel_token') == '':
+                print("会话续期失败: 门户清除了 quectel_token")
+                return False
+            self._update('; '.join(f"{name}={value}" for name, value in cookies.items()))
+            return True
+
+    def ensure_valid(self) -> bool:
+        """
+        确保有一个可用的 Cookie：快过期时先续期，没有 Cookie 或续期失败且已经过期时才尝试浏览器登录（见 login）。
+
+        返回值:
+            bool: 拿到了 Cookie 返回 True。
+        """
+        if not self.current():
+            return self.login()
+        if self.needs_refresh() and not self.refresh() and self.expiry() <= t.time():
+            return self.login()
+        return True
+
+    def recover(self) -> bool:
+        """
+        接口返回认证错误后调用：先尝试续期，失败再尝试浏览器登录（见 login）。
+
+        返回值:
+            bool: 拿到了新的 Cookie 返回 True。
+        """
+        return self.refresh() or self.login()
+
+    def login(self) -> bool:
+        """
+        打开浏览器让用户登录，保存获取到的 Cookie。没有指定 allow_login 时直接返回 False，
+        避免在非交互环境（例如被插件调用时）弹出浏览器。
+        """
+        if not self.allow_login:
+            return False
+        try:
+            user_cookie = fetch_cookie_via_browser()
+        except ImportError as e:
+            print(f"无法打开浏览器登录: {e}")
+            return False
+        if not user_cookie:
+            return False
+        self._update(user_cookie)
+        return True
+
+    def start_background_refresh(self):
+        """
+        启动后台线程，在过期前 SESSION_REFRESH_MARGIN 秒续期，失败时每 SESSION_RETRY_INTERVAL 秒重试。
+        后台线程不会打开浏览器，程序退出时自动结束。
+        """
+        threading.Thread(target=self._refresh_loop, name='session-refresh', daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _refresh_loop(self):
+        delay = max(0.0, self.expiry() - SESSION_REFRESH_MARGIN - t.time())
+        while not self._stopped.wait(delay):
+            delay = max(0.0, self.expiry() - SESSION_REFRESH_MARGIN - t.time()) if self.refresh() else SESSION_RETRY_INTERVAL
+
+    def _update(self, user_cookie: str, persist: bool = True):
+        """
+        记下新的 Cookie 和过期时间，persist 为 True 时保存到 COOKIES_FILE。
+        """
+        expires_at = token_expiry(parse_cookie_string(user_cookie).get('quectel_token'))
+        refreshed_at = t.time()
+        with self._lock:
+            self.cookie = user_cookie
+            self.expires_at = expires_at
+            self.refreshed_at = refreshed_at
+        if not persist:
+            return
+        try:
+            save_cookie(user_cookie, expires_at, refreshed_at)
+        except OSError as e:
+            print(f"保存 Cookie 失败: {e}")
+
+
+# 浏览器操作
+def validate_user_cookie(user_cookie):
+    """
+    验证用户的 Cookie 是否包含所有必需的字段。
+
+    参数：
+        user_cookie：用户的 Cookie 字符串。
+
+    返回值：
+        如果包含所有必需字段，返回 True；否则返回 False。
+    """
+    required_fields = [
+        'quectel_lang',
+        'quectel_token',
+        'quectel_refresh_token',
+        'quectel_user_info',
+        'MCLGID',
+        'MCHRID',
+        'ENMAME',
+        'EMPTYPE'
+    ]
+
+    # 将 Cookie 字符串转换为字典
+    cookie_dict = dict(item.strip().split("=") for item in user_cookie.split(";"))
+
+    # 检查是否包含所有必需字段
+    for field in required_fields:
+        if field not in cookie_dict:
+            return False
+    return True
+
+def fetch_cookie_via_browser(browser='auto'):
+    """
+    启动浏览器获取 Cookie 并返回。
+
+    参数:
+        browser (str): 使用的浏览器类型 ('chrome', 'edge', 'auto')。默认为 'auto'。
+
+    返回值:
+        str: 获取到的 Cookie 字符串，如果成功；否则返回 None。
+    """
+    import shutil
+    import platform
+
+    if browser == 'auto':
+        # 自动检测 Chrome 或 Edge 浏览器是否存在
+        print(f"您的系统为 {platform.system()}，正在检测 Chrome 或 Edge 浏览器是否安装...")
+        chrome_path = None
+        if platform.system() == 'Windows':
+            system_drive = os.getenv('SystemDrive', 'C:')
+            # 需要在Program Files前面添加斜杠，不然获取到的路径不正确
+            chrome_path = os.path.join(system_drive, "\\Program Files", "Google", "Chrome", "Application", "chrome.exe")
+            if os.path.exists(chrome_path):
+                browser = 'chrome'
+            else:
+                browser = 'edge'
+        elif platform.system() == 'Linux':
+            if shutil.which("google-chrome") or shutil.which("chromium-browser"):
+                browser = 'chrome'
+            elif shutil.which("microsoft-edge"):
+                browser = 'edge'
+            else:
+                print("未找到 Chrome 或 Edge 浏览器，请至少安装其中一种浏览器。")
+                exit()
+        elif platform.system() == 'Darwin':  # macOS
+            if os.path.exists("/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"):
+                browser = 'chrome'
+            elif os.path.exists("/Applications/Microsoft Edge.app/Contents/MacOS/Microsoft Edge"):
+                browser = 'edge'
+            else:
+                print("未找到 Chrome 或 Edge 浏览器，请至少安装其中一种浏览器。")
+                exit()
+        else:
+            print("未知的操作系统。")
+            exit()
+
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options as ChromeOptions
+    from selenium.webdriver.chrome.service import Service as ChromeService
+    from selenium.webdriver.edge.options import Options as EdgeOptions
+    from selenium.webdriver.edge.service import Service as EdgeService
+    from webdriver_manager.chrome import ChromeDriverManager
+    from webdriver_manager.microsoft import EdgeChromiumDriverManager
+
+    if browser == 'edge':
+        options = EdgeOptions()
+        service = EdgeService(EdgeChromiumDriverManager().install())
+    else:
+        options = ChromeOptions()
+        service = ChromeService(ChromeDriverManager().install())
+
+    # 添加必要的浏览器选项
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option('useAutomationExtension', False)
+
+    print(f"正在启动{browser}浏览器以获取Cookie...")
+    driver = webdriver.Chrome(service=service, options=options) if browser == 'chrome' else webdriver.Edge(service=service, options=options)
+    driver.get(HR_BASE_URL)
+
+    print("请在打开的浏览器中登录网站，获取到了Cookie会自动退出...")
+
+    while True:
+        try:
+            cookies = driver.get_cookies()
+            cookie_str = "; ".join(f"{cookie['name']}={cookie['value']}" for cookie in cookies)
+            if validate_user_cookie(cookie_str):
+                driver.quit()
+                return cookie_str
+        except Exception as e:
+            print(f"获取Cookie时出错: {e}")
+            # 不关闭浏览器，继续等待用户登录
+        t.sleep(1)  # 等待一秒后重新检查
+
+
+# 逻辑部分
+def parse_clock_time(value: str) -> Tuple[int, bool]:
+    """
+    把 'HH:MM:SS' 或 'HH:MM:SS(异地打卡)' 转换为当天的秒数。
+
+    参数:
+        value (str): 打卡时间。
+
+    返回值:
+        Tuple[int, bool]: (当天的秒数, 是否异地打卡)。
+
+    异常:
+        ValueError: 时间格式不正确（与 datetime.strptime(value, '%H:%M:%S') 接受的格式一致）。
+    """
+    remote = value[-6:] == REMOTE_CLOCK_IN_SUFFIX
+    if remote:
+        value = value[:-6]
+    # 绝大多数打卡时间是补零的 8 个字符，直接按位置切片
+    # isdigit 也接受全角等非 ASCII 数字，strptime 不接受，所以先检查 isascii
+    if not value.isascii():
+        raise ValueError(f"打卡时间格式不正确: {value!r}")
+    if len(value) == 8 and value[2] == ':' and value[5] == ':' and value[:2].isdigit() and value[3:5].isdigit() and value[6:].isdigit():
+        hour, minute, second = int(value[:2]), int(value[3:5]), int(value[6:])
+    else:
+        parts = value.split(':')
+        if len(parts) != 3 or not all(part.isdigit() and 1 <= len(part) <= 2 for part in parts):
+            raise ValueError(f"打卡时间格式不正确: {value!r}")
+        hour, minute, second = int(parts[0]), int(parts[1]), int(parts[2])
+    if hour > 23 or minute > 59 or second > 59:
+        raise ValueError(f"打卡时间格式不正确: {value!r}")
+    return hour * 3600 + minute * 60 + second, remote
+
+class CalendarIndex:
+    """
+    一年的日历索引：按一年中的第几天（从 0 开始）保存日期类型编码和节假日工资倍数。
+    """
+    __slots__ = ('year', 'month_starts', 'day_types', 'wages', 'month_holidays', 'month_weekends')
+
+    def __init__(self, year: int, holidays: Dict[str, int], workdays: Set[str]):
+        self.year = year
+        # month_starts[m - 1] 为 m 月 1 日在一年中的序号，month_starts[12] 为全年天数
+        leap = year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+        self.month_starts = [0] * 13
+        for month, days in enumerate((31, 29 if leap else 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31), 1):
+            self.month_starts[month] = self.month_starts[month - 1] + days
+        days = self.month_starts[12]
+        self.day_types = bytearray(days)
+        self.wages = bytearray(days)
+
+        weekday = datetime(year, 1, 1).weekday()
+        for ordinal in range(days):
+            if (weekday + ordinal) % 7 >= 5:
+                self.day_types[ordinal] = DAY_WEEKEND
+        for date in workdays:
+            ordinal = self.ordinal(date)
+            if ordinal is not None:
+                self.day_types[ordinal] = DAY_WORKDAY
+        self.month_holidays = [0] * 12
+        for date, wage in holidays.items():
+            ordinal = self.ordinal(date)
+            if ordinal is not None:
+                self.day_types[ordinal] = DAY_HOLIDAY if wage == 3 else DAY_HOLIDAY_WEEKEND
+                self.wages[ordinal] = wage
+                self.month_holidays[int(date[5:7]) - 1] += 1
+        self.month_weekends = [self.day_types[self.month_starts[month]:self.month_starts[month + 1]].count(DAY_WEEKEND) for month in range(12)]
+
+    def ordinal(self, date: str) -> Optional[int]:
+        """
+        'YYYY-MM-DD' 在这一年中的序号，不属于这一年或格式不正确时返回 None。
+        """
+        if len(date) != 10 or date[4] != '-' or date[7] != '-' or date[:4] != str(self.year):
+            return None
+        try:
+            month, day = int(date[5:7]), int(date[8:10])
+        except ValueError:
+            return None
+        if not 1 <= month <= 12 or not 1 <= day <= self.month_starts[month] - self.month_starts[month - 1]:
+            return None
+        return self.month_starts[month - 1] + day - 1
+
+    def day_type(self, date: str) -> int:
+        """
+        日期类型编码（DAY_WORKDAY 等）。
+        """
+        return self.day_types[self.month_starts[int(date[5:7]) - 1] + int(date[8:10]) - 1]
+
+    def days_in_month(self, month: int) -> int:
+        return self.month_starts[month] - self.month_starts[month - 1]
+
+    def count_weekends(self, month: int) -> int:
+        """
+        当月不是节假日也不是调休工作日的周末天数。
+        """
+        return self.month_weekends[month - 1]
+
+    def required_workdays(self, month: int) -> int:
+        """
+        当月应出勤天数：当月天数 - 节假日天数 - 周末天数。
+        """
+        return self.days_in_month(month) - self.month_holidays[month - 1] - self.month_weekends[month - 1]
+
+_calendar_indexes = {}          # 年份 -> (全年节假日数据, 日历索引)
+_custom_calendar_indexes = {}   # (年份, 节假日, 工作日) -> 日历索引
+_calendar_index_lock = threading.Lock()
+
+def get_calendar_index(year: int, holidays: Optional[Dict[str, int]] = None, workdays: Optional[Set[str]] = None) -> CalendarIndex:
+    """
+    获取一年的日历索引。
+
+    不指定 holidays 和 workdays 时按 get_holiday_year_data 的全年数据构建，以年份为键缓存，
+    各个月份、用户和常驻服务的请求共享同一个索引；全年数据更新（当年的缓存过期）后重新构建。
+    指定时（自定义数据、基准和测试）按数据内容另外缓存，最多 CALENDAR_INDEX_CACHE_LIMIT 个。
+
+    参数:
+        year (int): 年份。
+        holidays (Optional[Dict[str, int]]): 节假日数据，键为日期，值为工资倍数。只使用属于这一年的日期。
+        workdays (Optional[Set[str]]): 工作日数据，包含日期的集合。只使用属于这一年的日期。
+
+    返回值:
+        CalendarIndex: 日历索引。
+    """
+    if holidays is None and workdays is None:
+        holiday_data = get_holiday_year_data(year)
+        with _calendar_index_lock:
+            cached = _calendar_indexes.get(year)
+            if cached is not None and cached[0] is holiday_data:
+                return cached[1]
+        year_holidays, year_workdays = filter_holiday_data(holiday_data, str(year)) if holiday_data is not None else ({}, set())
+        index = CalendarIndex(year, year_holidays, year_workdays)
+        with _calendar_index_lock:
+            _calendar_indexes[year] = (holiday_data, index)
+        return index
+
+    prefix = str(year)
+    key = (year,
+           frozenset((date, wage) for date, wage in (holidays or {}).items() if date[:4] == prefix),
+           frozenset(date for date in (workdays or ()) if date[:4] == prefix))
+    with _calendar_index_lock:
+        index = _custom_calendar_indexes.get(key)
+        if index is not None:
+            return index
+    index = CalendarIndex(year, dict(key[1]), key[2])
+    with _calendar_index_lock:
+        if len(_custom_calendar_indexes) >= CALENDAR_INDEX_CACHE_LIMIT:
+            _custom_calendar_indexes.pop(next(iter(_custom_calendar_indexes)))
+        return _custom_calendar_indexes.setdefault(key, index)
+
+def get_day_type(date: str, holidays: Optional[Dict[str, int]], workdays: Optional[Set[str]], calendar: Optional[CalendarIndex] = None) -> str:
+    """
+    判断指定日期的性质。
+
+    参数:
+        date (str): 要判断的日期，格式为 'YYYY-MM-DD'。
+        holidays (Optional[Dict[str, int]]): 节假日数据，键为日期，值为工资倍数；为 None 时使用全年数据，见 get_calendar_index。
+        workdays (Optional[Set[str]]): 工作日数据，包含日期的集合；为 None 时同上。
+        calendar (Optional[CalendarIndex]): 已经取得的当年日历索引，逐天判断时由调用方传入以免重复查找。
+
+    返回值:
+        str: 返回日期的性质，可能的值为 "节假日", "节假日(周末)", "周末", "工作日"。
+    """
+    year = int(date[:4])
+    if calendar is None or calendar.year != year:
+        calendar = get_calendar_index(year, holidays, workdays)
+    return DAY_TYPE_NAMES[calendar.day_type(date)]
+
+def _leave_minutes(text: str) -> int:
+    """
+    'YYYY-MM-DD HH:MM'（或 'YYYY-MM-DDTHH:MM'，忽略之后的秒数）转换为 0001-01-01 起的分钟数。
+
+    异常:
+        ValueError: 格式不正确或日期时间不存在。
+    """
+    if len(text) < 16 or text[4] != '-' or text[7] != '-' or text[10] not in ' T' or text[13] != ':':
+        raise ValueError(f"time data {text!r} does not match format '%Y-%m-%d %H:%M'")
+    hour, minute = int(text[11:13]), int(text[14:16])
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"time data {text!r} does not match format '%Y-%m-%d %H:%M'")
+    day = datetime(int(text[:4]), int(text[5:7]), int(text[8:10])).toordinal()
+    return day * 1440 + hour * 60 + minute
+
+def _window_minutes_before(minutes: int) -> int:
+    """
+    从 0001-01-01 到指定时刻为止，每天 09:00-18:00 窗口内的累计分钟数。两个时刻相减即为区间与工作时间的重叠分钟数。
+    """
+    day, minute = divmod(minutes, 1440)
+    window = LEAVE_WINDOW_END_MINUTES - LEAVE_WINDOW_START_MINUTES
+    return day * window + min(max(minute - LEAVE_WINDOW_START_MINUTES, 0), window)
+
+class IntervalTimeline:
+    """
+    互不重叠的时间区间集合，区间以分钟数表示（左闭右开），按开始时间排序保存在两个并列的列表中。
+
+    登记和取消都是批量的（add_many、remove_many），与已有区间做一次归并；在列表中间逐个插入或删除
+    每次都要移动之后的元素，所以不提供单个的 add 和 remove。重叠查询通过二分查找只访问与查询范围相交的区间。
+    """
+    __slots__ = ('starts', 'ends')
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def add_many(self, ranges):
+        """
+        一次插入多个区间：先排序要插入的区间，再与已有区间归并，重叠或相接的合并，耗时为 O(k log k + n)。
+        """
+        starts, ends = [], []
+        for start, end in heapq.merge(zip(self.starts, self.ends), sorted(ranges)):
+            if start >= end:
+                continue
+            if ends and start <= ends[-1]:
+                if end > ends[-1]:
+                    ends[-1] = end
+            else:
+                starts.append(start)
+                ends.append(end)
+        self.starts, self.ends = starts, ends
+
+    def remove_many(self, ranges):
+        """
+        一次扣除多个区间：先合并要扣除的区间，再与已有区间做一次归并，耗时与两者的总数成正比。
+        逐个扣除时每次都要移动之后的元素，大量扣除落在列表中间时慢得多。
+        """
+        merged = []
+        for start, end in sorted(ranges):
+            if start >= end:
+                continue
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        if not merged:
+            return
+        starts, ends = [], []
+        first = 0
+        for interval_start, interval_end in zip(self.starts, self.ends):
+            while first < len(merged) and merged[first][1] <= interval_start:
+                first += 1
+            current = interval_start
+            index = first
+            while index < len(merged) and merged[index][0] < interval_end:
+                if merged[index][0] > current:
+                    starts.append(current)
+                    ends.append(merged[index][0])
+                current = max(current, merged[index][1])
+                index += 1
+            if current < interval_end:
+                starts.append(current)
+                ends.append(interval_end)
+        self.starts, self.ends = starts, ends
+
+    def intervals(self, start: Optional[int] = None, end: Optional[int] = None):
+        """
+        按时间顺序返回与 [start, end) 相交的区间（截取到查询范围之内），不指定范围时返回全部区间。
+        """
+        first = 0 if start is None else bisect.bisect_right(self.ends, start)
+        last = len(self.starts) if end is None else bisect.bisect_left(self.starts, end)
+        for index in range(first, last):
+            interval_start, interval_end = self.starts[index], self.ends[index]
+            if start is not None and interval_start < start:
+                interval_start = start
+            if end is not None and interval_end > end:
+                interval_end = end
+            yield interval_start, interval_end
+
+    def overlap_minutes(self, start: int, end: int, window: bool = True) -> int:
+        """
+        与 [start, end) 重叠的分钟数，window 为 True 时只计算每天 09:00-18:00 之内的部分。
+        """
+        if window:
+            return sum(_window_minutes_before(b) - _window_minutes_before(a) for a, b in self.intervals(start, end))
+        return sum(b - a for a, b in self.intervals(start, end))
+
+class LeaveTimeline:
+    """
+    一个员工的请假时间线：年假、事假和延时工时扣减各一条 IntervalTimeline。
+
+    年假和事假只计算每天 09:00-18:00 之内的部分；延时工时扣减发生在下班之后，按原始时间段保存。
+    """
+    __slots__ = ('timelines',)
+
+    def __init__(self):
+        self.timelines = {leave_type: IntervalTimeline() for leave_type in LEAVE_TYPES + ('延时工时扣减',)}
+
+    def add_many(self, leave_type: str, ranges):
+        """
+        批量登记指定类型的请假，ranges 为 (开始, 结束) 的列表，见 IntervalTimeline.add_many。
+        """
+        self.timelines[leave_type].add_many(ranges)
+
+    def cancel_many(self, cancellations):
+        """
+        批量销假，cancellations 为 (类型列表, 开始, 结束) 的列表，见 IntervalTimeline.remove_many。
+        """
+        for leave_type, timeline in self.timelines.items():
+            ranges = [(start, end) for leave_types, start, end in cancellations if leave_type in leave_types]
+            if ranges:
+                timeline.remove_many(ranges)
+
+    def leave_minutes(self, leave_type: str, start: int, end: int) -> int:
+        """
+        [start, end) 内指定类型的请假分钟数；年假和事假只计算工作时间之内的部分。
+        """
+        return self.timelines[leave_type].overlap_minutes(start, end, window=leave_type in LEAVE_TYPES)
+
+    def day_periods(self, leave_type: str) -> Dict[str, List[Tuple[str, str]]]:
+        """
+        按日期展开指定类型的时间线，键为日期，值为当天时间段的列表（开始时间，结束时间），格式为 'HH:MM'。
+
+        年假和事假按天截取到 09:00-18:00 之内，没有落在工作时间内的日期不出现；
+        延时工时扣减按开始日期归类，时间段不截取。
+        """
+        periods = {}
+        timeline = self.timelines[leave_type]
+        for start, end in timeline.intervals():
+            if leave_type not in LEAVE_TYPES:
+                periods.setdefault(_ordinal_date(start // 1440), []).append((_minutes_clock(start), _minutes_clock(end)))
+                continue
+            for day in range(start // 1440, (end - 1) // 1440 + 1):
+                day_start = max(start, day * 1440 + LEAVE_WINDOW_START_MINUTES)
+                day_end = min(end, day * 1440 + LEAVE_WINDOW_END_MINUTES)
+                if day_start < day_end:
+                    periods.setdefault(_ordinal_date(day), []).append((_minutes_clock(day_start), _minutes_clock(day_end)))
+        return periods
+
+def _ordinal_date(day: int) -> str:
+    date = datetime.fromordinal(day)
+    return f"{date.year:04d}-{date.month:02d}-{date.day:02d}"
+
+def _minutes_clock(minutes: int) -> str:
+    hour, minute = divmod(minutes % 1440, 60)
+    return f"{hour:02d}:{minute:02d}"
+
+def _leave_range(text: str) -> Tuple[int, int]:
+    """
+    解析流程摘要中的时间段，'YYYY-MM-DD HH:MM - YYYY-MM-DD HH:MM' 或 'YYYY-MM-DD HH:MM 至 YYYY-MM-DD HH:MM'。
+    """
+    if ' - ' in text:
+        start_time, end_time = text.split(' - ')
+    elif ' 至 ' in text:
+        start_time, end_time = text.split(' 至 ')
+    else:
+        raise ValueError("Invalid time range format")
+    return _leave_minutes(start_time), _leave_minutes(end_time)
+
+def build_leave_timeline(leave_data: List[Dict], user_cookie: str) -> LeaveTimeline:
+    """
+    根据流程申请数据构建请假时间线。
+
+    先登记全部年假、事假和延时工时扣减，再处理销假申请，因此与流程列表的排列顺序无关。
+    延时工时扣减的表单通过 fetch_delay_deduction_forms 同时获取并永久缓存。
+    销假申请的摘要中注明了年假或事假时只从对应的时间线中扣除；没有注明时只从与销假时间段重叠最多的一种中扣除
+    （一样多时按 LEAVE_TYPES 的顺序取第一种），两种都不重叠时忽略，不会把另一种请假一起销掉。
+
+    参数:
+        leave_data (List[Dict]): 流程申请记录的列表，每个记录是一个字典。
+        user_cookie (str): 用户的 Cookie 信息，用于获取延时工时扣减的表单。
+
+    返回值:
+        LeaveTimeline: 请假时间线。
+    """
+    timeline = LeaveTimeline()
+    leaves = {leave_type: [] for leave_type in timeline.timelines}
+    cancellations = []
+    deduction_keys = []
+
+    for record in leave_data:
+        abstracts = record['ABSTRACTS']  # 获取摘要信息
+        parts = abstracts.split('|')
+        leave_type = parts[1] if len(parts) > 1 else None
+
+        if leave_type in LEAVE_TYPES and len(parts) > 3:
+            try:
+                leaves[leave_type].append(_leave_range(parts[3]))
+            except ValueError as e:
+                print(f"Error parsing time range in record: {record}")
+                print(f"Exception: {e}")
+
+        elif leave_type == '销假申请' and len(parts) > 3:
+            try:
+                start, end = _leave_range(parts[3])
+            except ValueError as e:
+                print(f"Error parsing time range in record: {record}")
+                print(f"Exception: {e}")
+                continue
+            named = [name for name in LEAVE_TYPES if any(name in part for part in parts[2:3] + parts[4:])]
+            cancellations.append((named, start, end))
+
+        elif leave_type == '延时工时扣减申请':
+            deduction_keys.append(record['AUTHKEY'])
+
+    # 延时工时扣减的表单一次性同时获取，已缓存的不再联网
+    for auth_key, periods in fetch_delay_deduction_forms(deduction_keys, user_cookie).items():
+        for begin_time, end_time in periods:
+            try:
+                leaves['延时工时扣减'].append((_leave_minutes(begin_time), _leave_minutes(end_time)))
+            except (TypeError, ValueError) as e:
+                print(f"Error parsing delay deduction form {auth_key}: {begin_time} - {end_time}")
+                print(f"Exception: {e}")
+
+    for leave_type, ranges in leaves.items():
+        timeline.add_many(leave_type, ranges)
+
+    # 没有注明类型的销假在全部请假登记之后才能确定对应的类型
+    resolved = []
+    for named, start, end in cancellations:
+        if not named:
+            overlaps = {name: timeline.timelines[name].overlap_minutes(start, end, window=False) for name in LEAVE_TYPES}
+            best = max(LEAVE_TYPES, key=overlaps.get)
+            if not overlaps[best]:
+                continue
+            named = [best]
+        resolved.append((named, start, end))
+    timeline.cancel_many(resolved)
+    return timeline
+
+def parse_process_application_data(leave_data: List[Dict], user_cookie: str) -> Tuple[Dict[str, List[Tuple[str, str]]], Dict[str, List[Tuple[str, str]]], Dict[str, List[Tuple[str, str]]]]:
+    """
+    解析流程申请数据。
+
+    参数:
+        leave_data (List[Dict]): 包含年假、事假、销假和延时工时扣减记录的列表，每个记录是一个字典。
+        user_cookie (str): 用户的 Cookie 信息，用于身份验证。
+
+    返回值:
+        Tuple[Dict[str, List[Tuple[str, str]]], Dict[str, List[Tuple[str, str]]], Dict[str, List[Tuple[str, str]]]]: 返回三个字典，分别存储年假、事假和延时工时扣减的信息。
+        - annual_leave (Dict[str, List[Tuple[str, str]]]): 年假数据，键为日期，值为时间段的列表（开始时间，结束时间）。
+        - personal_leave (Dict[str, List[Tuple[str, str]]]): 事假数据，键为日期，值为时间段的列表（开始时间，结束时间）。
+        - delay_deduction (Dict[str, List[Tuple[str, str]]]): 延时工时扣减数据，键为日期，值为时间段的列表（开始时间，结束时间）。
+        同一类型中重叠或相接的时间段会合并，已销假的部分会扣除，见 build_leave_timeline。时间均为 'HH:MM'：
+        年假和事假每天都截取到 09:00-18:00 之内（包括第一天和最后一天），延时工时扣减不再保留表单中的秒数。
+    """
+    with profile_phase('parse_leave', records=len(leave_data)):
+        timeline = build_leave_timeline(leave_data, user_cookie)
+        annual_leave = timeline.day_periods('年假')
+        personal_leave = timeline.day_periods('事假')
+        delay_deduction = timeline.day_periods('延时工时扣减')
+    return annual_leave, personal_leave, delay_deduction  # 返回年假、事假和延时工时扣减的字典
+
+def parse_attendance_data(attendance_json: str) -> Tuple[Dict[str, List[int]], int, int]:
+    """
+    解析个人考勤信息的JSON数据，提取每日的迟到分钟数、当月累计的迟到次数和当月累计的迟到分钟数。
+
+    参数：
+        - attendance_json：个人考勤信息的JSON数据。
+
+    返回值：
+        - daily_late_minutes：每日的迟到分钟数字典，键为日期，值为迟到分钟数列表。
+        - total_late_count：当月累计的迟到次数。
+        - total_late_minutes：当月累计的迟到分钟数。
+    """
+    # 解析JSON数据
+    # 如果传入的是列表，直接使用；如果是字符串，解析为列表
+    if isinstance(attendance_json, str):
+        attendance_data = json.loads(attendance_json)
     else:
         attendance_data = attendance_json
     
@@ -713,382 +3359,1033 @@ def parse_attendance_data(attendance_json: str) -> Tuple[Dict[str, List[int]], i
         if total_late_minutes is None:
             total_late_minutes = int(record.get("LATEMIN", 0))
 
-    return daily_late_minutes, total_late_count, total_late_minutes
+    return daily_late_minutes, total_late_count, total_late_minutes
+
+def count_weekends(year: int, month: int, holidays: list, workdays: set) -> int:
+    """
+    计算指定年份和月份中的周末天数（不包括节假日和工作日）。
+
+    参数:
+        year (int): 年份。
+        month (int): 月份。
+        holidays (list): 节假日列表，包含日期的字符串，格式为 'YYYY-MM-DD'。
+        workdays (set): 工作日集合，包含日期的字符串，格式为 'YYYY-MM-DD'。
+
+    返回值:
+        int: 指定月份中的周末天数（不包括节假日和工作日）。
+    """
+    return get_calendar_index(year, holidays, workdays).count_weekends(month)
+
+def count_required_workdays(months: Set[str], holidays: Optional[Dict[str, int]], workdays: Optional[Set[str]]) -> int:
+    """
+    计算若干个月的应出勤天数之和（每月天数 - 节假日天数 - 周末天数）。
+
+    参数:
+        months (Set[str]): 月份集合，格式为 'YYYY-MM'。
+        holidays (Optional[Dict[str, int]]): 节假日数据；为 None 时使用全年数据，见 get_calendar_index。
+        workdays (Optional[Set[str]]): 工作日数据；为 None 时同上。
+
+    返回值:
+        int: 应出勤天数。
+    """
+    # 先按年份拆分节假日数据，跨很多年时不必为每一年扫描全部日期
+    holidays_by_year = workdays_by_year = None
+    if holidays is not None or workdays is not None:
+        holidays_by_year = {}
+        for date, wage in (holidays or {}).items():
+            holidays_by_year.setdefault(date[:4], {})[date] = wage
+        workdays_by_year = {}
+        for date in workdays or ():
+            workdays_by_year.setdefault(date[:4], set()).add(date)
+
+    required_workdays = 0
+    calendar = None
+    for year_month in sorted(months):
+        year, month = int(year_month[:4]), int(year_month[5:7])
+        if calendar is None or calendar.year != year:
+            if holidays_by_year is None:
+                calendar = get_calendar_index(year)
+            else:
+                calendar = get_calendar_index(year, holidays_by_year.get(year_month[:4], {}), workdays_by_year.get(year_month[:4], set()))
+        required_workdays += calendar.required_workdays(month)
+    return required_workdays
+
+def pay_rate_cal(day_type: str) -> str:
+    """
+    计算加班费率。
+
+    参数:
+        day_type (str): 日期类型，可以是 "工作日", "周末", "节假日(周末)" 或 "节假日"。
+
+    返回值:
+        str: 对应日期类型的加班费率。
+    """
+    # 工作日加班费20块/小时,周末30,节假日60
+    return 20 if day_type == "工作日" else 30 if day_type == "周末" or day_type == "节假日(周末)" else 60 if day_type == "节假日" else 0
+
+def overtime_cal(first_seconds: int, last_seconds: int, day_type: str, last_remote: bool = False) -> float:
+    """
+    计算加班时长。
+
+    参数:
+        first_seconds (int): 第一次打卡时间（当天的秒数，见 parse_clock_time）。
+        last_seconds (int): 最后一次打卡时间（当天的秒数）。
+        day_type (str): 日期类型，可以是 "工作日", "周末", "节假日(周末)" 或 "节假日"。
+        last_remote (bool): 最后一次打卡是否异地打卡。
+
+    返回值:
+        float: 加班时长（小时）。
+    """
+    # 只要异地打卡就不算加班,即使是节假日
+    if last_remote:
+        return 0
+    if day_type == '工作日':
+        ret = last_seconds - WORK_END_SECONDS
+    else:
+        ret = last_seconds - first_seconds
+    return ret / 3600 if ret > 0 else 0
+
+def overtime_pay_cal(overtime: str, rate: str) -> str:
+    """
+    计算加班薪资。
+
+    参数:
+        overtime (str): 加班时长（小时）。
+        rate (str): 加班费率。
+
+    返回值:
+        str: 加班薪资。
+    """
+    # 两数相乘
+    return str(float(overtime) * float(rate))
+
+def allowance_cal(overtime: str, day_type: str) -> str:
+    """
+    计算餐补。
+
+    参数:
+        overtime (str): 加班时长（小时）。
+        day_type (str): 日期类型，可以是 "工作日", "周末", "节假日(周末)" 或 "节假日"。
+
+    返回值:
+        str: 餐补金额。
+    """
+    # 工作日加班超过1小时给20,周末和节假日超过4小时给20
+    if day_type == '工作日':
+        return 20 if float(overtime) >= 1.0 else 0
+    else:
+        return 20 if float(overtime) >= 4.0 else 0
+
+def income_cal(overtime_pay: str, allowance: str) -> str:
+    """
+    计算总收入。
+
+    参数:
+        overtime_pay (str): 加班薪资。
+        allowance (str): 餐补金额。
+
+    返回值:
+        str: 总收入。
+    """
+    # 两数相加
+    return float(overtime_pay) + float(allowance)
+
+def late_time_cal(first_seconds: int, day_type: str, first_remote: bool = False, late_minutes: Optional[int] = None) -> str:
+    """
+    计算迟到时间。
+
+    参数:
+        first_seconds (int): 第一次打卡时间（当天的秒数，见 parse_clock_time）。
+        day_type (str): 日期类型，可以是 "工作日", "周末", "节假日(周末)" 或 "节假日"。
+        first_remote (bool): 第一次打卡是否异地打卡。
+        late_minutes (Optional[int]): 迟到分钟数。如果未提供，则根据 first_seconds 计算。
+
+    返回值:
+        str: 迟到时间（分钟）。
+    """
+    # 只要异地打卡就不算迟到
+    if first_remote or day_type != '工作日':
+        return "0"
+    
+    if late_minutes is None:
+        ret = (first_seconds - WORK_START_SECONDS) / 60
+    else:
+        ret = late_minutes
+    
+    return str(ret) if ret > 0 else "0"
+
+class DayRecord:
+    """
+    一天的计算结果。数值字段保存为数字，日期类型保存为 DAY_TYPE_NAMES 中的下标。
+    """
+    __slots__ = ('date', 'start_time', 'end_time', 'day_type', 'rate', 'overtime', 'overtime_pay', 'allowance', 'total_income', 'late_minutes')
+
+    def __init__(self, date: str, start_time: str, end_time: str, day_type: int, rate: int,
+                 overtime: float, overtime_pay: float, allowance: int, total_income: float, late_minutes: float):
+        self.date = date                    # 'YYYY-MM-DD'
+        self.start_time = start_time        # 'HH:MM:SS'
+        self.end_time = end_time            # 'HH:MM:SS'
+        self.day_type = day_type            # DAY_WORKDAY 等
+        self.rate = rate                    # 加班费率
+        self.overtime = overtime            # 加班时长（小时）
+        self.overtime_pay = overtime_pay    # 加班薪资，保留两位小数
+        self.allowance = allowance          # 餐补
+        self.total_income = total_income    # 加班薪资 + 餐补
+        self.late_minutes = late_minutes    # 迟到分钟数
+
+    @property
+    def day_type_name(self) -> str:
+        return DAY_TYPE_NAMES[self.day_type]
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, DayRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        return 'DayRecord(' + ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__) + ')'
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+def make_day_record(date: str, first_check_time: str, last_check_time: str, day_type: str, rate, overtime, overtime_pay, allowance, total_income, late_minutes) -> DayRecord:
+    """
+    把逐行计算函数的返回值转换为 DayRecord，只在这里做一次字符串到数字的转换。
+    """
+    return DayRecord(date, first_check_time[:8], last_check_time[:8], DAY_TYPE_CODES.get(day_type, DAY_OTHER), int(rate),
+                     float(overtime), float(overtime_pay), int(allowance), float(total_income), float(late_minutes))
+
+# summarize_totals 返回的字段，按表格中的顺序排列
+SUMMARY_FIELDS = (
+    'total_overtime_pay', 'actual_overtime_pay', 'total_meal_allowance',
+    'workday_overtime_pay', 'weekend_overtime_pay', 'holiday_overtime_pay',
+    'total_income', 'actual_total_income',
+    'workday_hours', 'weekend_hours', 'holiday_hours', 'total_hours', 'actual_hours',
+    'late_count', 'late_minutes', 'required_workdays', 'actual_workdays'
+)
+
+class SummaryAccumulator:
+    """
+    逐条累加 DayRecord，一次遍历得到 summarize_totals 的全部数值。
+    """
+    def __init__(self, total_late_count: int = 0, total_late_minutes: int = 0):
+        self.total_late_count = total_late_count
+        self.total_late_minutes = total_late_minutes
+        self.total_overtime_pay = 0.0
+        self.total_meal_allowance = 0.0
+        self.total_income = 0.0
+        self.pay_by_type = [0.0] * len(DAY_TYPE_NAMES)
+        self.hours_by_type = [0.0] * len(DAY_TYPE_NAMES)
+        self.actual_workdays = 0.0
+        self.months = set()
+
+    def add(self, record: DayRecord):
+        """
+        累加一天的结果。
+        """
+        day_type = record.day_type
+        self.total_overtime_pay += record.overtime_pay
+        self.total_meal_allowance += record.allowance
+        self.total_income += record.total_income
+        self.pay_by_type[day_type] += record.overtime_pay
+        self.hours_by_type[day_type] += record.overtime
+        if day_type == DAY_WORKDAY:
+            self.actual_workdays += 1
+        self.months.add(record.date[:7])
+
+    def add_columns(self, columns: Dict[str, Any]):
+        """
+        累加 compute_columns 的全部行。每一项按列求和后再加上去，累加器为空时与逐行 add 的结果逐位相同。
+        """
+        np = load_numpy()
+        day_type = columns['day_type']
+        self.total_overtime_pay += columns_total(columns['overtime_pay'])
+        self.total_meal_allowance += columns_total(columns['allowance'])
+        self.total_income += columns_total(columns['income'])
+        for code in range(len(DAY_TYPE_NAMES)):
+            mask = day_type == code
+            # 其他类型的行按 0 参与求和，求和顺序与逐行累加一致
+            self.pay_by_type[code] += columns_total(np.where(mask, columns['overtime_pay'], 0.0))
+            self.hours_by_type[code] += columns_total(np.where(mask, columns['overtime'], 0.0))
+        self.actual_workdays += float((day_type == DAY_WORKDAY).sum())
+        self.months.update(date[:7] for date in columns['date'])
+
+    def totals(self, workdays: set, holidays: list) -> Dict[str, float]:
+        """
+        返回汇总数值，键见 SUMMARY_FIELDS。
+
+        参数:
+            workdays (set): 工作日集合。
+            holidays (list): 节假日列表。
+        """
+        # 结果可能跨多个月（年度汇总），应出勤天数按月分别计算再相加
+        required_workdays = count_required_workdays(self.months, holidays, workdays)
+
+        workday_hours = self.hours_by_type[DAY_WORKDAY]
+        weekend_hours = self.hours_by_type[DAY_WEEKEND]
+        holiday_hours = self.hours_by_type[DAY_HOLIDAY]
+
+        # 计算实际扣减后的加班费
+        # 事假可以用加班抵扣，优先抵扣工作日加班（事假小时数暂未统计，扣减后与扣减前相同）
+        personal_leave_remain_hours = 0.0
+        actual_hours = []
+        for hours in (workday_hours, weekend_hours, holiday_hours):
+            actual = hours - personal_leave_remain_hours
+            if actual < 0:
+                actual = 0
+                personal_leave_remain_hours -= hours
+            else:
+                personal_leave_remain_hours = 0
+            actual_hours.append(actual)
+        actual_workday_hours, actual_weekend_hours, actual_holiday_hours = actual_hours
+
+        actual_overtime_pay = actual_workday_hours * 20 + actual_weekend_hours * 30 + actual_holiday_hours * 60
+        return {
+            'total_overtime_pay': self.total_overtime_pay,
+            'actual_overtime_pay': actual_overtime_pay,
+            'total_meal_allowance': self.total_meal_allowance,
+            'workday_overtime_pay': self.pay_by_type[DAY_WORKDAY],
+            'weekend_overtime_pay': self.pay_by_type[DAY_WEEKEND],
+            'holiday_overtime_pay': self.pay_by_type[DAY_HOLIDAY],
+            'total_income': self.total_income,
+            'actual_total_income': actual_overtime_pay + self.total_meal_allowance,
+            'workday_hours': workday_hours,
+            'weekend_hours': weekend_hours,
+            'holiday_hours': holiday_hours,
+            'total_hours': workday_hours + weekend_hours + holiday_hours,
+            'actual_hours': actual_workday_hours + actual_weekend_hours + actual_holiday_hours,
+            'late_count': self.total_late_count,
+            'late_minutes': self.total_late_minutes,
+            'required_workdays': required_workdays,
+            'actual_workdays': self.actual_workdays
+        }
+
+def summarize_totals(result: list, workdays: set, holidays: list, total_late_count: int, total_late_minutes: int) -> Dict[str, float]:
+    """
+    计算汇总统计的各项数值，不做任何格式化。
+
+    参数:
+        result (list): 打卡记录的统计结果（DayRecord 列表）。
+        workdays (set): 工作日集合。
+        holidays (list): 节假日列表。
+        total_late_count (int): 当月累计的迟到次数。
+        total_late_minutes (int): 当月累计的迟到分钟数。
+
+    返回值:
+        Dict[str, float]: 汇总数值，键见 SUMMARY_FIELDS。
+    """
+    accumulator = SummaryAccumulator(total_late_count, total_late_minutes)
+    for record in result:
+        accumulator.add(record)
+    return accumulator.totals(workdays, holidays)
+
+def summarize(result: list, workdays: set, holidays: list, total_late_count: int, total_late_minutes: int) -> list:
+    """
+    汇总统计结果。
+
+    参数:
+        result (list): 打卡记录的统计结果。
+        workdays (set): 工作日集合。
+        holidays (list): 节假日列表。
+        total_late_count (int): 当月累计的迟到次数。
+        total_late_minutes (int): 当月累计的迟到分钟数。
+
+    返回值:
+        list: 汇总统计结果。
+    """
+    accumulator = SummaryAccumulator(total_late_count, total_late_minutes)
+    for record in result:
+        accumulator.add(record)
+    return summarize_accumulated(accumulator, workdays, holidays)
+
+def summarize_accumulated(accumulator: SummaryAccumulator, workdays: set, holidays: list) -> list:
+    """
+    汇总已经逐条累加好的统计结果，流式处理时使用。
+
+    参数:
+        accumulator (SummaryAccumulator): 累加了全部记录的汇总器。
+        workdays (set): 工作日集合。
+        holidays (list): 节假日列表。
+
+    返回值:
+        list: 汇总统计结果。
+    """
+    with profile_phase('summarize'):
+        totals = accumulator.totals(workdays, holidays)
+    with profile_phase('render'):
+        info = render_summary(totals)
+    print(info)
+    if accumulator.total_late_minutes >= 30:
+        print("小碧崽治这么喜欢迟到，有你好果汁吃！")
+
+    return info
+
+def render_summary(totals: Dict[str, float]) -> str:
+    """
+    把 summarize_totals 的结果渲染成收入、工时、考勤三张表格。
+
+    参数:
+        totals (Dict[str, float]): summarize_totals 的返回值。
+
+    返回值:
+        str: 格式化后的表格文本。
+    """
+    total_overtime_pay = totals['total_overtime_pay']
+    actual_overtime_pay = totals['actual_overtime_pay']
+    total_meal_allowance = totals['total_meal_allowance']
+    total_workday_overtime_pay = totals['workday_overtime_pay']
+    total_weekend_overtime_pay = totals['weekend_overtime_pay']
+    total_holiday_overtime_pay = totals['holiday_overtime_pay']
+    total_income = totals['total_income']
+    actual_total_income = totals['actual_total_income']
+    total_workday_hours = totals['workday_hours']
+    total_weekend_hours = totals['weekend_hours']
+    total_holiday_hours = totals['holiday_hours']
+    total_late_count = totals['late_count']
+    total_late_minutes = totals['late_minutes']
+    required_workdays = totals['required_workdays']
+    actual_workdays = totals['actual_workdays']
+
+    # 定义表格宽度
+    COL_WIDTH = 15
+    NUM_WIDTH = 15
+
+    # 动态生成表格
+    income_table = [
+        [f"{'总加班薪资':^{COL_WIDTH}}", f"{total_overtime_pay:>{NUM_WIDTH}.2f}"],
+        [f"{'实际加班薪资':^{COL_WIDTH}}", f"{actual_overtime_pay:>{NUM_WIDTH}.2f}"],
+        [f"{'总餐补':^{COL_WIDTH}}", f"{total_meal_allowance:>{NUM_WIDTH}.2f}"],
+        [f"{'工作日加班收入':^{COL_WIDTH}}", f"{total_workday_overtime_pay:>{NUM_WIDTH}.2f}"],
+        [f"{'周末加班收入':^{COL_WIDTH}}", f"{total_weekend_overtime_pay:>{NUM_WIDTH}.2f}"], 
+        [f"{'节假日加班收入':^{COL_WIDTH}}", f"{total_holiday_overtime_pay:>{NUM_WIDTH}.2f}"],
+        [f"{'总收入':^{COL_WIDTH}}", f"{total_income:>{NUM_WIDTH}.2f}"],
+        [f"{'扣减后总收入':^{COL_WIDTH}}", f"{actual_total_income:>{NUM_WIDTH}.2f}"]
+    ]
+
+    hours_table = [
+        [f"{'工作日加班时长':^{COL_WIDTH}}", f"{total_workday_hours:>{NUM_WIDTH}.2f} 小时"],
+        [f"{'周末加班时长':^{COL_WIDTH}}", f"{total_weekend_hours:>{NUM_WIDTH}.2f} 小时"], 
+        [f"{'节假日加班时长':^{COL_WIDTH}}", f"{total_holiday_hours:>{NUM_WIDTH}.2f} 小时"],
+        [f"{'总加班时长':^{COL_WIDTH}}", f"{totals['total_hours']:>{NUM_WIDTH}.2f} 小时"],
+        [f"{'扣减后加班时长':^{COL_WIDTH}}", f"{totals['actual_hours']:>{NUM_WIDTH}.2f} 小时"]
+    ]
+
+    attendance_table = [
+        [f"{'当前迟到次数':^{COL_WIDTH}}", f"{total_late_count:>{NUM_WIDTH}d} 次"],
+        [f"{'当前迟到时长':^{COL_WIDTH}}", f"{total_late_minutes:>{NUM_WIDTH}d} 分钟"],
+        [f"{'应出勤天数':^{COL_WIDTH}}", f"{required_workdays:>{NUM_WIDTH}d} 天"],
+        [f"{'实际出勤天数':^{COL_WIDTH}}", f"{actual_workdays:>{NUM_WIDTH}.1f} 天"]
+    ]
+
+    from tabulate import tabulate
+
+    # 使用相同的表格样式和对齐方式
+    table_style = "rounded_grid"
+    col_align = ("center", "right")
+    
+    # Format tables with consistent spacing and borders
+    info = (
+        "\n【收入统计】\n" + 
+        tabulate(income_table, tablefmt=table_style, colalign=col_align) +
+        "\n\n【工时统计】\n" + 
+        tabulate(hours_table, tablefmt=table_style, colalign=col_align) +
+        "\n\n【考勤统计】\n" + 
+        tabulate(attendance_table, tablefmt=table_style, colalign=col_align)
+    )
+    return info
+
+class PunchDay:
+    """
+    一天的上下班打卡：只保留最早和最晚的一次打卡，每天占用固定的内存。
+
+    时间相同的两次打卡优先保留本地打卡（异地打卡不计加班和迟到），重复的打卡不影响结果。
+    """
+    __slots__ = ('first_seconds', 'first_remote', 'first_time', 'last_seconds', 'last_remote', 'last_time')
+
+    def __init__(self, seconds: int, remote: bool, time: str):
+        self.first_seconds = self.last_seconds = seconds
+        self.first_remote = self.last_remote = remote
+        self.first_time = self.last_time = time
+
+    def add(self, seconds: int, remote: bool, time: str):
+        """
+        加入一次打卡，更新最早和最晚的打卡。
+        """
+        if seconds < self.first_seconds or (seconds == self.first_seconds and self.first_remote and not remote):
+            self.first_seconds, self.first_remote, self.first_time = seconds, remote, time
+        if seconds > self.last_seconds or (seconds == self.last_seconds and self.last_remote and not remote):
+            self.last_seconds, self.last_remote, self.last_time = seconds, remote, time
+
+def reduce_punches(clock_in_data: Iterable[Dict[str, str]]) -> Dict[str, PunchDay]:
+    """
+    一次遍历打卡记录，归并出每个 SHIFTTERM 的最早和最晚打卡。
+
+    记录可以乱序、重复，也可以是生成器（例如多个月的记录连在一起），不会先按日期分组再排序。
+
+    参数:
+        clock_in_data (Iterable[Dict[str, str]]): 打卡记录，每条包含 SHIFTTERM 和 CARDTIME。
+
+    返回值:
+        Dict[str, PunchDay]: 键为日期，按每天第一次出现的顺序排列。
+
+    异常:
+        ValueError: 打卡时间格式不正确，见 parse_clock_time。
+    """
+    days = {}
+    for item in clock_in_data:
+        time = item['CARDTIME'][11:]
+        seconds, remote = parse_clock_time(time)
+        day = days.get(item['SHIFTTERM'])
+        if day is None:
+            days[item['SHIFTTERM']] = PunchDay(seconds, remote, time)
+        else:
+            day.add(seconds, remote, time)
+    return days
+
+def compute_day_records(clock_in_data: list, holidays: Optional[Dict[str, int]], workdays: Optional[Set[str]], hourly_rate=20,
+                        store: Optional[ResultStore] = None, employee: Optional[str] = None) -> Tuple[list, float]:
+    """
+    按日期汇总打卡记录并计算每天的加班数据。
+
+    参数:
+        clock_in_data (list): 个人打卡查询接口返回的打卡记录。
+        holidays (Optional[Dict[str, int]]): 节假日数据，键为日期，值为工资倍数；为 None 时使用全年数据，见 get_calendar_index。
+        workdays (Optional[Set[str]]): 工作日数据，包含日期的集合；为 None 时同上。
+        hourly_rate: 小时工资基数。
+        store (Optional[ResultStore]): 本地结果存储。提供时打卡记录、日期类型和工资基数都没变的日期直接使用保存的结果。
+        employee (Optional[str]): 员工，提供 store 时必须提供，见 employee_key。
+
+    返回值:
+        Tuple[list, float]: 每天的计算结果（DayRecord 列表）和加班费合计。
+    """
+    if store is not None:
+        return compute_day_records_incremental(clock_in_data, holidays, workdays, hourly_rate, store, employee)
+
+    if len(clock_in_data) >= COLUMNAR_MIN_ROWS and load_numpy() is not None:
+        try:
+            columns = compute_columns(load_punch_columns([clock_in_data], holidays, workdays), hourly_rate)
+            return columns_to_day_records(columns), columns_total(columns['overtime_pay'])
+        except ValueError:
+            # 日期格式不正确时列式计算无法分组，交给逐行计算，由它给出一样的结果或错误
+            pass
+
+    result = []                 # 这玩意存结果,列表里边是 DayRecord
+    overtime_income = 0.0       # 加班费
+    
+    calendar = None             # 当年的日历索引，跨年时重新获取
+    
+    for date, punches in reduce_punches(clock_in_data).items():
+        if calendar is None or calendar.year != int(date[:4]):
+            calendar = get_calendar_index(int(date[:4]), holidays, workdays)
+        day_type = get_day_type(date, holidays, workdays, calendar)
+        record = compute_punch_day(date, punches, day_type, hourly_rate)
+        overtime_income += record.overtime_pay
+        result.append(record)
+    return result, overtime_income
+
+def compute_punch_day(date: str, punches: PunchDay, day_type: str, hourly_rate) -> 'DayRecord':
+    """
+    计算一天的加班数据。
+
+    参数:
+        date (str): 日期，格式为 'YYYY-MM-DD'。
+        punches (PunchDay): 当天最早（上班）和最晚（下班）的打卡，见 reduce_punches。
+        day_type (str): 日期类型。
+        hourly_rate: 小时工资基数。
+
+    返回值:
+        DayRecord: 当天的计算结果。
+    """
+    first_check_time, first_seconds, first_remote = punches.first_time, punches.first_seconds, punches.first_remote
+    last_check_time, last_seconds, last_remote = punches.last_time, punches.last_seconds, punches.last_remote
+    rate = pay_rate_cal(day_type)
+    overtime = overtime_cal(first_seconds, last_seconds, day_type, last_remote)
+    overtime_pay = overtime_pay_cal(overtime, rate, hourly_rate)
+    allowance = allowance_cal(overtime, day_type)
+    total_income = income_cal(overtime_pay, allowance)
+    late_minutes = late_time_cal(first_seconds, day_type, first_remote)
+    
+    return make_day_record(date, first_check_time, last_check_time, day_type, rate, overtime, overtime_pay, allowance, total_income, late_minutes)
+
+def compute_day_records_incremental(clock_in_data: list, holidays: Optional[Dict[str, int]], workdays: Optional[Set[str]], hourly_rate,
+                                    store: ResultStore, employee: str) -> Tuple[list, float]:
+    """
+    与 compute_day_records 相同，但只重新计算本地存储中没有或打卡记录有变化的日期。
+
+    每天的摘要由当天最早和最晚的打卡时间、日期类型和小时工资基数计算，任何一项变化都会重新计算。
+    存储读写失败时打印原因并按全部重新计算处理。
+    """
+    import hashlib, sqlite3
+
+    group_by_date = reduce_punches(clock_in_data)
+    if not group_by_date:
+        return [], 0.0
 
-def count_weekends(year: int, month: int, holidays: list, workdays: set) -> int:
+    try:
+        saved = store.load_day_results(employee, min(group_by_date), max(group_by_date))
+    except sqlite3.Error as e:
+        print(f"读取本地数据库失败: {e}")
+        saved = {}
+
+    result = []
+    changed = []
+    overtime_income = 0.0
+    calendar = None
+    for date, punches in group_by_date.items():
+        if calendar is None or calendar.year != int(date[:4]):
+            calendar = get_calendar_index(int(date[:4]), holidays, workdays)
+        day_type = get_day_type(date, holidays, workdays, calendar)
+        punch_hash = hashlib.sha1('\n'.join((punches.first_time, punches.last_time, day_type, repr(float(hourly_rate)))).encode('utf-8')).hexdigest()
+        cached = saved.get(date)
+        if cached is not None and cached[0] == punch_hash:
+            record = cached[1]
+        else:
+            record = compute_punch_day(date, punches, day_type, hourly_rate)
+            changed.append((punch_hash, record))
+        overtime_income += record.overtime_pay
+        result.append(record)
+
+    if changed:
+        try:
+            store.save_day_results(employee, changed)
+        except sqlite3.Error as e:
+            print(f"保存本地数据库失败: {e}")
+    return result, overtime_income
+
+def process_month_data(month_data: Dict[str, Any], hourly_rate=20, store: Optional[ResultStore] = None, employee: Optional[str] = None) -> Tuple[list, float, None, None, int, int]:
     """
-    计算指定年份和月份中的周末天数（不包括节假日和工作日）。
+    计算 fetch_month_data 获取到的一个月的数据。可以在计算进程中运行，节假日数据随 month_data 传入。
 
     参数:
-        year (int): 年份。
-        month (int): 月份。
-        holidays (list): 节假日列表，包含日期的字符串，格式为 'YYYY-MM-DD'。
-        workdays (set): 工作日集合，包含日期的字符串，格式为 'YYYY-MM-DD'。
+        month_data (Dict[str, Any]): fetch_month_data 返回的结果字典，必须包含 'clock_in' 和 'holiday'，
+            没有 'attendance' 时按未迟到处理。
+        hourly_rate: 小时工资基数。
+        store (Optional[ResultStore]): 本地结果存储，见 compute_day_records。
+        employee (Optional[str]): 员工，见 employee_key。
 
     返回值:
-        int: 指定月份中的周末天数（不包括节假日和工作日）。
+        Tuple: (每天的计算结果, 加班费合计, 节假日, 工作日, 迟到次数, 迟到分钟数)。
+            节假日和工作日为 None，表示使用按年份共享的日历索引（见 get_calendar_index），可以直接传给 summarize_totals 等函数。
     """
-    first_day = datetime(year, month, 1)
-    if month == 12:
-        last_day = datetime(year + 1, 1, 1) - timedelta(days=1)
-    else:
-        last_day = datetime(year, month + 1, 1) - timedelta(days=1)
-    weekends = 0
-    current_day = first_day
-    while current_day <= last_day:
-        cur = str(current_day.year) + '-' + str(current_day.month).zfill(2) + '-' + str(current_day.day).zfill(2)
-        if current_day.weekday() in (5, 6) and cur not in holidays and cur not in workdays:
-            weekends += 1
-        current_day += timedelta(days=1)
-    return weekends
-
-def pay_rate_cal(day_type: str) -> str:
+    use_holiday_year_data(*month_data['holiday'])
+    holidays, workdays = None, None
+    with profile_phase('compute', rows=len(month_data['clock_in'])):
+        result, overtime_income = compute_day_records(month_data['clock_in'], holidays, workdays, hourly_rate, store, employee)
+    total_late_count, total_late_minutes = 0, 0
+    if 'attendance' in month_data:
+        with profile_phase('parse_attendance'):
+            _, late_count, late_minutes = parse_attendance_data(month_data['attendance'])
+        total_late_count = late_count or 0
+        total_late_minutes = late_minutes or 0
+    return result, overtime_income, holidays, workdays, total_late_count, total_late_minutes
+
+def rank_cal(overtime_income: float) -> str:
     """
-    计算加班费率。
+    根据加班费给出评价。
 
     参数:
-        day_type (str): 日期类型，可以是 "工作日", "周末", "节假日(周末)" 或 "节假日"。
+        overtime_income (float): 加班费合计。
 
     返回值:
-        str: 对应日期类型的加班费率。
+        str: 评价信息。
     """
-    # 工作日加班费20块/小时,周末30,节假日60
-    return 20 if day_type == "工作日" else 30 if day_type == "周末" or day_type == "节假日(周末)" else 60 if day_type == "节假日" else 0
+    rank = ''
+    if overtime_income < 300:
+        rank = '李在赣神魔？'
+    elif 300 <= overtime_income < 500:
+        rank = '不太行'
+    elif 500 <= overtime_income < 1000:
+        rank = '一般，建议多加点 冲1000'
+    elif 1000 <= overtime_income <= 1500:
+        rank = '牛逼'
+    elif 1500 <= overtime_income < 2000:
+        rank = '逆天'
+    elif overtime_income >= 2000:
+        rank = f'你是懂加班的，白加了 {overtime_income - 2000} 元'
+    return rank
 
-def overtime_cal(first_check_time: str, last_check_time: str, day_type: str) -> str:
+def parse_year_month(year_month: str) -> Tuple[int, int]:
     """
-    计算加班时长。
-
-    参数:
-        first_check_time (str): 第一次打卡时间，格式为 'HH:MM:SS'。
-        last_check_time (str): 最后一次打卡时间，格式为 'HH:MM:SS'。
-        day_type (str): 日期类型，可以是 "工作日", "周末", "节假日(周末)" 或 "节假日"。
+    解析 'YYYY-MM' 格式的年月。
 
     返回值:
-        str: 加班时长（小时）。
+        Tuple[int, int]: (年, 月)。
+
+    异常:
+        ValueError: 格式不正确或月份不在 1-12 之间。
     """
-    # 只要异地打卡就不算加班,即使是节假日
-    if last_check_time[-6:] == '(异地打卡)':
-        return 0
-    if day_type == '工作日':
-        ret = (datetime.strptime(last_check_time, '%H:%M:%S') - datetime.strptime('19:00:00', '%H:%M:%S')).total_seconds()
-        return ret / 3600 if ret > 0 else 0
-    else:
-        ret = (datetime.strptime(last_check_time, '%H:%M:%S') - datetime.strptime(first_check_time, '%H:%M:%S')).total_seconds()
-        return ret / 3600 if ret > 0 else 0
+    year, month = year_month.split('-')
+    year, month = int(year), int(month)
+    if not 1 <= month <= 12:
+        raise ValueError(f"月份不正确: {year_month}")
+    return year, month
 
-def overtime_pay_cal(overtime: str, rate: str) -> str:
+def month_range(start: Tuple[int, int], end: Tuple[int, int]) -> List[Tuple[int, int]]:
     """
-    计算加班薪资。
+    列出从 start 到 end（包含两端）的所有 (年, 月)。
 
     参数:
-        overtime (str): 加班时长（小时）。
-        rate (str): 加班费率。
+        start (Tuple[int, int]): 起始年月。
+        end (Tuple[int, int]): 结束年月。
 
     返回值:
-        str: 加班薪资。
+        List[Tuple[int, int]]: 年月列表，start 晚于 end 时为空。
     """
-    # 两数相乘
-    return str(float(overtime) * float(rate))
+    months = []
+    year, month = start
+    while (year, month) <= end:
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
 
-def allowance_cal(overtime: str, day_type: str) -> str:
+# 列式计算
+_numpy = None
+
+def load_numpy():
     """
-    计算餐补。
+    按需导入 NumPy。NumPy 是可选依赖，没有安装时返回 None，调用方退回逐行计算。
+    """
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy or None
 
-    参数:
-        overtime (str): 加班时长（小时）。
-        day_type (str): 日期类型，可以是 "工作日", "周末", "节假日(周末)" 或 "节假日"。
+def _parse_digits(np, values: List[str], pattern: str):
+    """
+    把 ASCII 字符串一次性转换成 (行数, len(pattern)) 的数字矩阵，并检查每一行是否符合 pattern。
+
+    pattern 中 '9' 的位置应为数字，其他位置应与 pattern 中的字符相同，例如 '99:99:99'。
+    长度不同或含非 ASCII 字符的行视为不符合，这些行在矩阵中的值没有意义。
 
     返回值:
-        str: 餐补金额。
+        Tuple[np.ndarray, np.ndarray]: 数字矩阵和每一行是否符合 pattern 的布尔数组。
     """
-    # 工作日加班超过1小时给20,周末和节假日超过4小时给20
-    if day_type == '工作日':
-        return 20 if float(overtime) >= 1.0 else 0
-    else:
-        return 20 if float(overtime) >= 4.0 else 0
-
-def income_cal(overtime_pay: str, allowance: str) -> str:
+    width = len(pattern)
+    buffer = ''.join(values)
+    # 没有一行比 width 长、总长度又正好时每一行都等宽，否则把长度不对的行换成占位符
+    if len(buffer) != width * len(values) or (values and max(map(len, values)) > width):
+        filler = '\0' * width
+        buffer = ''.join([value if len(value) == width else filler for value in values])
+    # 非 ASCII 字符替换为 '?'，每个字符仍占一个字节，不会打乱后面的行
+    buffer = buffer.encode('ascii', 'replace')
+    raw = np.frombuffer(buffer, dtype=np.uint8).reshape(-1, width)
+    expected = np.frombuffer(pattern.encode('ascii'), dtype=np.uint8)
+    digits = raw.astype(np.int32) - ord('0')
+    valid = np.where(expected == ord('9'), (digits >= 0) & (digits <= 9), raw == expected).all(axis=1)
+    return digits, valid
+
+def _clock_strings_to_seconds(np, card_times: List[str], times: List[str], remote):
     """
-    计算总收入。
+    打卡时间列表转换为当天秒数的数组，结果与逐个调用 parse_clock_time 相同。
+
+    补零的 'HH:MM:SS'（可以带异地打卡后缀）一次性转换；不补零（例如 '9:05:00'）或超出范围的行逐个交给 parse_clock_time。
 
     参数:
-        overtime_pay (str): 加班薪资。
-        allowance (str): 餐补金额。
+        card_times (List[str]): CARDTIME 去掉日期之后的部分。
+        times (List[str]): card_times 每一项的前 8 个字符。
+        remote: 每一行是否异地打卡的布尔数组。
 
-    返回值:
-        str: 总收入。
+    异常:
+        ValueError: 某一行的时间格式不正确。
     """
-    # 两数相加
-    return float(overtime_pay) + float(allowance)
+    digits, valid = _parse_digits(np, times, '99:99:99')
+    hour = digits[:, 0] * 10 + digits[:, 1]
+    minute = digits[:, 3] * 10 + digits[:, 4]
+    second = digits[:, 6] * 10 + digits[:, 7]
+    length = np.fromiter(map(len, card_times), dtype=np.int64, count=len(card_times))
+    valid &= (length == np.where(remote, 8 + len(REMOTE_CLOCK_IN_SUFFIX), 8)) & (hour <= 23) & (minute <= 59) & (second <= 59)
+    seconds = hour * 3600 + minute * 60 + second
+    for index in np.flatnonzero(~valid).tolist():
+        seconds[index] = parse_clock_time(card_times[index])[0]
+    return seconds
+
+def _days_from_civil(np, year, month, day):
+    """
+    公历日期转换为 1970-01-01 起的天数，全部为数组运算。
+    """
+    year = year - (month <= 2)
+    era = np.where(year >= 0, year, year - 399) // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+def _date_strings_to_days(np, dates: List[str]):
+    """
+    'YYYY-MM-DD' 字符串列表转换为 1970-01-01 起的天数数组。
+    """
+    if not dates:
+        return np.zeros(0, dtype=np.int64)
+    digits, valid = _parse_digits(np, dates, '9999-99-99')
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    month = digits[:, 5] * 10 + digits[:, 6]
+    day = digits[:, 8] * 10 + digits[:, 9]
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month_days = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31], dtype=np.int32)[np.clip(month, 0, 12)] + (leap & (month == 2))
+    valid &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= month_days)
+    if not valid.all():
+        raise ValueError(f"打卡记录的日期格式不正确: {dates[int(np.flatnonzero(~valid)[0])]!r}")
+    return _days_from_civil(np, year.astype(np.int64), month.astype(np.int64), day.astype(np.int64))
+
+def _round_cents(np, values):
+    """
+    保留两位小数，结果与 float(f"{value:.2f}") 逐个相同。
 
-def late_time_cal(first_check_time: str, day_type: str, late_minutes: Optional[int] = None) -> str:
+    np.round 先乘 100 再取整，恰好落在 0.005 附近的值可能与按二进制精确值舍入的结果不同，
+    这些值单独用字符串格式化处理。
     """
-    计算迟到时间。
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        rounded[near_tie] = [float(f"{value:.2f}") for value in values[near_tie].tolist()]
+    return rounded
+
+def load_punch_columns(clock_in_batches: List[list], holidays: Optional[Dict[str, int]], workdays: Optional[Set[str]]) -> Dict[str, Any]:
+    """
+    把一个或多个打卡记录列表（一个月、一年或一个团队）载入列式数组，并归并为每天一行。
+
+    与 reduce_punches 一致，同一批次同一 SHIFTTERM 最早和最晚的记录分别作为上班和下班打卡
+    （时间相同时优先本地打卡），输出顺序为每天第一次出现的顺序。
 
     参数:
-        first_check_time (str): 第一次打卡时间，格式为 'HH:MM:SS'。
-        day_type (str): 日期类型，可以是 "工作日", "周末", "节假日(周末)" 或 "节假日"。
-        late_minutes (Optional[int]): 迟到分钟数。如果未提供，则根据 first_check_time 计算。
+        clock_in_batches (List[list]): 打卡记录列表的列表，每个列表为一个批次（例如一个员工）。
+        holidays (Optional[Dict[str, int]]): 节假日数据，见 compute_day_records。
+        workdays (Optional[Set[str]]): 工作日数据，见 compute_day_records。
 
     返回值:
-        str: 迟到时间（分钟）。
+        Dict[str, Any]: 每天一行的列：
+            - 'batch'：批次序号；'day'：1970-01-01 起的天数；'date'：日期字符串；
+            - 'first_seconds' / 'last_seconds'：上下班打卡的当天秒数；
+            - 'first_remote' / 'last_remote'：是否异地打卡；
+            - 'day_type'：日期类型编码（DAY_WORKDAY 等）。
+
+    异常:
+        ValueError: 日期不是 'YYYY-MM-DD'，或打卡时间格式不正确（见 parse_clock_time）。
     """
-    # 只要异地打卡就不算迟到
-    if first_check_time[-6:] == '(异地打卡)' or day_type != '工作日':
-        return "0"
-    
-    if late_minutes is None:
-        ret = (datetime.strptime(first_check_time, '%H:%M:%S') - datetime.strptime('09:00:00', '%H:%M:%S')).total_seconds() / 60
-    else:
-        ret = late_minutes
-    
-    return str(ret) if ret > 0 else "0"
+    np = load_numpy()
+    shift_terms = []
+    card_times = []
+    times = []
+    remote = []
+    batch_index = []
+    for index, records in enumerate(clock_in_batches):
+        shift_terms.extend([record['SHIFTTERM'] for record in records])
+        batch_card_times = [record['CARDTIME'][11:] for record in records]
+        card_times.extend(batch_card_times)
+        times.extend([card_time[:8] for card_time in batch_card_times])
+        remote.extend([card_time[-6:] == REMOTE_CLOCK_IN_SUFFIX for card_time in batch_card_times])
+        batch_index.append(np.full(len(records), index, dtype=np.int64))
+
+    batch = np.concatenate(batch_index) if batch_index else np.zeros(0, dtype=np.int64)
+    day = _date_strings_to_days(np, shift_terms)
+    remote = np.array(remote, dtype=bool)
+    seconds = _clock_strings_to_seconds(np, card_times, times, remote)
+
+    # 按 (批次, 日期) 分组：分别按 (时间, 异地) 和 (-时间, 异地) 排序，每组第一条即最早和最晚的打卡
+    key = batch * 10000000 + day
+    _, first_seen = np.unique(key, return_index=True)
+    earliest = np.lexsort((remote, seconds, key))
+    latest = np.lexsort((remote, -seconds.astype(np.int64), key))
+    _, group_start = np.unique(key[earliest], return_index=True)
+    order = np.argsort(first_seen, kind='stable')
+    first_index = earliest[group_start][order]
+    last_index = latest[group_start][order]
+
+    group_day = day[first_index]
+    dates = [shift_terms[index] for index in first_index.tolist()]
+
+    # 日期类型直接从每年的日历索引里按一年中的第几天取
+    day_type = np.zeros(len(group_day), dtype=np.int8)
+    group_year = np.array([int(date[:4]) for date in dates], dtype=np.int64)
+    for year in np.unique(group_year).tolist():
+        in_year = group_year == year
+        first_of_year = int(_days_from_civil(np, np.int64(year), np.int64(1), np.int64(1)))
+        day_types = np.frombuffer(bytes(get_calendar_index(year, holidays, workdays).day_types), dtype=np.uint8)
+        day_type[in_year] = day_types[group_day[in_year] - first_of_year]
+
+    return {
+        'batch': batch[first_index],
+        'day': group_day,
+        'date': dates,
+        'first_seconds': seconds[first_index],
+        'last_seconds': seconds[last_index],
+        'first_time': [times[index] for index in first_index.tolist()],
+        'last_time': [times[index] for index in last_index.tolist()],
+        'first_remote': remote[first_index],
+        'last_remote': remote[last_index],
+        'day_type': day_type
+    }
 
-def summarize(result: list, workdays: set, holidays: list, total_late_count: int, total_late_minutes: int) -> list:
+def compute_columns(columns: Dict[str, Any], hourly_rate=20) -> Dict[str, Any]:
     """
-    汇总统计结果。
+    对 load_punch_columns 的结果做批量计算，每一项都与对应的逐行函数结果相同
+    （overtime_cal、overtime_pay_cal、allowance_cal、income_cal、late_time_cal）。
 
     参数:
-        result (list): 打卡记录的统计结果。
-        workdays (set): 工作日集合。
-        holidays (list): 节假日列表。
-        total_late_count (int): 当月累计的迟到次数。
-        total_late_minutes (int): 当月累计的迟到分钟数。
+        columns (Dict[str, Any]): load_punch_columns 的返回值，会原地加入计算结果。
+        hourly_rate: 小时工资基数。
 
     返回值:
-        list: 汇总统计结果。
+        Dict[str, Any]: 加入了 'rate'、'overtime'、'overtime_pay'、'allowance'、'income'、'late_minutes' 的 columns。
     """
-    day_of_month = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
-    year = int(result[0][0].split('-')[0])
-    month = int(result[0][0].split('-')[1])
-    total_overtime_pay = 0.0
-    total_meal_allowance = 0.0
-    total_workday_overtime_pay = 0.0
-    total_weekend_overtime_pay = 0.0
-    total_holiday_overtime_pay = 0.0
-    total_income = 0.0
-    total_workday_hours = 0.0
-    total_weekend_hours = 0.0
-    total_holiday_hours = 0.0
-    required_workdays = day_of_month[month - 1] - len(holidays) - count_weekends(year, month, holidays, workdays)
-    actual_workdays = 0.0
-    total_personal_leave_hours = 0.0
-
-    # 先计算事假的小时数
-    # for i in result:
-    #     total_personal_leave_hours += (float(i[12]))
-    
-    personal_leave_remain_hours = total_personal_leave_hours
-    for i in result:
-        total_overtime_pay += float(i[6])
-        total_meal_allowance += float(i[7])
-        total_workday_overtime_pay += float(i[6]) if i[3] == '工作日' else 0.0
-        total_weekend_overtime_pay += float(i[6]) if i[3] == '周末' else 0.0
-        total_holiday_overtime_pay += float(i[6]) if i[3] == '节假日' else 0.0
-        total_income += float(i[8])
-        total_workday_hours += float(i[5]) if i[3] == '工作日' else 0.0
-        total_weekend_hours += float(i[5]) if i[3] == '周末' else 0.0
-        total_holiday_hours += float(i[5]) if i[3] == '节假日' else 0.0
-        actual_workdays += 1 if i[3] == '工作日' else 0
-        
-    # 计算实际扣减后的加班费
-    # 事假可以用加班抵扣，优先抵扣工作日加班
-    actual_workday_hours = total_workday_hours - personal_leave_remain_hours
-    if actual_workday_hours < 0:
-        actual_workday_hours = 0
-        personal_leave_remain_hours -= total_workday_hours
-    else:
-        personal_leave_remain_hours = 0
-    actual_weekend_hours = total_weekend_hours - personal_leave_remain_hours
-    if actual_weekend_hours < 0:
-        actual_weekend_hours = 0
-        personal_leave_remain_hours -= total_weekend_hours
-    else:
-        personal_leave_remain_hours = 0
-    actual_holiday_hours = total_holiday_hours - personal_leave_remain_hours
-    if actual_holiday_hours < 0:
-        actual_holiday_hours = 0
-        personal_leave_remain_hours -= total_holiday_hours
-    else:
-        personal_leave_remain_hours = 0
-
-    # 处理迟到时间的扣减
-    late_minutes_remain = total_late_minutes
-    if late_minutes_remain > 0:
-        for i in result:
-            if late_minutes_remain <= 0:
-                break
-            if i[3] == '工作日':
-                if 1 <= int(i[1].split(':')[1]) <= 30:
-                    late_minutes_remain -= 60 + int(i[1].split(':')[1])
-                elif 31 <= int(i[1].split(':')[1]) <= 60:
-                    late_minutes_remain -= 120 + int(i[1].split(':')[1])
-                elif int(i[1].split(':')[1]) > 60:
-                    late_minutes_remain -= 480
-            elif i[3] == '周末':
-                if 1 <= int(i[1].split(':')[1]) <= 30:
-                    late_minutes_remain -= 60 + int(i[1].split(':')[1])
-                elif 31 <= int(i[1].split(':')[1]) <= 60:
-                    late_minutes_remain -= 120 + int(i[1].split(':')[1])
-                elif int(i[1].split(':')[1]) > 60:
-                    late_minutes_remain -= 480
-            elif i[3] == '节假日':
-                if 1 <= int(i[1].split(':')[1]) <= 30:
-                    late_minutes_remain -= 60 + int(i[1].split(':')[1])
-                elif 31 <= int(i[1].split(':')[1]) <= 60:
-                    late_minutes_remain -= 120 + int(i[1].split(':')[1])
-                elif int(i[1].split(':')[1]) > 60:
-                    late_minutes_remain -= 480
-
-    actual_workday_overtime_pay = actual_workday_hours * 20
-    actual_weekend_overtime_pay = actual_weekend_hours * 30
-    actual_holiday_overtime_pay = actual_holiday_hours * 60
-    actual_overtime_pay = actual_workday_overtime_pay + actual_weekend_overtime_pay + actual_holiday_overtime_pay
-    actual_total_income = actual_overtime_pay + total_meal_allowance
-
-    # 获取最晚打卡日期
-    latest_date = max(i[0] for i in result)
-
-    # 获取昨天的日期
-    yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
-
-    # 选择最晚打卡日期或昨天的日期
-    cutoff_date = latest_date if latest_date < yesterday else yesterday
+    np = load_numpy()
+    day_type = columns['day_type']
+    is_workday = day_type == DAY_WORKDAY
+    first_seconds = columns['first_seconds'].astype(np.float64)
+    last_seconds = columns['last_seconds'].astype(np.float64)
+
+    rate = np.array(DAY_PAY_RATES, dtype=np.float64)[day_type]
+    overtime_seconds = np.where(is_workday, last_seconds - WORK_END_SECONDS, last_seconds - first_seconds)
+    overtime_seconds = np.where(columns['last_remote'] | (overtime_seconds <= 0), 0.0, overtime_seconds)
+    overtime = overtime_seconds / 3600
+    # 与 overtime_pay_cal 的 f"{...:.2f}" 一致，先按原来的乘法顺序相乘再保留两位小数
+    overtime_pay = _round_cents(np, overtime * rate * float(hourly_rate))
+    allowance = np.where(overtime >= np.where(is_workday, 1.0, 4.0), 20.0, 0.0)
+    late_minutes = (first_seconds - WORK_START_SECONDS) / 60
+    late_minutes = np.where(columns['first_remote'] | ~is_workday | (late_minutes <= 0), 0.0, late_minutes)
+
+    columns.update({
+        'rate': rate,
+        'overtime': overtime,
+        'overtime_pay': overtime_pay,
+        'allowance': allowance,
+        'income': overtime_pay + allowance,
+        'late_minutes': late_minutes
+    })
+    return columns
 
-    # 定义表格宽度
-    COL_WIDTH = 15
-    NUM_WIDTH = 15
+def columns_total(values) -> float:
+    """
+    按顺序逐个相加求和，与 Python 循环累加的结果逐位相同（np.sum 使用分组求和，末位可能不同）。
+    """
+    return float(values.cumsum()[-1]) if len(values) else 0.0
 
-    # 动态生成表格
-    income_table = [
-        [f"{'总加班薪资':^{COL_WIDTH}}", f"{total_overtime_pay:>{NUM_WIDTH}.2f}"],
-        [f"{'实际加班薪资':^{COL_WIDTH}}", f"{actual_overtime_pay:>{NUM_WIDTH}.2f}"],
-        [f"{'总餐补':^{COL_WIDTH}}", f"{total_meal_allowance:>{NUM_WIDTH}.2f}"],
-        [f"{'工作日加班收入':^{COL_WIDTH}}", f"{total_workday_overtime_pay:>{NUM_WIDTH}.2f}"],
-        [f"{'周末加班收入':^{COL_WIDTH}}", f"{total_weekend_overtime_pay:>{NUM_WIDTH}.2f}"], 
-        [f"{'节假日加班收入':^{COL_WIDTH}}", f"{total_holiday_overtime_pay:>{NUM_WIDTH}.2f}"],
-        [f"{'总收入':^{COL_WIDTH}}", f"{total_income:>{NUM_WIDTH}.2f}"],
-        [f"{'扣减后总收入':^{COL_WIDTH}}", f"{actual_total_income:>{NUM_WIDTH}.2f}"]
-    ]
+def columns_to_day_records(columns: Dict[str, Any]) -> list:
+    """
+    把 compute_columns 的结果转换为 DayRecord 列表。
 
-    hours_table = [
-        [f"{'工作日加班时长':^{COL_WIDTH}}", f"{total_workday_hours:>{NUM_WIDTH}.2f} 小时"],
-        [f"{'周末加班时长':^{COL_WIDTH}}", f"{total_weekend_hours:>{NUM_WIDTH}.2f} 小时"], 
-        [f"{'节假日加班时长':^{COL_WIDTH}}", f"{total_holiday_hours:>{NUM_WIDTH}.2f} 小时"],
-        [f"{'总加班时长':^{COL_WIDTH}}", f"{(total_workday_hours + total_weekend_hours + total_holiday_hours):>{NUM_WIDTH}.2f} 小时"],
-        [f"{'扣减后加班时长':^{COL_WIDTH}}", f"{(actual_workday_hours + actual_weekend_hours + actual_holiday_hours):>{NUM_WIDTH}.2f} 小时"]
-    ]
+    参数:
+        columns (Dict[str, Any]): compute_columns 的返回值。
 
-    attendance_table = [
-        [f"{'当前迟到次数':^{COL_WIDTH}}", f"{total_late_count:>{NUM_WIDTH}d} 次"],
-        [f"{'当前迟到时长':^{COL_WIDTH}}", f"{total_late_minutes:>{NUM_WIDTH}d} 分钟"],
-        [f"{'应出勤天数':^{COL_WIDTH}}", f"{required_workdays:>{NUM_WIDTH}d} 天"],
-        [f"{'实际出勤天数':^{COL_WIDTH}}", f"{actual_workdays:>{NUM_WIDTH}.1f} 天"]
-    ]
+    返回值:
+        list: 每天的计算结果，与逐行计算得到的 DayRecord 相同。
+    """
+    result = []
+    for date, first_time, last_time, day_type, rate, overtime, overtime_pay, allowance, income, late_minutes in zip(
+            columns['date'], columns['first_time'], columns['last_time'], columns['day_type'].tolist(), columns['rate'].tolist(),
+            columns['overtime'].tolist(), columns['overtime_pay'].tolist(), columns['allowance'].tolist(),
+            columns['income'].tolist(), columns['late_minutes'].tolist()):
+        result.append(DayRecord(date, first_time, last_time, day_type, int(rate), overtime, overtime_pay, int(allowance), income, late_minutes))
+    return result
+
+def summarize_columns(columns: Dict[str, Any], workdays: Set[str], holidays: Dict[str, int], total_late_count: int, total_late_minutes: int) -> Dict[str, float]:
+    """
+    对 compute_columns 的结果做汇总，与 summarize_totals 共用 SummaryAccumulator，结果相同。
 
-    # 使用相同的表格样式和对齐方式
-    table_style = "rounded_grid"
-    col_align = ("center", "right")
-    
-    # Format tables with consistent spacing and borders
-    info = (
-        "\n【收入统计】\n" + 
-        tabulate(income_table, tablefmt=table_style, colalign=col_align) +
-        "\n\n【工时统计】\n" + 
-        tabulate(hours_table, tablefmt=table_style, colalign=col_align) +
-        "\n\n【考勤统计】\n" + 
-        tabulate(attendance_table, tablefmt=table_style, colalign=col_align)
-    )
-    print(info)
-    if total_late_minutes >= 30:
-        print("小碧崽治这么喜欢迟到，有你好果汁吃！")
+    参数:
+        columns (Dict[str, Any]): compute_columns 的返回值。
+        workdays (Set[str]): 工作日数据。
+        holidays (Dict[str, int]): 节假日数据。
+        total_late_count (int): 累计的迟到次数。
+        total_late_minutes (int): 累计的迟到分钟数。
 
-    return info
+    返回值:
+        Dict[str, float]: 与 summarize_totals 相同的字段。
+    """
+    accumulator = SummaryAccumulator(total_late_count, total_late_minutes)
+    accumulator.add_columns(columns)
+    return accumulator.totals(workdays, holidays)
 
 # 自定义数据处理函数
-def process_custom_data(custom_data_path, hourly_rate=20, overwork=None):
+def process_custom_data(custom_data_path, hourly_rate=20, overwork=None, writer: Optional[ReportWriter] = None):
     """
     处理自定义加班数据
     
+    数据边读边算，汇总结果逐条累加，内存占用不随文件大小增长。支持的输入：
+        - 原来的 JSON 对象：{"hourlyRate": ..., "customData": [...], "personalLeaveHours": ..., "sickLeaveHours": ...}；
+          'hourlyRate' 没有写在 'customData' 之前时，先用 find_json_field 读一遍文件确定工资基数（没有则用 hourly_rate），
+          再流式计算；标准输入无法重读，按 hourly_rate 计算，之后读到不同的 'hourlyRate' 时报错；
+        - 每天一条记录的 JSON 数组；
+        - NDJSON：每行一条记录，不含 'date' 的行视为设置（'hourlyRate' 等），对之后的记录生效。
+    
     参数:
-        custom_data_path: JSON数据文件路径
+        custom_data_path: JSON数据文件路径，'-' 表示从标准输入读取
         hourly_rate: 小时工资基数
         overwork: 自定义加班时间
+        writer: 结构化输出，提供时每天的结果和汇总写入 writer，不渲染表格也不打印评价
         
     返回值:
-        处理结果
+        处理结果（表格文本；使用 writer 时为汇总数值），出错时为错误信息
     """
     try:
-        # 读取自定义数据
-        with open(custom_data_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            
-        # 提取数据
-        hourly_rate = data.get('hourlyRate', hourly_rate)
-        custom_data = data.get('customData', [])
-        
-        if not custom_data or not isinstance(custom_data, list):
-            print("错误：未提供有效的自定义加班数据")
-            return "错误：未提供有效的自定义加班数据"
-            
-        # 处理日期和时间数据
-        result = []
+        accumulator = SummaryAccumulator()
         holidays = dict()
         workdays = set()
+        settings = {}
+        rate_settled = False    # 'customData' 中的记录使用的工资基数是否已经确定
+        rate_guessed = False    # 从标准输入读取，没有读到 'hourlyRate' 就开始按 hourly_rate 计算
         overtime_income = 0.0
-        
-        # 如果数据格式是直接的打卡记录列表
-        for item in custom_data:
-            date = item.get('date')
-            if not date:
-                continue
-                
-            first_check_time = item.get('startTime', '09:00:00')
-            last_check_time = item.get('endTime', '18:00:00')
-            day_type = item.get('dayType', '工作日')  # 默认为工作日
-            
-            # 如果提供了日期类型，使用它，否则默认为工作日
-            if day_type == '工作日':
-                pass
-            elif day_type == '周末':
-                pass
-            elif day_type == '节假日':
-                holidays[date] = 3  # 假设节假日工资为3倍
-            
-            # 计算加班时长和收益
-            rate = pay_rate_cal(day_type)
-            overtime = overtime_cal(first_check_time, last_check_time, day_type)
-            overtime_pay = overtime_pay_cal(overtime, rate, hourly_rate)
-            overtime_income += float(overtime_pay)
-            allowance = allowance_cal(overtime, day_type)
-            total_income = income_cal(overtime_pay, allowance)
-            late_minutes = late_time_cal(first_check_time, day_type)
-            
-            result.append((date, first_check_time[:8] if len(first_check_time) > 8 else first_check_time, 
-                          last_check_time[:8] if len(last_check_time) > 8 else last_check_time, 
-                          day_type, rate, overtime, overtime_pay, allowance, total_income, late_minutes))
+        has_records = False
+
+        def add(item):
+            nonlocal overtime_income, has_records
+            record = compute_custom_day(item, hourly_rate, holidays)
+            if record is not None:
+                accumulator.add(record)
+                overtime_income += record.overtime_pay
+                has_records = True
+                if writer is not None:
+                    writer.day(record)
+
+        # 流式读取和计算交替进行，作为一个阶段记录
+        with profile_phase('read_compute'):
+            with open_input(custom_data_path) as f:
+                for kind, value in iter_json_records(f, 'customData'):
+                    if kind == 'field':
+                        key, field = value
+                        settings[key] = field
+                        if key == 'hourlyRate':
+                            if rate_guessed and field != hourly_rate:
+                                raise ValueError("从标准输入读取时 'hourlyRate' 需要写在 'customData' 之前")
+                            hourly_rate = field
+                            rate_settled = True
+                        continue
+                    # JSON 对象中 'hourlyRate' 可能写在 'customData' 之后，先单独读一遍文件找出来
+                    if kind == 'item' and not rate_settled:
+                        rate_settled = True
+                        if custom_data_path == '-':
+                            rate_guessed = True
+                        else:
+                            file_rate = find_json_field(custom_data_path, 'customData', 'hourlyRate')
+                            hourly_rate = hourly_rate if file_rate is None else file_rate
+                    add(value)
+
+        if not has_records:
+            print("错误：未提供有效的自定义加班数据")
+            return "错误：未提供有效的自定义加班数据"
         
         # 评价信息
-        rank = ''
-        if overtime_income < 300:
-            rank = '李在赣神魔？'
-        elif 300 <= overtime_income < 500:
-            rank = '不太行'
-        elif 500 <= overtime_income < 1000:
-            rank = '一般，建议多加点 冲1000'
-        elif 1000 <= overtime_income <= 1500:
-            rank = '牛逼'
-        elif 1500 <= overtime_income < 2000:
-            rank = '逆天'
-        elif overtime_income >= 2000:
-            rank = f'你是懂加班的，白加了 {overtime_income - 2000} 元'
+        rank = rank_cal(overtime_income)
             
         # 使用自定义的个人假期时间（如果提供）
-        personal_leave_hours = data.get('personalLeaveHours', 0)
-        sick_leave_hours = data.get('sickLeaveHours', 0)
+        accumulator.total_late_count = settings.get('personalLeaveHours', 0)
+        accumulator.total_late_minutes = settings.get('sickLeaveHours', 0)
+
+        if writer is not None:
+            totals = accumulator.totals(workdays, holidays)
+            writer.summary(totals, rank)
+            return totals
         
-        info = summarize(result, workdays, holidays, personal_leave_hours, sick_leave_hours)
+        info = summarize_accumulated(accumulator, workdays, holidays)
         print(f"\n**********************\n义眼丁真，鉴定您的级别为：\n {rank}\n**********************\n")
         return info
         
@@ -1097,6 +4394,74 @@ def process_custom_data(custom_data_path, hourly_rate=20, overwork=None):
         print(error_msg)
         return error_msg
 
+def compute_custom_day(item: Dict[str, Any], hourly_rate, holidays: Dict[str, int]) -> Optional['DayRecord']:
+    """
+    计算自定义数据中的一天。
+
+    参数:
+        item (Dict[str, Any]): 一条记录，包含 'date'，可选 'startTime'、'endTime'、'dayType'。
+        hourly_rate: 小时工资基数。
+        holidays (Dict[str, int]): 节假日数据，'dayType' 为节假日时把日期加入其中。
+
+    返回值:
+        Optional[DayRecord]: 这一天的计算结果，没有 'date' 时返回 None。
+    """
+    date = item.get('date')
+    if not date:
+        return None
+        
+    first_check_time = item.get('startTime', '09:00:00')
+    last_check_time = item.get('endTime', '18:00:00')
+    day_type = item.get('dayType', '工作日')  # 默认为工作日
+    
+    # 如果提供了日期类型，使用它，否则默认为工作日
+    if day_type == '节假日':
+        holidays[date] = 3  # 假设节假日工资为3倍
+    
+    # 计算加班时长和收益
+    first_seconds, first_remote = parse_clock_time(first_check_time)
+    last_seconds, last_remote = parse_clock_time(last_check_time)
+    rate = pay_rate_cal(day_type)
+    overtime = overtime_cal(first_seconds, last_seconds, day_type, last_remote)
+    overtime_pay = overtime_pay_cal(overtime, rate, hourly_rate)
+    allowance = allowance_cal(overtime, day_type)
+    total_income = income_cal(overtime_pay, allowance)
+    late_minutes = late_time_cal(first_seconds, day_type, first_remote)
+    
+    return make_day_record(date, first_check_time, last_check_time, day_type, rate, overtime, overtime_pay, allowance, total_income, late_minutes)
+
+def compute_custom_data(data: Dict[str, Any], hourly_rate=20) -> Tuple[list, float, Dict[str, int], Set[str]]:
+    """
+    计算自定义加班数据中每天的加班数据。
+
+    参数:
+        data (Dict[str, Any]): 自定义数据，包含 'hourlyRate'（可选）和 'customData'。
+        hourly_rate: 数据中没有 'hourlyRate' 时使用的小时工资基数。
+
+    返回值:
+        Tuple: (每天的计算结果, 加班费合计, 节假日, 工作日)。'customData' 无效时结果为空列表。
+    """
+    # 提取数据
+    hourly_rate = data.get('hourlyRate', hourly_rate)
+    custom_data = data.get('customData', [])
+    
+    # 处理日期和时间数据
+    result = []
+    holidays = dict()
+    workdays = set()
+    overtime_income = 0.0
+
+    if not custom_data or not isinstance(custom_data, list):
+        return result, overtime_income, holidays, workdays
+    
+    # 如果数据格式是直接的打卡记录列表
+    for item in custom_data:
+        record = compute_custom_day(item, hourly_rate, holidays)
+        if record is not None:
+            overtime_income += record.overtime_pay
+            result.append(record)
+    return result, overtime_income, holidays, workdays
+
 # 修改工资计算函数以支持自定义小时工资
 def overtime_pay_cal(overtime, rate, hourly_rate=20):
     """
@@ -1119,98 +4484,226 @@ if __name__ == '__main__':
     parser.add_argument('--rate', type=float, default=20, help='小时工资基数')
     parser.add_argument('--custom', type=str, help='自定义数据JSON文件路径')
     parser.add_argument('--overwork', type=str, help='自定义加班时间')
-    parser.add_argument('--cookie', type=str, help='Cookie信息')
+    parser.add_argument('--cookie', type=str, help='Cookie信息（只在本次运行中使用，不会保存）')
+    parser.add_argument('--browser-login', action='store_true', help='没有可用的 Cookie 且续期失败时打开浏览器登录，并保存登录后的 Cookie')
     parser.add_argument('--yearMonth', type=str, help='年月(YYYY-MM)')
+    parser.add_argument('--from', dest='from_month', type=str, help='多月模式的起始年月(YYYY-MM)')
+    parser.add_argument('--to', dest='to_month', type=str, help='多月模式的结束年月(YYYY-MM)，默认为当前月份')
+    parser.add_argument('--batch', type=str, help='团队批量处理的员工列表文件（JSON 数组或 NDJSON）')
+    parser.add_argument('--http-stats', action='store_true', help='结束时打印每个接口的请求耗时和重试次数')
+    parser.add_argument('--no-store', action='store_true', help='不使用本地数据库（打卡记录仓库和每天的计算结果），全部联网获取并重新计算')
+    parser.add_argument('--serve', action='store_true', help='以常驻服务模式运行，通过 HTTP 接收计算请求')
+    parser.add_argument('--host', type=str, default=SERVE_HOST, help='常驻服务的监听地址')
+    parser.add_argument('--port', type=int, default=SERVE_PORT, help='常驻服务的监听端口')
+    parser.add_argument('--socket', type=str, help='常驻服务改为监听的 Unix socket 路径')
+    parser.add_argument('--format', type=str, choices=OUTPUT_FORMATS, default='table', help='输出格式：table 为表格，json/csv/ndjson 输出每天的记录和汇总数值')
+    parser.add_argument('--profile', type=str, nargs='?', const=PROFILE_FILE, help=f'记录各阶段和每次 HTTP 请求的耗时，结束时写入文件（默认 {PROFILE_FILE}）')
+    parser.add_argument('--profile-format', type=str, choices=PROFILE_FORMATS, default='json', help='性能剖析结果的格式：json 汇总或 chrome trace-event')
+    parser.add_argument('--hr-url', type=str, help=f'HR 系统地址（默认 {HR_BASE_URL}，也可用环境变量 OVERTIME_HR_URL），例如本地的 fake_hr_server.py')
+    parser.add_argument('--holiday-url', type=str, help=f'节假日接口地址（默认 {HOLIDAY_BASE_URL}，也可用环境变量 OVERTIME_HOLIDAY_URL）')
+    parser.add_argument('--max-rate', type=float, help=f'每个主机每秒最多发出的请求数（默认 {HTTP_RATE_LIMIT:g}，0 表示不限），并发数仍会按延迟和 429/5xx 自动调整')
     
     args, unknown = parser.parse_known_args()
 
-    # 如果提供了自定义数据，优先处理
+    set_base_urls(args.hr_url, args.holiday_url)
+    # --max-rate 只在创建共享的 HTTP 客户端时生效，所以在发出任何请求之前创建（不指定时按需创建，离线模式不载入 requests）
+    if args.max_rate is not None:
+        get_hr_client(args.max_rate)
+
+    if args.profile:
+        import atexit
+        enable_profiling()
+        atexit.register(write_profile, args.profile, args.profile_format)
+
+    if args.serve:
+        serve(args.host, args.port, args.socket)
+        exit()
+
+    # 结构化输出：标准输出只留给结果，进度和错误信息改为输出到标准错误
+    writer = None
+    if args.format != 'table':
+        context_fields = ('name',) if args.batch else ('month',) if args.from_month and not args.custom else ()
+        writer = ReportWriter(args.format, sys.stdout, context_fields)
+        sys.stdout = sys.stderr
+
+    # 如果提供了自定义数据，优先处理（结果已在 process_custom_data 中输出）
     if args.custom:
-        info = process_custom_data(args.custom, args.rate, args.overwork)
-        print(info)
+        process_custom_data(args.custom, args.rate, args.overwork, writer)
+        if writer is not None:
+            writer.close()
+        exit()
+
+    # 团队批量处理：逐个输出员工结果，最后输出团队汇总
+    if args.batch:
+        try:
+            target_year, target_month = parse_year_month(args.yearMonth) if args.yearMonth else (datetime.now().year, datetime.now().month)
+        except ValueError:
+            print("年月格式不正确，应为YYYY-MM")
+            exit(1)
+        team_totals = dict.fromkeys(SUMMARY_FIELDS, 0)
+        team_size = 0
+        failed = 0
+        try:
+            for name, totals, overtime_income, error in process_team_batch(iter_batch_entries(args.batch), target_year, target_month, args.rate):
+                if error is not None:
+                    failed += 1
+                    print(f"{name}: 处理失败: {str(error)}")
+                    continue
+                if totals is None:
+                    print(f"{name}: 没有打卡记录")
+                    continue
+                team_size += 1
+                for field in SUMMARY_FIELDS:
+                    team_totals[field] += totals[field]
+                if writer is not None:
+                    writer.summary(totals, rank_cal(overtime_income), name=name)
+                    continue
+                print(f"{name}: 加班 {totals['total_hours']:.2f} 小时，加班薪资 {totals['total_overtime_pay']:.2f}，"
+                      f"餐补 {totals['total_meal_allowance']:.2f}，迟到 {totals['late_count']} 次，评价：{rank_cal(overtime_income)}")
+        except (OSError, ValueError) as e:
+            print(f"读取员工列表失败: {str(e)}")
+            exit(1)
+        print(f"\n==================== 团队汇总 {target_year}-{target_month:02d}（{team_size} 人，失败 {failed} 人）====================")
+        if writer is not None:
+            if team_size:
+                writer.summary(team_totals, name=None)
+            writer.close()
+        elif team_size:
+            print(render_summary(team_totals))
+        if args.http_stats:
+            print(get_hr_client().stats_report())
         exit()
         
-    # 传统方式处理
-    user_cookie = args.cookie or (sys.argv[1] if len(sys.argv) > 1 else None)
-    if not user_cookie:
+    # 传统方式处理：没有提供 Cookie 时使用保存的会话，快过期时先续期；指定 --browser-login 时才会打开浏览器登录
+    session = SessionManager(args.cookie or (sys.argv[1] if len(sys.argv) > 1 and not sys.argv[1].startswith('-') else None), args.browser_login)
+    if not session.ensure_valid():
         print("错误：未提供Cookie信息")
         exit(1)
+    session.start_background_refresh()
+    user_cookie = session.current()
         
     # 获取用户变量
     try:
-        user_variable = get_user_variable_online(user_cookie)
+        with profile_phase('user_variable'):
+            try:
+                user_variable = get_user_variable_online(user_cookie)
+            except HrAuthError:
+                # Cookie 已失效：先续期，续期失败（且指定了 --browser-login）才打开浏览器重新登录
+                if not session.recover():
+                    raise
+                user_cookie = session.current()
+                user_variable = get_user_variable_online(user_cookie)
     except Exception as e:
         print(f"获取用户变量失败: {str(e)}")
         exit(1)
+
+    # 本地数据库：已结束的月份直接读取保存的打卡记录，之前算过且打卡记录没变的日期直接使用保存的结果
+    with profile_phase('open_store'):
+        store = None if args.no_store else open_result_store()
+        warehouse = None if args.no_store else open_punch_warehouse()
+    employee = employee_key(user_cookie)
         
+    # 多月模式：用户变量和节假日数据只获取一次，各月同时获取，哪个月先到就先算
+    if args.from_month:
+        try:
+            start_month = parse_year_month(args.from_month)
+            end_month = parse_year_month(args.to_month) if args.to_month else (datetime.now().year, datetime.now().month)
+        except ValueError:
+            print("年月格式不正确，应为YYYY-MM")
+            exit(1)
+        months = month_range(start_month, end_month)
+        if not months:
+            print("起始年月不能晚于结束年月")
+            exit(1)
+
+        month_results = {}
+        for year, month, month_data, fetch_errors in fetch_months_pipelined(user_variable, session.current(), months, warehouse=warehouse, employee=employee):
+            if 'clock_in' in fetch_errors or 'holiday' in fetch_errors:
+                error = fetch_errors.get('clock_in') or fetch_errors.get('holiday')
+                print(f"获取 {year}-{month:02d} 数据失败: {str(error)}")
+                continue
+            if 'attendance' in fetch_errors:
+                print(f"获取 {year}-{month:02d} 考勤数据失败: {str(fetch_errors['attendance'])}")
+            month_results[(year, month)] = process_month_data(month_data, args.rate, store, employee)
+
+        all_result = []
+        all_overtime_income = 0.0
+        all_late_count = 0
+        all_late_minutes = 0
+        for year, month in months:
+            if (year, month) not in month_results:
+                continue
+            result, overtime_income, holidays, workdays, late_count, late_minutes = month_results[(year, month)]
+            if writer is None:
+                print(f"\n==================== {year}-{month:02d} ====================")
+            if not result:
+                print("没有打卡记录" if writer is None else f"{year}-{month:02d} 没有打卡记录")
+                continue
+            if writer is not None:
+                for record in result:
+                    writer.day(record, month=f"{year}-{month:02d}")
+                writer.summary(summarize_totals(result, workdays, holidays, late_count, late_minutes), rank_cal(overtime_income), month=f"{year}-{month:02d}")
+            else:
+                summarize(result, workdays, holidays, late_count, late_minutes)
+                print(f"\n**********************\n义眼丁真，鉴定您的级别为：\n {rank_cal(overtime_income)}\n**********************\n")
+            all_result.extend(result)
+            all_overtime_income += overtime_income
+            all_late_count += late_count
+            all_late_minutes += late_minutes
+
+        span = f"{months[0][0]}-{months[0][1]:02d} ~ {months[-1][0]}-{months[-1][1]:02d}"
+        if writer is not None:
+            if all_result:
+                writer.summary(summarize_totals(all_result, None, None, all_late_count, all_late_minutes), rank_cal(all_overtime_income), month=span)
+            writer.close()
+        elif all_result:
+            print(f"\n==================== {span} 汇总 ====================")
+            summarize(all_result, None, None, all_late_count, all_late_minutes)
+        if args.http_stats:
+            print(get_hr_client().stats_report())
+        exit()
+
     # 设置目标年月
     if args.yearMonth:
         try:
-            target_year, target_month = args.yearMonth.split('-')
-            target_year = int(target_year)
-            target_month = int(target_month)
-        except:
+            target_year, target_month = parse_year_month(args.yearMonth)
+        except ValueError:
             print("年月格式不正确，应为YYYY-MM")
             exit(1)
     else:
         target_month = datetime.now().month
         target_year = datetime.now().year
         
-    # 获取打卡数据
+    # 同时获取打卡数据、考勤数据和节假日数据
     try:
-        clock_in_data = get_clock_in_data(user_variable, user_cookie, target_month, target_year)
+        month_data, fetch_errors = fetch_month_data_with_retry(user_variable, session.current(), target_month, target_year, warehouse, employee)
     except Exception as e:
-        print(f"获取打卡数据失败: {str(e)}")
+        print(f"获取用户变量失败: {str(e)}")
         exit(1)
-    
-    # 获取节假日数据
-    try:
-        holidays = dict()
-        workdays = set()
-        holidays, workdays = get_holiday_data_online(clock_in_data)
-    except Exception as e:
-        print(f"获取节假日数据失败: {str(e)}")
+    if 'clock_in' in fetch_errors:
+        print(f"获取打卡数据失败: {str(fetch_errors['clock_in'])}")
+        exit(1)
+    if 'holiday' in fetch_errors:
+        print(f"获取节假日数据失败: {str(fetch_errors['holiday'])}")
         exit(1)
+    # 考勤数据只用于统计迟到，获取失败时按未迟到处理
+    if 'attendance' in fetch_errors:
+        print(f"获取考勤数据失败: {str(fetch_errors['attendance'])}")
         
     # 处理打卡数据
-    result = []                 # 这玩意存结果,列表里边是元组,元组可通过下标访问(python限定)
-    group_by_date = {}          # 按日期统计打卡时间
-    overtime_income = 0.0       # 加班费
-    
-    for item in clock_in_data:
-        group_by_date.setdefault(item['SHIFTTERM'], []).append(item['CARDTIME'][11::])
-        
-    for i in group_by_date:
-        sorted(group_by_date[i], key=lambda time: datetime.strptime(time[:8], '%H:%M:%S'))
-        date = i
-        first_check_time = group_by_date[i][0]
-        last_check_time = group_by_date[i][-1]
-        day_type = get_day_type(date, holidays, workdays)
-        rate = pay_rate_cal(day_type)
-        overtime = overtime_cal(first_check_time, last_check_time, day_type)
-        overtime_pay = overtime_pay_cal(overtime, rate, args.rate)
-        overtime_income += float(overtime_pay)
-        allowance = allowance_cal(overtime, day_type)
-        total_income = income_cal(overtime_pay, allowance)
-        late_minutes = late_time_cal(first_check_time, day_type)
-        
-        result.append((date, first_check_time[:8], last_check_time[:8], day_type, rate, overtime, overtime_pay, allowance, total_income, late_minutes))
+    result, overtime_income, holidays, workdays, total_late_count, total_late_minutes = process_month_data(month_data, args.rate, store, employee)
         
     # 评价信息
-    rank = ''
-    if overtime_income < 300:
-        rank = '李在赣神魔？'
-    elif 300 <= overtime_income < 500:
-        rank = '不太行'
-    elif 500 <= overtime_income < 1000:
-        rank = '一般，建议多加点 冲1000'
-    elif 1000 <= overtime_income <= 1500:
-        rank = '牛逼'
-    elif 1500 <= overtime_income < 2000:
-        rank = '逆天'
-    elif overtime_income >= 2000:
-        rank = f'你是懂加班的，白加了 {overtime_income - 2000} 元'
-        
-    info = summarize(result, workdays, holidays, 0, 0)
-    print(f"\n**********************\n义眼丁真，鉴定您的级别为：\n {rank}\n**********************\n")
-    exit()
\ No newline at end of file
+    rank = rank_cal(overtime_income)
+
+    if writer is not None:
+        for record in result:
+            writer.day(record)
+        writer.summary(summarize_totals(result, workdays, holidays, total_late_count, total_late_minutes), rank)
+        writer.close()
+    else:
+        summarize(result, workdays, holidays, total_late_count, total_late_minutes)
+        print(f"\n**********************\n义眼丁真，鉴定您的级别为：\n {rank}\n**********************\n")
+    if args.http_stats:
+        print(get_hr_client().stats_report())
+    exit()
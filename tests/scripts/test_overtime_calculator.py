@@ -0,0 +1,1204 @@
+"""
+scripts/overtime_calculator.py 的回归测试。
+
+运行方法（在项目根目录）：
+    python -m unittest discover -s tests/scripts
+"""
+import argparse
+import base64
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time as t
+import tracemalloc
+import unittest
+from datetime import datetime
+from unittest import mock
+
+SCRIPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts')
+sys.path.insert(0, SCRIPT_DIR)
+
+import fake_hr_server  # noqa: E402
+import overtime_benchmark as benchmark  # noqa: E402
+import overtime_calculator as calculator  # noqa: E402
+
+
+def load_calendar(year):
+    """
+    读取随项目附带的节假日数据，返回 (节假日, 工作日)。
+    """
+    return calculator.filter_holiday_data(calculator.read_bundled_holiday_data(year), str(year))
+
+
+def read_records(text, container_key=None):
+    return list(calculator.iter_json_records(io.StringIO(text), container_key))
+
+
+class IterJsonRecordsTest(unittest.TestCase):
+    records = [
+        {'date': '2025-01-02', 'note': '括号 {"[,]"} 和转义 \\ \" \n \u00e9 😀'},
+        {'date': '2025-01-03', 'values': [1, -2.5e3, True, None, {'a': []}]},
+    ]
+
+    def test_array(self):
+        for text in (json.dumps(self.records), json.dumps(self.records, indent=2, ensure_ascii=False), '[]', ' \n[ ]\n'):
+            expected = [('record', record) for record in json.loads(text)]
+            self.assertEqual(read_records(text), expected)
+            self.assertEqual(read_records(text, 'customData'), expected)
+
+    def test_ndjson(self):
+        lines = [json.dumps(record, ensure_ascii=False) for record in self.records]
+        self.assertEqual(read_records('\n'.join(lines) + '\n'), [('record', record) for record in self.records])
+        # 只有一行、最后一行没有换行，结果都一样
+        self.assertEqual(read_records(lines[0]), [('record', self.records[0])])
+        self.assertEqual(read_records(lines[0] + '\n'), [('record', self.records[0])])
+        self.assertEqual(read_records('{"hourlyRate": 30}\n' + lines[1], 'customData'),
+                         [('field', ('hourlyRate', 30)), ('record', self.records[1])])
+        self.assertEqual(read_records(''), [])
+
+    def test_object_with_container(self):
+        data = {'hourlyRate': 30, 'customData': self.records, 'sickLeaveHours': 2}
+        expected = [('field', ('hourlyRate', 30))] + [('item', record) for record in self.records] + [('field', ('sickLeaveHours', 2))]
+        for text in (json.dumps(data), json.dumps(data, indent=4, ensure_ascii=False)):
+            self.assertEqual(read_records(text, 'customData'), expected)
+            self.assertEqual(read_records(text), [('record', data)])
+
+    def test_stdin(self):
+        text = '\n'.join(json.dumps(record, ensure_ascii=False) for record in self.records)
+        with tempfile.TemporaryFile('w+', encoding='utf-8') as stdin:
+            stdin.write(text)
+            stdin.seek(0)
+            with mock.patch.object(sys, 'stdin', stdin):
+                with calculator.open_input('-') as file:
+                    self.assertEqual(list(calculator.iter_json_records(file)), [('record', record) for record in self.records])
+
+    def test_chunk_boundaries_inside_tokens(self):
+        data = {'customData': self.records, 'hourlyRate': 27.125, 'flag': False}
+        texts = [json.dumps(self.records), json.dumps(data, indent=1), '\n'.join(json.dumps(record) for record in self.records)]
+        for text in texts:
+            expected = read_records(text, 'customData')
+            for chunk_size in (1, 2, 3, 5, 7, 13):
+                with mock.patch.object(calculator, 'JSON_STREAM_CHUNK_SIZE', chunk_size):
+                    self.assertEqual(read_records(text, 'customData'), expected, (chunk_size, text[:20]))
+
+    def test_truncated_input(self):
+        text = json.dumps({'hourlyRate': 30, 'customData': self.records})
+        for end in (1, 10, len(text) // 2, len(text) - 2, len(text) - 1):
+            with self.subTest(end=end), self.assertRaises(ValueError):
+                read_records(text[:end], 'customData')
+        for text in ('[{"date": "2025-01-02"},', '[1, 2', '{"date": "2025-01-0', '[1] 2'):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                read_records(text)
+
+    def test_memory_does_not_grow_with_input(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'custom.json')
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write('{"hourlyRate": 30, "customData": [')
+                file.write(','.join(json.dumps({'date': f"2025-01-{index % 28 + 1:02d}", 'startTime': '09:00:00', 'endTime': '21:30:00'})
+                                    for index in range(100000)))
+                file.write(']}')
+            self.assertGreater(os.path.getsize(path), 5 << 20)
+            tracemalloc.start()
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    count = sum(1 for kind, _ in calculator.iter_json_records(file, 'customData') if kind == 'item')
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+        self.assertEqual(count, 100000)
+        self.assertLess(peak, 1 << 20)
+
+
+class AtomicWriteJsonTest(unittest.TestCase):
+
+    def test_replaces_file_without_leaving_temp_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'nested', 'cookies.json')
+            calculator.atomic_write_json(path, {'user_cookie': 'old'})
+            calculator.atomic_write_json(path, {'user_cookie': '新'}, 0o600)
+            with open(path, 'r', encoding='utf-8') as file:
+                self.assertEqual(json.load(file), {'user_cookie': '新'})
+            self.assertEqual(os.listdir(os.path.dirname(path)), ['cookies.json'])
+            if os.name == 'posix':
+                self.assertEqual(os.stat(path).st_mode & 0o077, 0)
+
+
+class FindLinkHrefTest(unittest.TestCase):
+
+    def test_reads_href_of_titled_anchor(self):
+        page = ('<div title="个人考勤查询"></div>'
+                "<a class='x' href='/ajax/function/alist!abc&amp;d' title='个人考勤查询'>考勤</a>"
+                '<A href=/portal!xyz title="流程申请">流程</A>')
+        self.assertEqual(calculator.find_link_href(page, '个人考勤查询'), '/ajax/function/alist!abc&d')
+        self.assertEqual(calculator.find_link_href(page, '流程申请'), '/portal!xyz')
+        self.assertIsNone(calculator.find_link_href(page, '不存在'))
+
+
+def leave_record(leave_type, time_range, note=''):
+    """
+    构造一条流程申请记录，摘要格式为 '申请人|类型|说明|时间段|备注'。
+    """
+    return {'ID': '1', 'AUTHKEY': f"{leave_type}-{time_range}", 'ABSTRACTS': f"张三|{leave_type}|{note}|{time_range}|"}
+
+
+def leave_hours(timeline, year, month):
+    """
+    一个月内年假和事假的小时数（只计工作时间之内的部分）。
+    """
+    start = datetime(year, month, 1).toordinal() * 1440
+    end = datetime(year + month // 12, month % 12 + 1, 1).toordinal() * 1440
+    return tuple(timeline.leave_minutes(leave_type, start, end) / 60 for leave_type in calculator.LEAVE_TYPES)
+
+
+class LeaveTimelineTest(unittest.TestCase):
+
+    def test_counts_working_hours_per_month(self):
+        records = [
+            leave_record('年假', '2025-01-31 09:00 - 2025-02-03 18:00'),
+            leave_record('事假', '2025-02-10 14:00 - 2025-02-10 20:00'),
+        ]
+        timeline = calculator.build_leave_timeline(records, '')
+        # 年假跨月：1 月 31 日一整天，2 月 1 日到 3 日三整天；事假只计 18:00 之前的 4 小时
+        self.assertEqual(leave_hours(timeline, 2025, 1), (9.0, 0.0))
+        self.assertEqual(leave_hours(timeline, 2025, 2), (27.0, 4.0))
+
+    def test_unnamed_cancellation_only_cancels_overlapping_type(self):
+        records = [
+            leave_record('年假', '2025-03-03 09:00 - 2025-03-03 18:00'),
+            leave_record('事假', '2025-03-04 09:00 - 2025-03-04 18:00'),
+            # 没有注明类型、同时覆盖两天的销假只销掉重叠更多的年假，事假不受影响
+            leave_record('销假申请', '2025-03-03 09:00 - 2025-03-04 12:00'),
+            leave_record('事假', '2025-03-05 09:00 - 2025-03-05 18:00'),
+            leave_record('销假申请', '2025-03-05 14:00 - 2025-03-05 18:00', '事假'),
+        ]
+        timeline = calculator.build_leave_timeline(records, '')
+        self.assertEqual(leave_hours(timeline, 2025, 3), (0.0, 14.0))
+
+    def test_unnamed_cancellation_without_overlap_is_ignored(self):
+        records = [
+            leave_record('年假', '2025-03-03 09:00 - 2025-03-03 18:00'),
+            leave_record('销假申请', '2025-03-10 09:00 - 2025-03-10 18:00'),
+        ]
+        timeline = calculator.build_leave_timeline(records, '')
+        self.assertEqual(leave_hours(timeline, 2025, 3), (9.0, 0.0))
+
+    def test_add_many_merges_overlapping_and_adjacent_ranges(self):
+        timeline = calculator.IntervalTimeline()
+        timeline.add_many([(50, 60), (10, 20), (20, 30), (5, 5)])
+        timeline.add_many([(25, 40), (70, 80), (0, 1)])
+        self.assertEqual(list(timeline.intervals()), [(0, 1), (10, 40), (50, 60), (70, 80)])
+        self.assertEqual(list(timeline.intervals(15, 55)), [(15, 40), (50, 55)])
+
+    def test_bad_delay_deduction_forms_are_skipped(self):
+        records = [{'ID': '1', 'AUTHKEY': 'A', 'ABSTRACTS': '张三|延时工时扣减申请||'},
+                   {'ID': '2', 'AUTHKEY': 'B', 'ABSTRACTS': '张三|延时工时扣减申请||'}]
+        forms = {'A': [['2025-03-03T19:00:00', '2025-03-03T20:30:00'], ['2025-03-04T19:00', None]],
+                 'B': [['2025-03-05T25:00:00', '2025-03-05T26:00:00'], ['2025-03-03T20:30:00', '2025-03-03T21:00:00']]}
+        with mock.patch.object(calculator, 'fetch_delay_deduction_forms', return_value=forms), contextlib.redirect_stdout(io.StringIO()) as output:
+            timeline = calculator.build_leave_timeline(records, '')
+        self.assertEqual(timeline.day_periods('延时工时扣减'), {'2025-03-03': [('19:00', '21:00')]})
+        self.assertEqual(output.getvalue().count('Error parsing delay deduction form'), 2)
+
+
+def deduction_form(day):
+    return {'formList': [{'formData': {'CARDBEGINTIME': f"2025-03-{day:02d}T19:00", 'CARDENDTIME': f"2025-03-{day:02d}T20:00"}}]}
+
+
+class DelayDeductionFormsTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(calculator, 'DELAY_DEDUCTION_CACHE_FILE', os.path.join(directory.name, 'delay_deductions.json'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fetch(self, auth_keys, responses):
+        """
+        用 responses（AUTHKEY -> 响应或异常）代替联网获取，返回 (结果, 联网获取的 AUTHKEY)。
+        """
+        fetched = []
+
+        def get_delay_deduction_data(auth_key, user_cookie):
+            fetched.append(auth_key)
+            response = responses[auth_key]
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        with mock.patch.object(calculator, 'get_delay_deduction_data', side_effect=get_delay_deduction_data), \
+                contextlib.redirect_stdout(io.StringIO()):
+            return calculator.fetch_delay_deduction_forms(auth_keys, 'MCHRID=7'), sorted(fetched)
+
+    def test_empty_input_does_not_touch_the_cache(self):
+        with mock.patch.object(calculator, 'read_delay_deduction_cache') as read_cache:
+            self.assertEqual(calculator.fetch_delay_deduction_forms([], 'MCHRID=7'), {})
+        read_cache.assert_not_called()
+
+    def test_cached_keys_are_not_fetched_again(self):
+        forms, fetched = self.fetch(['A', 'B'], {'A': deduction_form(3), 'B': deduction_form(4)})
+        self.assertEqual(fetched, ['A', 'B'])
+        self.assertEqual(forms, {'A': [['2025-03-03T19:00', '2025-03-03T20:00']], 'B': [['2025-03-04T19:00', '2025-03-04T20:00']]})
+        again, fetched = self.fetch(['B', 'C', 'A'], {'C': deduction_form(5)})
+        self.assertEqual(fetched, ['C'])
+        self.assertEqual(again, dict(forms, C=[['2025-03-05T19:00', '2025-03-05T20:00']]))
+        self.assertEqual(self.fetch(['A', 'B', 'C'], {})[1], [])
+
+    def test_partial_failure_does_not_poison_the_cache(self):
+        responses = {'A': deduction_form(3), 'B': OSError('超时'), 'C': {'error': '服务器繁忙'}}
+        with self.assertRaises(OSError):
+            self.fetch(['A', 'B', 'C'], responses)
+        # 成功的表单已经缓存，失败和无法识别的响应都没有缓存，下次重新获取
+        self.assertEqual(set(calculator.read_delay_deduction_cache()), {'A'})
+        responses.update(B=deduction_form(4), C=deduction_form(5))
+        forms, fetched = self.fetch(['A', 'B', 'C'], responses)
+        self.assertEqual(fetched, ['B', 'C'])
+        self.assertEqual(set(forms), {'A', 'B', 'C'})
+        with self.assertRaises(ValueError):
+            self.fetch(['D'], {'D': {'formList': [{'formData': {}}]}})
+        self.assertNotIn('D', calculator.read_delay_deduction_cache())
+
+
+def application(index):
+    return {'ID': str(index), 'AUTHKEY': f"KEY{index:06d}", 'ABSTRACTS': f"张三|年假|{index}|2025-01-01 09:00 - 2025-01-01 18:00|"}
+
+
+class StubHrClient:
+    """
+    只实现 post_hr_json 的流程申请接口，按请求体中的 limit/offset 分页，并记录每次请求的 offset。
+    """
+
+    def __init__(self, rows, ignore_offset=False, with_total=True):
+        self.rows = rows
+        self.ignore_offset = ignore_offset
+        self.with_total = with_total
+        self.offsets = []
+
+    def post_hr_json(self, endpoint, url, user_cookie, payload):
+        limit, offset = payload['limit'], payload['offset']
+        self.offsets.append(offset)
+        if self.ignore_offset:
+            offset = 0
+        page = self.rows[offset:offset + limit]
+        return {'rows': page, 'total': len(self.rows)} if self.with_total else page
+
+
+class ProcessApplicationPagingTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(calculator, 'PROCESS_APPLICATION_CACHE_PATH', directory.name + '/')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fetch(self, client, page_size=100):
+        output = io.StringIO()
+        with mock.patch.object(calculator, 'get_hr_client', return_value=client), contextlib.redirect_stdout(output):
+            records = calculator.fetch_process_applications('variable', 'MCHRID=1', 'employee', page_size)
+        return records, output.getvalue()
+
+    def test_full_page_boundary(self):
+        rows = [application(index) for index in range(200)]
+        client = StubHrClient(rows, with_total=False)
+        records, _ = self.fetch(client)
+        self.assertEqual(records, rows)
+        # 没有总数时最后一页正好满页，要再请求一次空页才知道结束
+        self.assertEqual(client.offsets, [0, 100, 200])
+
+        rows += [application(index) for index in range(200, 300)]
+        client = StubHrClient(rows, with_total=False)
+        records, _ = self.fetch(client)
+        self.assertEqual(records, rows)
+        self.assertEqual(client.offsets, [190, 290])
+        self.assertEqual(calculator.read_process_application_cache('employee'), rows)
+
+    def test_records_inserted_before_cursor(self):
+        rows = [application(index) for index in range(150)]
+        self.fetch(StubHrClient(rows))
+
+        # 游标之前插入一条、末尾追加一条：重叠部分对不上，完整重新获取，不重复也不丢失
+        rows = rows[:50] + [application(1000)] + rows[50:] + [application(150)]
+        client = StubHrClient(rows)
+        records, output = self.fetch(client)
+        self.assertEqual(records, rows)
+        self.assertEqual(len({record['ID'] for record in records}), len(rows))
+        self.assertEqual(client.offsets, [140, 0, 100])
+        self.assertIn('重新完整获取', output)
+
+    def test_server_ignores_offset(self):
+        rows = [application(index) for index in range(50)]
+        self.fetch(StubHrClient(rows, ignore_offset=True))
+
+        # 从游标获取到的是第一页：直接作为完整结果，不再重新获取
+        client = StubHrClient(rows, ignore_offset=True)
+        records, output = self.fetch(client)
+        self.assertEqual(records, rows)
+        self.assertEqual(client.offsets, [40])
+        self.assertEqual(output, '')
+
+    def test_server_ignores_offset_with_more_than_one_page(self):
+        rows = [application(index) for index in range(250)]
+        client = StubHrClient(rows, ignore_offset=True)
+        records, output = self.fetch(client)
+        # 第二页与第一页的 ID 相同时停止，不会一直请求下去
+        self.assertEqual(records, rows[:100])
+        self.assertEqual(client.offsets, [0, 100])
+        self.assertIn('忽略了分页参数', output)
+
+        client = StubHrClient(rows, ignore_offset=True)
+        records, _ = self.fetch(client)
+        self.assertEqual(records, rows[:100])
+        self.assertEqual(client.offsets, [90, 190])
+
+
+class FakeClock:
+    """
+    假的单调时钟：只有 sleep 和限流器的等待会推进时间，测试结果与机器快慢无关。
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def wait(self, timeout=None):
+        # 测试都是单线程的，没有超时的等待（并发名额已满）永远等不到
+        if timeout is None:
+            raise AssertionError('并发名额已满')
+        # 真的等待总要花一点时间；令牌差一点点凑满时等待时间可能小到加不到 now 上
+        self.now += max(timeout, 1e-9)
+
+
+def fake_limiter(clock, **kwargs):
+    limiter = calculator.AdaptiveLimiter(clock=clock, **kwargs)
+    limiter._condition.wait = clock.wait
+    return limiter
+
+
+def fake_response(status_code, headers=None):
+    return mock.Mock(status_code=status_code, headers=headers or {}, history=[], url='http://hr.test/api')
+
+
+class AdaptiveLimiterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def request(self, limiter, failed=False, retry_after=None):
+        """
+        取得名额后立即归还，返回排队的秒数。
+        """
+        waited = limiter.acquire()
+        limiter.release('clock_in', self.clock(), 0.01, failed, retry_after)
+        return waited
+
+    def test_token_bucket_refills_at_rate_up_to_burst(self):
+        limiter = fake_limiter(self.clock, rate=10, burst=2)
+        waits = [self.request(limiter) for _ in range(4)]
+        self.assertEqual(waits[:2], [0, 0])
+        self.assertAlmostEqual(waits[2], 0.1)
+        self.assertAlmostEqual(waits[3], 0.1)
+        # 空闲再久，令牌也只攒到 burst 个
+        self.clock.now += 60
+        waits = [self.request(limiter) for _ in range(3)]
+        self.assertEqual(waits[:2], [0, 0])
+        self.assertAlmostEqual(waits[2], 0.1)
+
+    def test_aimd_decreases_on_congestion_and_increases_on_success(self):
+        limiter = fake_limiter(self.clock, rate=0, min_concurrency=1, max_concurrency=8, initial_concurrency=4)
+        started = self.clock()
+        for _ in range(4):
+            limiter.acquire()
+        # 上限用满时成功的响应每个加 1/上限
+        limiter.release('clock_in', started, 0.01)
+        self.assertAlmostEqual(limiter.limit, 4.25)
+        # 429/503 减半；减半之前发出的请求带回的失败不再重复减半
+        self.clock.now += 1
+        limiter.release('clock_in', started, 0.01, failed=True)
+        self.assertAlmostEqual(limiter.limit, 2.125)
+        limiter.release('clock_in', started, 0.01, failed=True)
+        limiter.release('clock_in', started, 0.01, failed=True)
+        self.assertAlmostEqual(limiter.limit, 2.125)
+        self.assertEqual(limiter.decreases, 1)
+        # 之后发出的请求失败时再减半，但不低于下限
+        for _ in range(3):
+            self.clock.now += 1
+            self.request(limiter, failed=True)
+        self.assertEqual(limiter.limit, 1)
+        # 上限没有用满时成功不加，用满时加到上限为止
+        limiter.limit = 4.0
+        self.request(limiter)
+        self.assertEqual(limiter.limit, 4.0)
+        for _ in range(100):
+            for _ in range(int(limiter.limit)):
+                limiter.acquire()
+            for _ in range(int(limiter.limit)):
+                limiter.release('clock_in', self.clock(), 0.01)
+        self.assertEqual(limiter.limit, 8)
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_retry_after_pauses_the_host(self):
+        limiter = fake_limiter(self.clock, rate=0)
+        self.request(limiter, failed=True, retry_after=2.5)
+        self.assertEqual(limiter.throttled, 1)
+        self.assertAlmostEqual(self.request(limiter), 2.5)
+        self.assertEqual(self.request(limiter), 0)
+
+
+class HrClientRetryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.client = calculator.HrClient(rate=0, clock=self.clock, sleep=self.clock.sleep)
+        self.client.session = mock.Mock()
+        self.limiter = self.client.limiter('http://hr.test/api')
+        self.limiter._condition.wait = self.clock.wait
+
+    def send(self, responses, max_retries=calculator.HTTP_MAX_RETRIES, jitter=lambda low, high: high):
+        self.client.max_retries = max_retries
+        self.client.session.request.side_effect = responses
+        uniform = mock.Mock(side_effect=jitter)
+        with mock.patch('random.uniform', uniform), contextlib.redirect_stdout(io.StringIO()):
+            response = self.client.request('clock_in', 'GET', 'http://hr.test/api')
+        return response, [call.args for call in uniform.call_args_list]
+
+    def test_full_jitter_backoff_bounds(self):
+        ok = fake_response(200)
+        response, bounds = self.send([fake_response(503)] * 6 + [ok], max_retries=6)
+        self.assertIs(response, ok)
+        # 第 n 次重试在 [0, min(HTTP_BACKOFF_MAX, base * 2^n)] 之间随机等待，这里取上界
+        self.assertEqual(bounds, [(0, 1.0), (0, 2.0), (0, 4.0), (0, 8.0), (0, 8.0), (0, 8.0)])
+        self.assertEqual(self.clock.sleeps, [1.0, 2.0, 4.0, 8.0, 8.0, 8.0])
+        self.assertEqual(self.client.stats()['clock_in']['retries'], 6)
+        # 取下界时不等待
+        self.clock.sleeps.clear()
+        self.send([fake_response(502), ok], jitter=lambda low, high: low)
+        self.assertEqual(self.clock.sleeps, [0])
+
+    def test_retry_after_is_a_lower_bound(self):
+        ok = fake_response(200)
+        response, _ = self.send([fake_response(429, {'Retry-After': '3'}), ok], jitter=lambda low, high: low)
+        self.assertIs(response, ok)
+        self.assertEqual(self.clock.sleeps, [3.0])
+        self.assertEqual(self.limiter.throttled, 1)
+
+    def test_gives_up_after_max_retries(self):
+        import requests
+
+        last = fake_response(503)
+        response, _ = self.send([fake_response(503), fake_response(500), last], max_retries=2)
+        self.assertIs(response, last)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.send([requests.exceptions.ConnectionError('断开')] * 3, max_retries=2)
+        self.assertEqual(self.limiter.in_flight, 0)
+        # 每次重试都在上一次减半之后发出，六次失败各减半一次
+        self.assertEqual(self.limiter.decreases, 6)
+        self.assertEqual(self.limiter.limit, 1)
+
+    def test_max_rate_is_a_ceiling(self):
+        with mock.patch.object(calculator, '_hr_client', None), mock.patch.object(calculator, 'HrClient', wraps=calculator.HrClient) as factory:
+            client = calculator.get_hr_client(5)
+        factory.assert_called_once_with(rate=5)
+        self.assertEqual(client.limiter('http://hr.test/api').rate, 5)
+
+        limiter = fake_limiter(self.clock, rate=5, burst=calculator.HTTP_RATE_BURST)
+        sent = []
+        for _ in range(calculator.HTTP_RATE_BURST + 20):
+            limiter.acquire()
+            sent.append(self.clock())
+            limiter.release('clock_in', self.clock(), 0.01)
+        # 突发用完之后每 0.2 秒一个；成功的响应只会提高并发上限，速率不变
+        gaps = [b - a for a, b in zip(sent[calculator.HTTP_RATE_BURST:], sent[calculator.HTTP_RATE_BURST + 1:])]
+        for gap in gaps:
+            self.assertAlmostEqual(gap, 0.2)
+        self.assertEqual(limiter.rate, 5)
+
+
+def session_cookie(token_ttl, employee='7'):
+    return f"MCHRID={employee}; quectel_token={fake_hr_server.issue_token(token_ttl)}; quectel_refresh_token=refresh"
+
+
+class SessionManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for name, file_name in (('COOKIES_FILE', 'cookies.json'), ('USER_VARIABLE_CACHE_FILE', 'user_variables.json')):
+            patcher = mock.patch.object(calculator, name, os.path.join(directory.name, file_name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_token_expiry_reads_jwt_exp(self):
+        token = fake_hr_server.issue_token(100)
+        self.assertAlmostEqual(calculator.token_expiry(token), t.time() + 100, delta=2)
+        # 三段中间的 payload 长度不同时补齐的 '=' 个数不同
+        for payload in ('{"exp": 1700000000}', '{"exp":1700000000.5,"sub":"a"}', '{"exp": 1700000000, "x": "yy"}'):
+            encoded = base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+            self.assertEqual(calculator.token_expiry(f"h.{encoded}.s"), json.loads(payload)['exp'])
+        for token in (None, '', 'abc', 'a.b', 'a.!!!.c', 'a.' + base64.urlsafe_b64encode(b'[1]').decode() + '.c',
+                      'a.' + base64.urlsafe_b64encode(b'{"exp": true}').decode() + '.c',
+                      'a.' + base64.urlsafe_b64encode(b'{"exp": "1700000000"}').decode() + '.c'):
+            self.assertIsNone(calculator.token_expiry(token), token)
+
+    def test_refresh_window(self):
+        margin = calculator.SESSION_REFRESH_MARGIN
+        self.assertFalse(calculator.SessionManager(session_cookie(margin + 60)).needs_refresh())
+        self.assertTrue(calculator.SessionManager(session_cookie(margin - 60)).needs_refresh())
+        # token 中没有过期时间时，从最近一次确认有效起按 SESSION_DEFAULT_TTL 计算
+        session = calculator.SessionManager('MCHRID=7; quectel_token=opaque')
+        self.assertAlmostEqual(session.expiry(), t.time() + calculator.SESSION_DEFAULT_TTL, delta=2)
+        self.assertFalse(session.needs_refresh())
+        session.refreshed_at -= calculator.SESSION_DEFAULT_TTL
+        self.assertTrue(session.needs_refresh())
+
+    def test_background_refresh_retries_until_it_succeeds(self):
+        session = calculator.SessionManager(session_cookie(60))
+        refreshed = threading.Event()
+        results = iter([False, True])
+
+        def refresh():
+            if next(results):
+                session.expires_at = t.time() + 3600
+                refreshed.set()
+                return True
+            return False
+
+        with mock.patch.object(session, 'refresh', side_effect=refresh) as patched, mock.patch.object(calculator, 'SESSION_RETRY_INTERVAL', 0.01):
+            session.start_background_refresh()
+            self.assertTrue(refreshed.wait(5))
+            session.stop()
+        self.assertEqual(patched.call_count, 2)
+
+    def test_auth_error_tries_refresh_then_login(self):
+        session = calculator.SessionManager(session_cookie(-60))
+        with mock.patch.object(session, 'refresh', return_value=False), \
+                mock.patch.object(calculator, 'fetch_cookie_via_browser', return_value=session_cookie(3600, '8')) as browser:
+            # 没有指定 allow_login 时不打开浏览器
+            self.assertFalse(session.recover())
+            self.assertFalse(session.ensure_valid())
+            browser.assert_not_called()
+            session.allow_login = True
+            self.assertTrue(session.recover())
+        self.assertIn('MCHRID=8', session.current())
+        self.assertEqual(calculator.get_cookie()['user_cookie'], session.current())
+
+    def test_short_ttl_session_against_fake_server(self):
+        base_url = start_fake_server(self, token_ttl=900)
+
+        # token 已经过期：接口返回 401，续期后用新的 token 重试成功
+        session = calculator.SessionManager(session_cookie(-60))
+        with mock.patch.object(calculator, 'HR_BASE_URL', base_url), mock.patch.object(calculator, '_hr_client', calculator.HrClient()), \
+                contextlib.redirect_stdout(io.StringIO()):
+            with self.assertRaises(calculator.HrAuthError):
+                calculator.get_clock_in_data(fake_hr_server.CLOCK_IN_VARIABLE, session.current(), 3, 2025)
+            self.assertTrue(session.recover())
+            self.assertFalse(session.needs_refresh())
+            self.assertAlmostEqual(session.expiry(), t.time() + 900, delta=5)
+            self.assertIn('quectel_refresh_token=refresh', session.current())
+            records = calculator.get_clock_in_data(fake_hr_server.CLOCK_IN_VARIABLE, session.current(), 3, 2025)
+            self.assertTrue(records)
+
+            # 快过期的会话由后台线程续期
+            session = calculator.SessionManager(session_cookie(60))
+            old_cookie = session.current()
+            session.start_background_refresh()
+            self.addCleanup(session.stop)
+            deadline = t.time() + 5
+            while session.current() == old_cookie and t.time() < deadline:
+                t.sleep(0.01)
+            self.assertNotEqual(session.current(), old_cookie)
+            self.assertFalse(session.needs_refresh())
+            self.assertEqual(calculator.get_clock_in_data(fake_hr_server.CLOCK_IN_VARIABLE, session.current(), 3, 2025), records)
+
+
+class UserVariableCacheTest(unittest.TestCase):
+    """
+    用户变量按员工（MCHRID）缓存：续期换了 token 仍然命中，认证错误时清除。
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.client = calculator.HrClient()
+        for name, value in (('USER_VARIABLE_CACHE_FILE', os.path.join(directory.name, 'user_variables.json')),
+                            ('HR_BASE_URL', start_fake_server(self, token_ttl=900)), ('_hr_client', self.client)):
+            patcher = mock.patch.object(calculator, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def portal_requests(self, user_cookie):
+        """
+        获取打卡记录的用户变量，返回 (用户变量, 访问门户页面的次数)。
+        """
+        with mock.patch.object(self.client, 'request', wraps=self.client.request) as request:
+            user_variable = calculator.get_user_variable_online(user_cookie)
+        return user_variable, sum(call.args[0] == 'portal' for call in request.call_args_list)
+
+    def test_cache_survives_token_refresh_and_is_cleared_on_auth_error(self):
+        self.assertEqual(self.portal_requests(session_cookie(600)), (fake_hr_server.CLOCK_IN_VARIABLE, 1))
+        # 续期后 Cookie 的指纹变了，员工没变，不再访问门户页面
+        self.assertEqual(self.portal_requests(session_cookie(700)), (fake_hr_server.CLOCK_IN_VARIABLE, 0))
+        # 其他员工单独缓存
+        self.assertEqual(self.portal_requests(session_cookie(600, employee='8'))[1], 1)
+        self.assertEqual(set(calculator.read_user_variable_cache()), {'7', '8'})
+
+        # token 过期时接口返回 401，只清除这个员工的缓存
+        expired = f"MCHRID=7; quectel_token={fake_hr_server.issue_token(-60)}"
+        with contextlib.redirect_stdout(io.StringIO()), self.assertRaises(calculator.HrAuthError):
+            calculator.get_clock_in_data(fake_hr_server.CLOCK_IN_VARIABLE, expired, 3, 2025)
+        self.assertEqual(set(calculator.read_user_variable_cache()), {'8'})
+        with self.assertRaises(calculator.HrAuthError):
+            self.portal_requests(expired)
+        self.assertEqual(self.portal_requests(session_cookie(600)), (fake_hr_server.CLOCK_IN_VARIABLE, 1))
+        # 没有缓存的标题访问门户页面时认证失败，同样清除
+        with self.assertRaises(calculator.HrAuthError):
+            calculator.get_user_variable_online(expired, '不存在的链接')
+        self.assertEqual(set(calculator.read_user_variable_cache()), {'8'})
+
+
+class CalendarIndexTest(unittest.TestCase):
+
+    def test_leap_years(self):
+        for year, february in ((2024, 29), (2025, 28), (2000, 29), (1900, 28)):
+            calendar = calculator.CalendarIndex(year, {}, set())
+            self.assertEqual(calendar.days_in_month(2), february)
+            self.assertEqual(calendar.month_starts[12], 337 + february)
+        calendar = calculator.CalendarIndex(2024, {}, set())
+        self.assertEqual(calendar.ordinal('2024-02-29'), 59)
+        self.assertEqual(calendar.ordinal('2024-03-01'), 60)
+        self.assertIsNone(calculator.CalendarIndex(2025, {}, set()).ordinal('2025-02-29'))
+
+    def test_leap_day_type_and_required_workdays(self):
+        self.assertEqual(calculator.get_day_type('2024-02-29', {}, set()), '工作日')
+        self.assertEqual(calculator.get_day_type('2024-03-02', {}, set()), '周末')
+        # 2024 年 2 月 29 天，其中 8 天周末
+        self.assertEqual(calculator.count_required_workdays({'2024-02'}, {}, set()), 21)
+        self.assertEqual(calculator.count_required_workdays({'2024-02'}, {'2024-02-29': 3}, set()), 20)
+
+    @mock.patch.dict(calculator._holiday_year_memo, clear=True)
+    @mock.patch.dict(calculator._calendar_indexes, clear=True)
+    def test_months_share_one_index_per_year(self):
+        holiday_data = calculator.read_bundled_holiday_data(2025)
+        with mock.patch.object(calculator, 'get_holiday_year_data', return_value=holiday_data):
+            indexes = []
+            for month in ('01', '10'):
+                month_data = {'clock_in': [{'SHIFTTERM': f'2025-{month}-01', 'CARDTIME': f'2025-{month}-01 09:00:00'}],
+                              'holiday': (2025, holiday_data)}
+                result, _, holidays, workdays, _, _ = calculator.process_month_data(month_data)
+                self.assertEqual(calculator.count_required_workdays({f'2025-{month}'}, holidays, workdays),
+                                 calculator.count_required_workdays({f'2025-{month}'}, *load_calendar(2025)))
+                indexes.append(calculator.get_calendar_index(2025))
+            # 1 月 1 日和 10 月 1 日都是节假日，两个月用的是同一个全年索引
+            self.assertEqual([record.day_type_name for record in result], ['节假日'])
+            self.assertIs(indexes[0], indexes[1])
+            self.assertEqual(list(calculator._calendar_indexes), [2025])
+
+
+@mock.patch.dict(calculator._holiday_year_memo, clear=True)
+class HolidayYearDataTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(calculator, 'HOLIDAY_CACHE_PATH', directory.name + '/')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_any_fetch_error_falls_back_to_local_data(self):
+        client = mock.Mock()
+        client.request.side_effect = RuntimeError('熔断')
+        with mock.patch.object(calculator, 'get_hr_client', return_value=client), contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(calculator.get_holiday_year_data(2025), calculator.read_bundled_holiday_data(2025))
+            self.assertIsNone(calculator.get_holiday_year_data(1990))
+            # 失败的结果在 HOLIDAY_RETRY_INTERVAL 内不再重试
+            calculator.get_holiday_year_data(1990)
+        self.assertEqual(client.request.call_count, 2)
+
+    def test_fetch_holds_only_its_own_year(self):
+        holiday_data = calculator.read_bundled_holiday_data(2025)
+        calculator._holiday_year_memo[2025] = (holiday_data, float('inf'))
+        started, release = threading.Event(), threading.Event()
+
+        def request(*args, **kwargs):
+            started.set()
+            release.wait(5)
+            raise RuntimeError('超时')
+
+        client = mock.Mock()
+        client.request.side_effect = request
+        results = []
+        with mock.patch.object(calculator, 'get_hr_client', return_value=client), contextlib.redirect_stdout(io.StringIO()):
+            threads = [threading.Thread(target=lambda: results.append(calculator.get_holiday_year_data(2024))) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            self.assertTrue(started.wait(5))
+            # 2024 年还在联网，2025 年直接从内存返回
+            self.assertIs(calculator.get_holiday_year_data(2025), holiday_data)
+            release.set()
+            for thread in threads:
+                thread.join(5)
+        self.assertEqual(results, [calculator.read_bundled_holiday_data(2024)] * 2)
+        self.assertEqual(client.request.call_count, 1)
+
+
+class ResultStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'data', 'overtime.db')
+        self.store = calculator.ResultStore(self.path)
+        self.addCleanup(self.store.close)
+        self.holidays, self.workdays = load_calendar(2025)
+        self.clock_in_data = benchmark.generate_clock_in_data(3, 2025, [4, 5])
+
+    def compute(self, clock_in_data=None, hourly_rate=27, holidays=None, employee='7'):
+        """
+        用本地存储计算，返回 (结果, 加班费合计, 重新计算的天数)。
+        """
+        with mock.patch.object(calculator, 'compute_punch_day', wraps=calculator.compute_punch_day) as compute_punch_day:
+            records, income = calculator.compute_day_records(self.clock_in_data if clock_in_data is None else clock_in_data,
+                                                             self.holidays if holidays is None else holidays, self.workdays,
+                                                             hourly_rate, self.store, employee)
+        return records, income, compute_punch_day.call_count
+
+    def test_round_trip_reuses_every_day(self):
+        expected = calculator.compute_day_records(self.clock_in_data, self.holidays, self.workdays, 27)
+        records, income, computed = self.compute()
+        self.assertEqual((records, income), expected)
+        self.assertEqual(computed, len(records))
+        # 重新打开数据库，结果逐位相同，一天都不用重新计算
+        self.store.close()
+        self.store = calculator.ResultStore(self.path)
+        records, income, computed = self.compute()
+        self.assertEqual((records, income), expected)
+        self.assertEqual(computed, 0)
+
+    def test_changed_inputs_are_recomputed(self):
+        records, _, _ = self.compute()
+        days = len(records)
+        # 一天的下班打卡变了，只重新计算这一天
+        changed = self.clock_in_data + [{'SHIFTTERM': records[0].date, 'CARDTIME': f"{records[0].date} 23:30:00"}]
+        changed_records, _, computed = self.compute(changed)
+        self.assertEqual(computed, 1)
+        self.assertEqual(changed_records, calculator.compute_day_records(changed, self.holidays, self.workdays, 27)[0])
+        # 改回去、日期类型变化、工资基数变化、计算规则版本变化都会重新计算
+        self.assertEqual(self.compute()[2], 1)
+        holidays = dict(self.holidays, **{records[1].date: 3})
+        self.assertEqual(self.compute(holidays=holidays)[2], 1)
+        self.assertEqual(self.compute(hourly_rate=30)[2], days)
+        # 其他员工的结果互不影响
+        self.assertEqual(self.compute(hourly_rate=30, employee='8')[2], days)
+        self.assertEqual(self.compute(hourly_rate=30)[2], 0)
+        with mock.patch.object(calculator, 'RULES_VERSION', calculator.RULES_VERSION + 1):
+            self.assertEqual(self.compute(hourly_rate=30)[2], days)
+
+    def test_concurrent_writers(self):
+        errors = []
+
+        def write(employee):
+            store = calculator.ResultStore(self.path)
+            try:
+                # 工资基数每次都变，每次都要覆盖写入全部日期
+                for index in range(20):
+                    calculator.compute_day_records(self.clock_in_data, self.holidays, self.workdays, 26 + index % 2, store, employee)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                store.close()
+
+        threads = [threading.Thread(target=write, args=(str(employee),)) for employee in range(4)]
+        # 读写失败时 compute_day_records 只打印原因，不抛出
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(30)
+        self.assertEqual(errors, [])
+        self.assertNotIn('失败', output.getvalue())
+        for employee in range(4):
+            self.assertEqual(self.compute(employee=str(employee))[2], 0)
+
+
+def punch(date, time):
+    return {'SHIFTTERM': date, 'CARDTIME': f"{date} {time}"}
+
+
+def start_fake_server(test, **options):
+    """
+    在后台线程中启动 fake_hr_server，测试结束时关闭，返回它的地址。
+    """
+    defaults = dict(record=None, replay=None, latency=0, jitter=0, error_rate=0, token_ttl=0, seed=1,
+                    punches=0, applications=0, year=2025, quiet=True)
+    defaults.update(options)
+    server = fake_hr_server.FakeHrServer(('127.0.0.1', 0), argparse.Namespace(**defaults))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    test.addCleanup(server.server_close)
+    test.addCleanup(server.shutdown)
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class PunchWarehouseTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.path = os.path.join(directory.name, 'data', 'overtime.db')
+        self.warehouse = calculator.PunchWarehouse(self.path)
+        self.addCleanup(self.warehouse.close)
+
+    def test_sync_round_trip(self):
+        records = [punch('2025-05-06', '18:30:00'), punch('2025-05-06', '08:55:00'), punch('2025-05-07', '09:00:00(异地打卡)')]
+        self.assertEqual(self.warehouse.sync_month('7', '2025-05', records, immutable=False), 3)
+        self.assertEqual(self.warehouse.read_month('7', '2025-05'), records)
+        # 重复的记录只保存一条；再次同步时只写入新增的记录，顺序变化和删除的记录也跟着更新
+        changed = [records[2], records[0], punch('2025-05-08', '09:10:00'), records[0]]
+        self.assertEqual(self.warehouse.sync_month('7', '2025-05', changed, immutable=True), 1)
+        self.assertEqual(self.warehouse.read_month('7', '2025-05'), changed[:3])
+        self.assertTrue(self.warehouse.is_immutable('7', '2025-05'))
+        self.assertFalse(self.warehouse.has_month('7', '2025-04'))
+        self.assertEqual(self.warehouse.read_month('8', '2025-05'), [])
+        # 重新打开数据库，数据还在
+        self.warehouse.close()
+        self.warehouse = calculator.PunchWarehouse(self.path)
+        self.assertEqual(self.warehouse.read_month('7', '2025-05'), changed[:3])
+
+    def test_closed_months_are_not_fetched_again(self):
+        records = [punch('2025-03-03', '09:00:00'), punch('2025-03-03', '20:00:00')]
+        fetch = mock.Mock(return_value=records)
+        self.assertEqual(self.warehouse.clock_in_data('7', 2025, 3, fetch, ()), records)
+        self.assertEqual(self.warehouse.clock_in_data('7', 2025, 3, fetch, ()), records)
+        self.assertEqual(fetch.call_count, 1)
+        # 还没结束（或刚结束不到 PUNCH_MONTH_GRACE_DAYS 天）的月份每次都联网，打卡记录变了就更新
+        now = datetime.now()
+        fetch.return_value = [punch(f"{now:%Y-%m-%d}", '09:00:00')]
+        self.assertEqual(self.warehouse.clock_in_data('7', now.year, now.month, fetch, ()), fetch.return_value)
+        fetch.return_value = fetch.return_value + [punch(f"{now:%Y-%m-%d}", '19:00:00')]
+        self.assertEqual(self.warehouse.clock_in_data('7', now.year, now.month, fetch, ()), fetch.return_value)
+        self.assertEqual(self.warehouse.read_month('7', f"{now:%Y-%m}"), fetch.return_value)
+        self.assertEqual(fetch.call_count, 3)
+
+    def test_fetch_errors_fall_back_to_saved_month(self):
+        now = datetime.now()
+        records = [punch(f"{now:%Y-%m-%d}", '09:00:00')]
+        self.warehouse.clock_in_data('7', now.year, now.month, mock.Mock(return_value=records), ())
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(self.warehouse.clock_in_data('7', now.year, now.month, mock.Mock(side_effect=OSError('断网')), ()), records)
+        # 本地没有这个月，或者认证失败时，错误交给调用方
+        with self.assertRaises(OSError):
+            self.warehouse.clock_in_data('8', now.year, now.month, mock.Mock(side_effect=OSError('断网')), ())
+        with self.assertRaises(calculator.HrAuthError):
+            self.warehouse.clock_in_data('7', now.year, now.month, mock.Mock(side_effect=calculator.HrAuthError('401')), ())
+
+    def test_concurrent_writers(self):
+        other = calculator.PunchWarehouse(self.path)
+        self.addCleanup(other.close)
+        errors = []
+
+        def sync(warehouse, employee):
+            try:
+                for month in range(1, 13):
+                    records = benchmark.generate_clock_in_data(int(employee), 2024, [month])
+                    warehouse.clock_in_data(employee, 2024, month, lambda: records, ())
+            except Exception as e:
+                errors.append(e)
+
+        # 同一个仓库在多个线程中共用，另一个连接同时写同一个数据库文件
+        threads = [threading.Thread(target=sync, args=(self.warehouse if employee % 2 else other, str(employee))) for employee in range(1, 7)]
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(60)
+        self.assertEqual(errors, [])
+        self.assertNotIn('失败', output.getvalue())
+        for employee in range(1, 7):
+            for month in range(1, 13):
+                self.assertTrue(self.warehouse.is_immutable(str(employee), f"2024-{month:02d}"))
+            self.assertEqual(self.warehouse.read_month(str(employee), '2024-06'),
+                             [{'SHIFTTERM': record['SHIFTTERM'], 'CARDTIME': record['CARDTIME']}
+                              for record in benchmark.generate_clock_in_data(employee, 2024, [6])])
+
+    def test_no_store_leaves_no_database(self):
+        base_url = start_fake_server(self)
+        script = os.path.join(SCRIPT_DIR, 'overtime_calculator.py')
+        outputs = []
+        for options in (['--no-store'], []):
+            with self.subTest(options=options):
+                cwd = os.path.join(self.directory, 'run' + ''.join(options))
+                os.makedirs(cwd)
+                result = subprocess.run([sys.executable, script, '--hr-url', base_url, '--holiday-url', base_url, '--cookie', 'MCHRID=7',
+                                         '--yearMonth', '2025-05'] + options, cwd=cwd, capture_output=True, text=True, timeout=120)
+                self.assertEqual(result.returncode, 0, result.stderr)
+                outputs.append(result.stdout)
+                database = os.path.join(cwd, calculator.LOCAL_DB_FILE)
+                self.assertEqual(os.path.exists(database), not options)
+        # 保存了的数据库里有这个月的打卡记录，两次的输出相同
+        warehouse = calculator.PunchWarehouse(database)
+        self.addCleanup(warehouse.close)
+        self.assertTrue(warehouse.read_month('7', '2025-05'))
+        self.assertEqual(outputs[0], outputs[1])
+
+
+def report_days():
+    return [
+        calculator.DayRecord('2025-05-06', '09:10:00', '21:30:00', calculator.DAY_WORKDAY, 1, 3.0, 60.0, 20, 80.0, 10.0),
+        calculator.DayRecord('2025-05-10', '10:00:00', '18:00:00', calculator.DAY_HOLIDAY_WEEKEND, 2, 7.5, 0.1 + 0.2, 0, 0.30000000000000004, 0.0),
+    ]
+
+
+class ReportWriterTest(unittest.TestCase):
+
+    def write(self, output_format, context_fields=(), contexts=({}, {})):
+        """
+        用 ReportWriter 输出 report_days() 和一组汇总，返回输出的文本。
+        """
+        stream = io.StringIO()
+        writer = calculator.ReportWriter(output_format, stream, context_fields)
+        for record, context in zip(report_days(), contexts):
+            writer.day(record, **context)
+        totals = dict.fromkeys(calculator.SUMMARY_FIELDS, 0)
+        totals.update(total_overtime_pay=60.3, late_count=1, required_workdays=20)
+        writer.summary(totals, '牛马', **contexts[0])
+        writer.close()
+        return stream.getvalue()
+
+    def test_json(self):
+        self.assertEqual(self.write('json'), (
+            '{"days":[\n'
+            '{"date":"2025-05-06","start_time":"09:10:00","end_time":"21:30:00","day_type":"工作日","rate":1,"overtime_hours":3.0,'
+            '"overtime_pay":60.0,"meal_allowance":20.0,"total_income":80.0,"late_minutes":10.0},\n'
+            '{"date":"2025-05-10","start_time":"10:00:00","end_time":"18:00:00","day_type":"节假日(周末)","rate":2,"overtime_hours":7.5,'
+            '"overtime_pay":0.30000000000000004,"meal_allowance":0.0,"total_income":0.30000000000000004,"late_minutes":0.0}\n'
+            '],"summaries":[{"total_overtime_pay":60.3,"actual_overtime_pay":0,"total_meal_allowance":0,"workday_overtime_pay":0,'
+            '"weekend_overtime_pay":0,"holiday_overtime_pay":0,"total_income":0,"actual_total_income":0,"workday_hours":0,'
+            '"weekend_hours":0,"holiday_hours":0,"total_hours":0,"actual_hours":0,"late_count":1,"late_minutes":0,'
+            '"required_workdays":20,"actual_workdays":0,"rank":"牛马"}]}\n'))
+        # 没有记录时仍是合法的 JSON
+        stream = io.StringIO()
+        calculator.ReportWriter('json', stream).close()
+        self.assertEqual(json.loads(stream.getvalue()), {'days': [], 'summaries': []})
+
+    def test_ndjson(self):
+        lines = self.write('ndjson', ('month',), ({'month': '2025-05'}, {'month': '2025-05'})).splitlines()
+        self.assertEqual(lines[0], (
+            '{"type":"day","month":"2025-05","date":"2025-05-06","start_time":"09:10:00","end_time":"21:30:00","day_type":"工作日",'
+            '"rate":1,"overtime_hours":3.0,"overtime_pay":60.0,"meal_allowance":20.0,"total_income":80.0,"late_minutes":10.0}'))
+        self.assertEqual([json.loads(line)['type'] for line in lines], ['day', 'day', 'summary'])
+        self.assertEqual(json.loads(lines[1])['overtime_pay'], 0.1 + 0.2)
+        self.assertEqual(json.loads(lines[2])['month'], '2025-05')
+        self.assertEqual(json.loads(lines[2])['rank'], '牛马')
+
+    def test_csv_quotes_chinese_fields(self):
+        names = ({'name': '张三, "小张"'}, {'name': '李四\n二组'})
+        self.assertEqual(self.write('csv', ('name',), names), (
+            'name,date,start_time,end_time,day_type,rate,overtime_hours,overtime_pay,meal_allowance,total_income,late_minutes\n'
+            '"张三, ""小张""",2025-05-06,09:10:00,21:30:00,工作日,1,3.0,60.0,20.0,80.0,10.0\n'
+            '"李四\n二组",2025-05-10,10:00:00,18:00:00,节假日(周末),2,7.5,0.30000000000000004,0.0,0.30000000000000004,0.0\n'
+            '\n'
+            'name,' + ','.join(calculator.SUMMARY_FIELDS) + ',rank\n'
+            '"张三, ""小张""",60.3,0,0,0,0,0,0,0,0,0,0,0,0,1,0,20,0,牛马\n'))
+        # 用 csv 模块读回来，姓名中的逗号、引号和换行保持原样
+        import csv
+        rows = list(csv.reader(io.StringIO(self.write('csv', ('name',), names))))
+        self.assertEqual([rows[1][0], rows[2][0], rows[5][0]], [names[0]['name'], names[1]['name'], names[0]['name']])
+
+
+class ServeTest(unittest.TestCase):
+
+    def test_calculate_over_unix_socket(self):
+        import http.client
+        import signal
+        import socket
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        socket_path = os.path.join(directory.name, 'overtime.sock')
+        base_url = start_fake_server(self)
+        process = subprocess.Popen([sys.executable, os.path.join(SCRIPT_DIR, 'overtime_calculator.py'), '--serve', '--socket', socket_path,
+                                    '--hr-url', base_url, '--holiday-url', base_url],
+                                   cwd=directory.name, env=dict(os.environ, PYTHONUNBUFFERED='1'),
+                                   stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        self.addCleanup(process.kill)
+        self.assertTrue(process.stdout.readline().startswith('加班计算服务已启动'))
+
+        class UnixConnection(http.client.HTTPConnection):
+            def connect(self):
+                self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self.sock.settimeout(60)
+                self.sock.connect(socket_path)
+
+        def request(method, path, body=None):
+            connection = UnixConnection('localhost')
+            try:
+                connection.request(method, path, body=json.dumps(body).encode('utf-8') if body is not None else None,
+                                   headers={'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                return response.status, json.loads(response.read())
+            finally:
+                connection.close()
+
+        custom = {'hourlyRate': 30, 'customData': [
+            {'date': '2025-05-06', 'startTime': '09:10:00', 'endTime': '21:30:00', 'dayType': '工作日'},
+            {'date': '2025-05-10', 'startTime': '10:00:00', 'endTime': '18:00:00', 'dayType': '周末'},
+        ]}
+        status, body = request('POST', '/calculate', {'custom': custom})
+        self.assertEqual(status, 200, body)
+        self.assertEqual(body['data'], json.loads(json.dumps(calculator.compute_custom_report(custom))))
+        self.assertEqual([day['day_type'] for day in body['data']['days']], ['工作日', '周末'])
+        self.assertEqual(request('POST', '/calculate', {'custom': 'custom.json'})[0], 400)
+        self.assertEqual(request('GET', '/missing')[0], 404)
+
+        # Ctrl+C 后服务退出并删除 socket 文件
+        process.send_signal(signal.SIGINT)
+        self.assertEqual(process.wait(timeout=60), 0)
+        process.stdout.close()
+        self.assertFalse(os.path.exists(socket_path))
+
+
+class ReducePunchesTest(unittest.TestCase):
+
+    def test_keeps_earliest_and_latest_punch(self):
+        days = calculator.reduce_punches([
+            {'SHIFTTERM': '2025-06-03', 'CARDTIME': '2025-06-03 12:00:00'},
+            {'SHIFTTERM': '2025-06-04', 'CARDTIME': '2025-06-04 09:00:00'},
+            {'SHIFTTERM': '2025-06-03', 'CARDTIME': '2025-06-03 08:30:00'},
+            {'SHIFTTERM': '2025-06-03', 'CARDTIME': '2025-06-03 20:15:30'},
+            {'SHIFTTERM': '2025-06-03', 'CARDTIME': '2025-06-03 08:30:00'},
+        ])
+        self.assertEqual(list(days), ['2025-06-03', '2025-06-04'])
+        day = days['2025-06-03']
+        self.assertEqual((day.first_time, day.last_time), ('08:30:00', '20:15:30'))
+        self.assertEqual((day.first_seconds, day.last_seconds), (8 * 3600 + 1800, 20 * 3600 + 15 * 60 + 30))
+        single = days['2025-06-04']
+        self.assertEqual((single.first_time, single.last_time), ('09:00:00', '09:00:00'))
+
+    def test_local_punch_wins_at_equal_time(self):
+        for order in (1, -1):
+            items = [
+                {'SHIFTTERM': '2025-06-03', 'CARDTIME': '2025-06-03 19:30:00(异地打卡)'},
+                {'SHIFTTERM': '2025-06-03', 'CARDTIME': '2025-06-03 19:30:00'},
+                {'SHIFTTERM': '2025-06-03', 'CARDTIME': '2025-06-03 08:59:59(异地打卡)'},
+            ][::order]
+            day = calculator.reduce_punches(items)['2025-06-03']
+            self.assertEqual((day.last_time, day.last_remote), ('19:30:00', False))
+            self.assertEqual((day.first_time, day.first_remote), ('08:59:59(异地打卡)', True))
+
+
+class ParseClockTimeTest(unittest.TestCase):
+    """
+    parse_clock_time 替换了 datetime.strptime(value, '%H:%M:%S')，接受和拒绝的输入必须与它相同。
+    """
+
+    def strptime(self, value):
+        remote = value.endswith(calculator.REMOTE_CLOCK_IN_SUFFIX)
+        if remote:
+            value = value[:-len(calculator.REMOTE_CLOCK_IN_SUFFIX)]
+        parsed = datetime.strptime(value, '%H:%M:%S')
+        return parsed.hour * 3600 + parsed.minute * 60 + parsed.second, remote
+
+    def test_matches_strptime(self):
+        values = [
+            '09:05:00', '00:00:00', '23:59:59', '09:05:00(异地打卡)',
+            # 不补零
+            '9:05:00', '9:5:0', '21:7:3', '9:05:00(异地打卡)',
+            # 缺少秒、超出范围
+            '09:05', '9', '24:00:00', '23:60:00', '23:59:60', '23:59:61', '99:99:99',
+            # 前后空白
+            ' 09:05:00', '09:05:00 ', '09:05:00\n', '\t9:05:00', '09: 05:00',
+            # 空字符串和乱码
+            '', ' ', '(异地打卡)', 'abc', '09:05:0a', '09-05-00', '9::00', '09:05:00:00', '009:05:00',
+            '+9:05:00', '-9:05:00', '09:05:00.5', '０９:05:00', '09:05:00(异地)',
+        ]
+        for value in values:
+            with self.subTest(value=value):
+                try:
+                    expected = self.strptime(value)
+                except ValueError:
+                    with self.assertRaises(ValueError):
+                        calculator.parse_clock_time(value)
+                else:
+                    self.assertEqual(calculator.parse_clock_time(value), expected)
+
+    def test_every_second_of_the_day(self):
+        for seconds in range(0, 24 * 3600, 7):
+            value = f"{seconds // 3600}:{seconds // 60 % 60}:{seconds % 60}"
+            self.assertEqual(calculator.parse_clock_time(value), self.strptime(value))
+            padded = f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+            self.assertEqual(calculator.parse_clock_time(padded), (seconds, False))
+
+
+@unittest.skipIf(calculator.load_numpy() is None, "没有安装 NumPy")
+class ColumnarEngineTest(unittest.TestCase):
+    """
+    compute_day_records 在打卡记录达到 COLUMNAR_MIN_ROWS 条时改用列式计算，两种计算的结果必须逐位相同。
+    """
+
+    def setUp(self):
+        self.holidays, self.workdays = load_calendar(2025)
+        # 几个月的随机打卡，再加上同一时间的本地和异地打卡、只有一条打卡的日期
+        self.clock_in_data = benchmark.generate_clock_in_data(7, 2025, [1, 2, 4, 5, 10])
+        self.clock_in_data += [
+            {'SHIFTTERM': '2025-06-03', 'CARDTIME': '2025-06-03 19:30:00(异地打卡)'},
+            {'SHIFTTERM': '2025-06-03', 'CARDTIME': '2025-06-03 19:30:00'},
+            {'SHIFTTERM': '2025-06-03', 'CARDTIME': '2025-06-03 08:59:59'},
+            {'SHIFTTERM': '2025-06-07', 'CARDTIME': '2025-06-07 10:00:00'},
+            # 不补零的时间走逐行解析，结果一样
+            {'SHIFTTERM': '2025-06-09', 'CARDTIME': '2025-06-09 9:05:00'},
+            {'SHIFTTERM': '2025-06-09', 'CARDTIME': '2025-06-09 21:7:3'},
+            {'SHIFTTERM': '2025-06-10', 'CARDTIME': '2025-06-10 8:59:59(异地打卡)'},
+            {'SHIFTTERM': '2025-06-10', 'CARDTIME': '2025-06-10 18:30:00'},
+        ]
+
+    def compute(self, threshold):
+        with mock.patch.object(calculator, 'COLUMNAR_MIN_ROWS', threshold):
+            return calculator.compute_day_records(self.clock_in_data, self.holidays, self.workdays, 27)
+
+    def test_day_records_match(self):
+        rows, rows_income = self.compute(float('inf'))
+        columns, columns_income = self.compute(0)
+        self.assertEqual(columns, rows)
+        self.assertEqual(columns_income, rows_income)
+
+    def test_summary_matches(self):
+        rows, _ = self.compute(float('inf'))
+        columns = calculator.compute_columns(calculator.load_punch_columns([self.clock_in_data], self.holidays, self.workdays), 27)
+        self.assertEqual(calculator.summarize_columns(columns, self.workdays, self.holidays, 2, 15),
+                         calculator.summarize_totals(rows, self.workdays, self.holidays, 2, 15))
+
+    def test_malformed_rows_fail_like_row_path(self):
+        for card_time in ('9:05', '24:00:00', '09:60:00', '09:00:60', '0a:00:00', '０9:00:00', '09:00:00:00', ''):
+            with self.subTest(card_time=card_time):
+                self.clock_in_data.append({'SHIFTTERM': '2025-06-11', 'CARDTIME': '2025-06-11 ' + card_time})
+                with self.assertRaises(ValueError):
+                    self.compute(float('inf'))
+                with self.assertRaises(ValueError):
+                    self.compute(0)
+                self.clock_in_data.pop()
+
+    def test_malformed_dates_fall_back_to_row_path(self):
+        self.clock_in_data.append({'SHIFTTERM': '2025-6-12', 'CARDTIME': '2025-06-12 09:00:00'})
+        with mock.patch.object(calculator, 'compute_columns', wraps=calculator.compute_columns) as compute_columns:
+            with self.assertRaises(ValueError):
+                self.compute(0)
+        compute_columns.assert_not_called()
+        with self.assertRaises(ValueError):
+            calculator.load_punch_columns([self.clock_in_data], self.holidays, self.workdays)
+
+
+if __name__ == '__main__':
+    unittest.main()